@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: legacy row-dict aggregation vs. the columnar loader in csv_tool.py.
+Generates a synthetic CSV (10M rows by default) and times `aggregate`/`report`
+style grouping both ways. Each variant runs in its own process so peak RSS is
+comparable. Uses only the Python 3 standard library.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import csv_tool  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+def generate(path, rows, groups=1000, seed=42):
+    """Write a synthetic sales-like CSV with a grouping key and a value column."""
+    rnd = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['id', 'region', 'amount', 'note'])
+        for i in range(rows):
+            amount = '' if i % 50 == 0 else f'{rnd.random() * 1000:.2f}'
+            w.writerow([i, f'g{rnd.randrange(groups)}', amount, 'x' * (i % 7)])
+
+
+# ---------------------------------------------------------------------------
+# Variants
+# ---------------------------------------------------------------------------
+
+def legacy(path, group_col, value_col):
+    """The pre-columnar path: list of dicts, per-group row lists, to_float per cell."""
+    data = csv_tool.read_data(path)
+    groups = defaultdict(list)
+    for r in data:
+        groups[r.get(group_col, '')].append(r)
+    out = {}
+    for name in sorted(groups):
+        vals = [csv_tool.to_float(r.get(value_col, '')) for r in groups[name]
+                if str(r.get(value_col, '')).strip()]
+        out[name] = [len(groups[name]), len(vals), sum(vals),
+                     min(vals) if vals else None, max(vals) if vals else None]
+    return out
+
+
+def columnar(path, group_col, value_col):
+    """Single pass over typed column batches with running accumulators."""
+    plan = csv_tool.AggPlan([group_col], [(value_col, 'sum')])
+    _, groups = csv_tool.aggregate_groups(
+        csv_tool.iter_column_batches(path, [group_col], [value_col]), plan)
+    out = {}
+    for (name,), (rows, m) in sorted(groups.items()):
+        out[name] = [rows, m.count, m.sum, m.min if m.count else None, m.max if m.count else None]
+    return out
+
+
+VARIANTS = {'legacy': legacy, 'columnar': columnar}
+
+
+def run_variant(name, path):
+    """Run one variant in this process and return timing, peak RSS and a checksum."""
+    start = time.perf_counter()
+    result = VARIANTS[name](path, 'region', 'amount')
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        rss *= 1024
+    checksum = round(sum(acc[2] for acc in result.values()), 4)
+    return {'variant': name, 'seconds': round(elapsed, 3), 'peak_rss_mb': round(rss / 2**20, 1),
+            'groups': len(result), 'checksum': checksum}
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar aggregation benchmark')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Synthetic row count')
+    parser.add_argument('--groups', type=int, default=1000, help='Distinct group keys')
+    parser.add_argument('--file', help='Use/keep this CSV instead of a temp file')
+    parser.add_argument('--variant', choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.file)))
+        return
+
+    tmp = None
+    path = args.file
+    if not path:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, 'bench.csv')
+    if not os.path.exists(path):
+        print(f"Generating {args.rows:,} rows -> {path}", file=sys.stderr)
+        generate(path, args.rows, args.groups)
+
+    results = []
+    for name in VARIANTS:
+        out = subprocess.run([sys.executable, __file__, '--variant', name, '--file', path],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    if results[0]['checksum'] != results[1]['checksum']:
+        print("Error: variants disagree", file=sys.stderr)
+        sys.exit(1)
+    speedup = results[0]['seconds'] / results[1]['seconds'] if results[1]['seconds'] else float('inf')
+    print(json.dumps({'rows': args.rows, 'results': results, 'speedup': round(speedup, 2)}, indent=2))
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
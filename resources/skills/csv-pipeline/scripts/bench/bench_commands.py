@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Benchmark: every csv_tool.py subcommand over synthetic datasets.
+Generates deterministic wide, narrow, skewed-key and high-cardinality CSVs
+(1e5 rows by default, up to 1e7), runs each command in its own process and
+records wall time, peak RSS and rows/sec as JSON. With --compare, exits 1
+when a command is slower than the saved baseline by more than --threshold.
+Uses only the Python 3 standard library.
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+TOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'csv_tool.py')
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+# Every dataset has id (unique, ascending), key (grouping/join key) and
+# value (float, 2% empty) so one command list fits all of them.
+
+def _values(rnd, i):
+    return '' if i % 50 == 0 else f'{rnd.random() * 1000:.2f}'
+
+
+def gen_narrow(rnd, rows, dim):
+    """id, key, value: 1,000 uniformly drawn keys."""
+    dim.update(f'k{k}' for k in range(1000))
+    for i in range(rows):
+        yield (i, f'k{rnd.randrange(1000)}', _values(rnd, i))
+
+
+def gen_wide(rnd, rows, dim):
+    """id, key, value plus 40 int/float/text/date columns."""
+    dim.update(f'k{k}' for k in range(1000))
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+    for i in range(rows):
+        extra = []
+        for c in range(10):
+            extra += [rnd.randrange(100000), f'{rnd.gauss(0, 100):.3f}', words[(i + c) % 8] * (1 + c % 3),
+                      f'2024-{1 + (i + c) % 12:02d}-{1 + (i * 7 + c) % 28:02d}']
+        yield (i, f'k{rnd.randrange(1000)}', _values(rnd, i), *extra)
+
+
+def gen_skewed(rnd, rows, dim):
+    """id, key, value, label: 10,000 keys drawn from a Zipf(1.2) distribution."""
+    keys = 10000
+    dim.update(f'k{k}' for k in range(keys))
+    cum = list(itertools.accumulate(1 / (k + 1) ** 1.2 for k in range(keys)))
+    top = cum[-1]
+    for i in range(rows):
+        k = min(bisect.bisect(cum, rnd.random() * top), keys - 1)
+        yield (i, f'k{k}', _values(rnd, i), 'hot' if k < 10 else 'cold')
+
+
+def gen_highcard(rnd, rows, dim):
+    """id, key, value, label: nearly every key distinct."""
+    for i in range(rows):
+        key = f'{rnd.getrandbits(48):012x}'
+        if i % 100 == 0:
+            dim.add(key)
+        yield (i, key, _values(rnd, i), f'u{i % 997}')
+
+
+GENERATORS = {'narrow': gen_narrow, 'wide': gen_wide, 'skewed': gen_skewed, 'highcard': gen_highcard}
+HEADERS = {
+    'narrow': ['id', 'key', 'value'],
+    'wide': ['id', 'key', 'value'] + [f'{t}{c}' for c in range(10) for t in ('int', 'num', 'text', 'date')],
+    'skewed': ['id', 'key', 'value', 'label'],
+    'highcard': ['id', 'key', 'value', 'label'],
+}
+
+
+def dataset_paths(data_dir, name, rows):
+    base = os.path.join(data_dir, f'{name}_{rows}')
+    return base + '.csv', base + '_dim.csv'
+
+
+def generate(data_dir, name, rows, seed=42):
+    """Write ``<name>_<rows>.csv`` and its join table unless they exist; returns both paths."""
+    path, dim_path = dataset_paths(data_dir, name, rows)
+    if os.path.exists(path) and os.path.exists(dim_path):
+        return path, dim_path
+    print(f"Generating {name} {rows:,} rows -> {path}", file=sys.stderr)
+    # In a child process: the peak RSS a command reports includes its parent's at fork time
+    subprocess.run([sys.executable, __file__, '--generate', name, str(rows), data_dir, str(seed)], check=True)
+    return path, dim_path
+
+
+def write_dataset(data_dir, name, rows, seed):
+    path, dim_path = dataset_paths(data_dir, name, rows)
+    rnd = random.Random(f'{seed}:{name}')
+    dim = set()
+    for target, write in ((path, True), (dim_path, False)):
+        with open(target + '.tmp', 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            if write:
+                w.writerow(HEADERS[name])
+                rows_iter = GENERATORS[name](rnd, rows, dim)
+                while True:
+                    batch = list(itertools.islice(rows_iter, 10000))
+                    if not batch:
+                        break
+                    w.writerows(batch)
+            else:
+                w.writerow(['key', 'segment'])
+                w.writerows((k, f's{int(hashlib.md5(k.encode()).hexdigest(), 16) % 7}') for k in sorted(dim))
+        os.replace(target + '.tmp', target)
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+# name -> (argv, cleanup argv or None). {data}, {dim} and {out} are filled in;
+# commands that accept --workers get it appended when requested.
+COMMANDS = {
+    'inspect': (['inspect', '{data}'], None),
+    'profile': (['inspect', '{data}', '--json'], None),
+    'filter': (['filter', '{data}', '--where', 'value > 500', '--output', '{out}.csv'], None),
+    # Overflowing literals parse to +/-inf and must stay constants in the compiled predicate
+    'filter-inf': (['filter', '{data}', '--where', "value < 1e999 and value > '-inf'", '--output', '{out}.csv'],
+                   None),
+    'select': (['select', '{data}', '--columns', 'id,value', '--output', '{out}.csv'], None),
+    'sort': (['sort', '{data}', '--column', 'value', '--numeric', '--output', '{out}.csv'], None),
+    'top': (['top', '{data}', '--column', 'value', '--n', '5', '--by-group', 'key', '--output', '{out}.csv'], None),
+    'window': (['window', '{data}', '--func', 'row_number', '--func', 'value:cumsum',
+                '--func', 'value:rolling_mean:10', '--output', '{out}.csv'], None),
+    'dedup': (['dedup', '{data}', '--columns', 'key', '--output', '{out}.csv'], None),
+    'aggregate': (['aggregate', '{data}', '--group-by', 'key', '--agg', 'value:sum', '--agg', 'value:p95',
+                   '--output', '{out}.csv'], None),
+    'report': (['report', '{data}', '--group-by', 'key', '--value-column', 'value', '--output', '{out}.md'], None),
+    'join': (['join', '{data}', '{dim}', '--on', 'key', '--output', '{out}.csv'], None),
+    'convert': (['convert', '{data}', '--to', 'jsonl', '--output', '{out}.jsonl'], None),
+    'clean': (['clean', '{data}', '--output', '{out}.csv'], None),
+    'pipe': (['pipe', '{data}', '--stage', 'filter --where "value > 100"',
+              '--stage', 'aggregate --group-by key --agg value:avg', '--output', '{out}.csv'], None),
+    # Sidecars would speed up later commands, so they are removed right away
+    'cache': (['cache', 'build', '{data}'], ['cache', 'drop', '{data}']),
+    'index': (['index', 'build', '{data}', '--column', 'id'], None),
+    'lookup': (['lookup', '{data}', '--column', 'id', '--value', '42', '--output', '{out}.csv'],
+               ['index', 'drop', '{data}', '--column', 'id']),
+}
+WORKER_COMMANDS = {'inspect', 'profile', 'filter', 'filter-inf', 'dedup', 'aggregate', 'report'}
+
+
+def run_once(python, argv):
+    """Run csv_tool in a child process; returns ``(seconds, peak_rss_bytes, stderr)``."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([python, TOOL] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    # wait4 reports this child's own peak RSS, unlike RUSAGE_CHILDREN
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    proc.stderr.close()
+    if proc.returncode:
+        raise RuntimeError(stderr.decode('utf-8', 'replace').strip() or f'exit status {proc.returncode}')
+    rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return elapsed, rss, stderr
+
+
+def bench_command(python, name, data, dim, rows, out_dir, repeat, workers):
+    """Best-of-``repeat`` timing of one command on one dataset."""
+    argv, cleanup = COMMANDS[name]
+    out = os.path.join(out_dir, name)
+    fill = lambda args: [a.format(data=data, dim=dim, out=out) for a in args]
+    argv = fill(argv)
+    if workers > 1 and name in WORKER_COMMANDS:
+        argv += ['--workers', str(workers)]
+    times, peak = [], 0
+    try:
+        for _ in range(repeat):
+            seconds, rss, _ = run_once(python, argv)
+            times.append(seconds)
+            peak = max(peak, rss)
+            for f in os.listdir(out_dir):
+                os.remove(os.path.join(out_dir, f))
+    except RuntimeError as e:
+        return {'command': name, 'error': str(e).splitlines()[-1]}
+    finally:
+        if cleanup:
+            run_once(python, fill(cleanup))
+    best = min(times)
+    return {'command': name, 'seconds': round(best, 4), 'peak_rss_mb': round(peak / 2**20, 1),
+            'rows_per_sec': round(rows / best) if best else None}
+
+
+def environment(python):
+    """Interpreter, platform and optional-dependency details recorded with the results."""
+    probe = ("import importlib.util as u, json, sys; print(json.dumps({'python': sys.version.split()[0], "
+             "'numpy': bool(u.find_spec('numpy')), 'pyarrow': bool(u.find_spec('pyarrow'))}))")
+    info = json.loads(subprocess.run([python, '-c', probe], capture_output=True, text=True, check=True).stdout)
+    with open(TOOL, 'rb') as f:
+        info['csv_tool'] = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    info.update(platform=platform.platform(), machine=platform.machine(), cpus=os.cpu_count())
+    return info
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def compare(results, baseline, threshold, rss_threshold=None, min_seconds=0.05):
+    """Regressions of ``results`` against ``baseline`` as human-readable lines.
+
+    A command regresses when it is more than ``threshold`` (a fraction)
+    slower, or uses more than ``rss_threshold`` more peak memory; runs
+    faster than ``min_seconds`` in the baseline are too noisy to judge.
+    """
+    old = {(r['dataset'], r['rows'], r['command']): r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = old.get((r['dataset'], r['rows'], r['command']))
+        if b is None or 'seconds' not in b:
+            continue
+        label = f"{r['command']} on {r['dataset']} {r['rows']:,}"
+        if 'seconds' not in r:
+            regressions.append(f"{label}: failed ({r['error']})")
+            continue
+        if b['seconds'] >= min_seconds and r['seconds'] > b['seconds'] * (1 + threshold):
+            regressions.append(f"{label}: {b['seconds']:.3f}s -> {r['seconds']:.3f}s "
+                               f"(+{r['seconds'] / b['seconds'] - 1:.0%})")
+        if rss_threshold is not None and r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + rss_threshold):
+            regressions.append(f"{label}: peak RSS {b['peak_rss_mb']} MB -> {r['peak_rss_mb']} MB")
+    return regressions
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_sizes(text):
+    try:
+        return [int(float(s)) for s in text.split(',') if s.strip()]
+    except ValueError:
+        print(f"Error: invalid --sizes '{text}' (use e.g. 1e5,1e6)", file=sys.stderr)
+        sys.exit(1)
+
+
+def pick(text, choices, what):
+    names = [s.strip() for s in text.split(',') if s.strip()] if text else list(choices)
+    bad = [n for n in names if n not in choices]
+    if bad:
+        print(f"Error: unknown {what} {', '.join(bad)} (choose from {', '.join(choices)})", file=sys.stderr)
+        sys.exit(1)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='csv_tool.py command benchmarks')
+    parser.add_argument('--sizes', default='1e5', help='Row counts, comma-separated (e.g. 1e5,1e6,1e7)')
+    parser.add_argument('--datasets', help=f"Datasets to use (default: all of {', '.join(GENERATORS)})")
+    parser.add_argument('--commands', help=f"Commands to time (default: all of {', '.join(COMMANDS)})")
+    parser.add_argument('--data-dir', help='Keep generated datasets here and reuse them (default: temp dir)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per command; the fastest is kept')
+    parser.add_argument('--workers', type=int, default=1, help='Pass --workers N to commands that take it')
+    parser.add_argument('--python', default=sys.executable, help='Interpreter that runs csv_tool.py')
+    parser.add_argument('--output', help='Write the JSON results here (default: stdout)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Results JSON of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Fail when a command is this fraction slower than the baseline')
+    parser.add_argument('--rss-threshold', type=float,
+                        help='Also fail when peak RSS grows by more than this fraction')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Ignore timing changes of commands faster than this in the baseline')
+    parser.add_argument('--generate', nargs=4, metavar=('NAME', 'ROWS', 'DIR', 'SEED'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        name, rows, data_dir, seed = args.generate
+        write_dataset(data_dir, name, int(rows), int(seed))
+        return
+
+    sizes = parse_sizes(args.sizes)
+    datasets = pick(args.datasets, GENERATORS, 'dataset')
+    commands = pick(args.commands, COMMANDS, 'command')
+    # lookup needs the index built just before it
+    if 'lookup' in commands and 'index' not in commands:
+        commands.insert(commands.index('lookup'), 'index')
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    tmp = tempfile.TemporaryDirectory()
+    data_dir = args.data_dir or tmp.name
+    os.makedirs(data_dir, exist_ok=True)
+    out_dir = os.path.join(tmp.name, 'out')
+    os.makedirs(out_dir)
+
+    results = []
+    try:
+        for rows in sizes:
+            for name in datasets:
+                data, dim = generate(data_dir, name, rows)
+                for command in commands:
+                    r = bench_command(args.python, command, data, dim, rows, out_dir, args.repeat, args.workers)
+                    r = {'dataset': name, 'rows': rows, **r}
+                    results.append(r)
+                    print(json.dumps(r), file=sys.stderr)
+                if not args.data_dir:
+                    os.remove(data)
+                    os.remove(dim)
+    finally:
+        tmp.cleanup()
+
+    report = {'environment': environment(args.python), 'repeat': args.repeat, 'workers': args.workers,
+              'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    failed = [r for r in results if 'error' in r]
+    for r in failed:
+        print(f"Error: {r['command']} on {r['dataset']} {r['rows']:,} failed: {r['error']}", file=sys.stderr)
+    regressions = compare(results, baseline, args.threshold, args.rss_threshold, args.min_seconds) if baseline else []
+    for line in regressions:
+        print(f"Regression: {line}", file=sys.stderr)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
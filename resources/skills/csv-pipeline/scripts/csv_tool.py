@@ -1,441 +1,4912 @@
 #!/usr/bin/env python3
 """
 All-in-one CSV/JSON data processing tool.
-Supports: inspect, filter, sort, dedup, aggregate, join, convert, report, clean.
-No external dependencies — uses only Python 3 standard library.
+Supports: inspect, filter, select, sort, top, window, dedup, aggregate, join, convert, report,
+clean, cache, index, lookup, pipe.
+No external dependencies — uses only Python 3 standard library. Parquet and
+Arrow IPC/Feather files additionally need pyarrow, which then also runs
+filter/sort/aggregate/join on them inside its compute kernels.
 """
 
 import csv
+import functools
+import hashlib
+import io
 import json
+import math
+import mmap
+import multiprocessing
+import re
+import shlex
 import sys
 import argparse
-from collections import defaultdict
+import bisect
+import collections
+import contextlib
+import heapq
+import itertools
+import operator
+import os
+import pickle
+import queue
+import random
+import shutil
+import tempfile
+import threading
+from array import array
+from collections import namedtuple
 
 
 # ---------------------------------------------------------------------------
 # I/O helpers
 # ---------------------------------------------------------------------------
 
-def read_data(path, delimiter=None):
-    """Read CSV/TSV/JSON/JSONL into list of dicts."""
+# Compression suffix -> codec. Inputs without one are still sniffed by magic bytes.
+COMPRESSION_EXTS = {'gz': 'gzip', 'gzip': 'gzip', 'bz2': 'bz2', 'xz': 'xz', 'lzma': 'lzma',
+                    'zst': 'zstd', 'zstd': 'zstd'}
+_COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'), (b'\x28\xb5\x2f\xfd', 'zstd'))
+
+
+def _ext(path):
+    """Lower-cased data-format extension of ``path`` ('' when there is none).
+
+    A compression suffix is skipped, so ``data.csv.gz`` is 'csv'.
+    """
+    name = path.lower()
+    ext = name.rsplit('.', 1)[-1] if '.' in name else ''
+    if ext in COMPRESSION_EXTS:
+        name = name[:-len(ext) - 1]
+        ext = name.rsplit('.', 1)[-1] if '.' in name else ''
+    return ext
+
+
+def strip_compression(path):
+    """``path`` without its compression suffix (``out.csv.gz`` -> ``out.csv``)."""
+    base, _, ext = path.rpartition('.')
+    return base if base and ext.lower() in COMPRESSION_EXTS else path
+
+
+def compression_of(path, sniff=True):
+    """Codec name ('gzip', 'bz2', 'xz', 'lzma', 'zstd') of ``path``, or None.
+
+    The extension decides; otherwise, with ``sniff``, an existing file's
+    first bytes are matched against the codecs' magic numbers.
+    """
     ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if ext in COMPRESSION_EXTS:
+        return COMPRESSION_EXTS[ext]
+    if not sniff or not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, codec in _COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return codec
+    if head[:3] == b'BZh' and head[3:4].isdigit() and head[3:4] != b'0':
+        return 'bz2'
+    return None
+
+
+def _zstd(path):
+    """The zstd module (stdlib on 3.14+, else zstandard), or exit with an install hint."""
+    try:
+        from compression import zstd  # Python 3.14+
+    except ImportError:
+        try:
+            import zstandard as zstd
+        except ImportError:
+            print(f"Error: zstandard is required for {path}. Install with: pip install zstandard",
+                  file=sys.stderr)
+            sys.exit(1)
+    return zstd
+
+
+def _compressor_file(path, codec):
+    """Binary file object writing ``path`` through ``codec``."""
+    if codec == 'gzip':
+        import gzip
+        return gzip.open(path, 'wb', compresslevel=6)
+    if codec == 'bz2':
+        import bz2
+        return bz2.open(path, 'wb')
+    if codec in ('xz', 'lzma'):
+        import lzma
+        return lzma.open(path, 'wb', format=lzma.FORMAT_ALONE if codec == 'lzma' else lzma.FORMAT_XZ)
+    return _zstd(path).open(path, 'wb')
+
+
+def _decompressor(path, codec):
+    """Factory of one-stream decompressor objects (``decompress``/``eof``/``unused_data``)."""
+    if codec == 'gzip':
+        import zlib
+        return lambda: zlib.decompressobj(wbits=31)
+    if codec == 'bz2':
+        import bz2
+        return bz2.BZ2Decompressor
+    if codec in ('xz', 'lzma'):
+        import lzma
+        return lzma.LZMADecompressor
+    zstd = _zstd(path)
+    if hasattr(zstd, 'ZstdDecompressor') and not hasattr(zstd.ZstdDecompressor, 'decompressobj'):
+        return zstd.ZstdDecompressor
+    return lambda: zstd.ZstdDecompressor().decompressobj()
+
+
+class _Prefetcher(io.RawIOBase):
+    """Read-only binary stream of ``path`` decompressed ahead by a thread.
+
+    The thread feeds large compressed blocks straight to the codec's
+    decompressor, which releases the GIL for the whole call, so the next
+    blocks are inflated while the caller parses the current one.
+    Concatenated streams (``cat a.gz b.gz``) are read through. At most
+    ``depth`` decompressed blocks are held in flight.
+    """
+
+    _EOF = object()
+
+    def __init__(self, path, codec, block_size=1 << 17, depth=4):
+        super().__init__()
+        self._new = _decompressor(path, codec)
+        self._raw = open(path, 'rb')
+        self._block_size = block_size
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._buf = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._fill, name='csv_tool-decompress', daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        try:
+            d = self._new()
+            while not self._stop.is_set():
+                data = self._raw.read(self._block_size)
+                if not data:
+                    break
+                while data:
+                    out = d.decompress(data)
+                    if out:
+                        self._queue.put(out)
+                    data = b''
+                    if getattr(d, 'eof', False):
+                        data = d.unused_data
+                        # Trailing NUL padding after the last member is not another stream
+                        if data.strip(b'\0'):
+                            d = self._new()
+                        else:
+                            data = b''
+            self._queue.put(self._EOF)
+        except BaseException as e:  # surfaced on the reading side
+            self._queue.put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self._buf:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is self._EOF:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._buf = memoryview(item)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            # Unblock a producer waiting on a full queue, then let it see the flag
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            self._raw.close()
+        super().close()
+
+
+def open_data(path, mode='r', encoding='utf-8', newline=None, buffering=-1):
+    """``open()`` for data files that transparently (de)compresses.
+
+    Reading detects gzip/bz2/xz/zstd by extension or magic bytes and
+    decompresses on a background thread; writing compresses when ``path``
+    carries a compression suffix. ``mode`` is 'r', 'w', 'rb' or 'wb'.
+    """
+    codec = compression_of(path, sniff='r' in mode)
+    if codec is None:
+        if 'b' in mode:
+            return open(path, mode, buffering=buffering)
+        return open(path, mode, encoding=encoding, newline=newline, buffering=buffering)
+    if 'r' in mode:
+        stream = io.BufferedReader(_Prefetcher(path, codec), 1 << 16)
+    else:
+        stream = io.BufferedWriter(_compressor_file(path, codec), buffering if buffering > 0 else 1 << 16)
+    if 'b' in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+
+def _is_delimited(path):
+    """True for CSV/TSV (and extension-less) inputs, which are read with ``csv.reader``."""
+    return _ext(path) not in ('json', 'jsonl', 'ndjson') and _ext(path) not in ARROW_FORMATS
+
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    """Incrementally decode a top-level JSON array, yielding one element at a time.
+
+    A top-level object (or any non-array value) is yielded as a single row.
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size)
+    eof = not buf
+    pos = 0
+
+    def skip(chars):
+        nonlocal buf, pos, eof
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            buf, pos = f.read(chunk_size), 0
+            eof = not buf
+
+    skip(' \t\r\n')
+    if pos >= len(buf):
+        return
+    if buf[pos] != '[':
+        yield json.loads(buf[pos:] + f.read())
+        return
+    pos += 1
+
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON array")
+        if buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+            # A scalar cut at the chunk edge would decode "successfully" as a prefix
+            if end == len(buf) and not eof:
+                raise json.JSONDecodeError("chunk boundary", buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(max(chunk_size, len(buf)))
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield obj
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_data(path, delimiter=None):
+    """Yield rows of a CSV/TSV/JSON/JSONL/Parquet/Arrow file as dicts without loading the file."""
+    ext = _ext(path)
+
+    if ext in ARROW_FORMATS:
+        yield from iter_arrow_rows(path)
+        return
+
+    if ext in ('json',):
+        with open_data(path) as f:
+            yield from _iter_json_array(f)
+        return
+
+    if ext in ('jsonl', 'ndjson'):
+        with open_data(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+
+    # CSV / TSV
+    if delimiter is None:
+        delimiter = '\t' if ext == 'tsv' else ','
+    with open_data(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def csv_header(path, delimiter=None):
+    """Column names of a CSV/TSV file (its first record)."""
+    if delimiter is None:
+        delimiter = '\t' if _ext(path) == 'tsv' else ','
+    with open_data(path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f, delimiter=delimiter), [])
+
+
+def read_data(path, delimiter=None):
+    """Read CSV/TSV/JSON/JSONL/Parquet/Arrow into list of dicts."""
+    return list(iter_data(path, delimiter))
+
+
+_WRITE_BUFFER = 1 << 20
+
+
+def json_style(pretty=False):
+    """``json.dumps`` keyword arguments: compact by default, ``indent=2`` when ``pretty``."""
+    if pretty:
+        return {'indent': 2, 'ensure_ascii': False}
+    return {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def _is_stdout(path):
+    return not path or path == '-'
+
+
+class _Output:
+    """Context manager for a 1 MiB-buffered text stream to ``path``, or to stdout for None/'-'.
+
+    A ``path`` ending in a compression suffix (``.gz``, ``.bz2``, ``.xz``,
+    ``.zst``) is compressed on the way out.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def __enter__(self):
+        if not _is_stdout(self.path):
+            self.f = open_data(self.path, 'w', newline='', buffering=_WRITE_BUFFER)
+            return self.f
+        try:
+            fd = sys.stdout.fileno()
+        except (AttributeError, OSError, ValueError):
+            self.f = None
+            return sys.stdout
+        sys.stdout.flush()
+        self.f = open(fd, 'w', newline='', encoding='utf-8', buffering=_WRITE_BUFFER, closefd=False)
+        return self.f
+
+    def __exit__(self, *exc):
+        if self.f is not None:
+            self.f.close()
+
+
+def _counted(rows, counter):
+    """Pass ``rows`` through, advancing ``counter`` once per row at C speed.
+
+    The row is pulled first, so ``next(counter)`` afterwards is the row count.
+    """
+    return map(operator.itemgetter(0), zip(rows, counter))
+
+
+def dict_tuples(fields, rows):
+    """Row dicts as tuples in ``fields`` order ('' for missing keys)."""
+    if len(fields) == 1:
+        get = lambda r, k=fields[0]: (r[k],)
+    else:
+        get = operator.itemgetter(*fields) if fields else (lambda r: ())
+    for r in rows:
+        try:
+            yield get(r)
+        except KeyError:
+            yield tuple(r.get(k, '') for k in fields)
+
+
+def _json_texts(rows, pretty=False):
+    """Each row dict as JSON text, compact unless ``pretty``."""
+    return map(json.JSONEncoder(default=str, **json_style(pretty)).encode, rows)
+
+
+def _json_tuple_texts(fields, rows, pretty=False):
+    """``_json_texts`` for row tuples; all-string rows are encoded without a dict."""
+    if pretty:
+        yield from _json_texts((dict(zip(fields, t)) for t in rows), pretty)
+        return
+    quote = json.encoder.encode_basestring
+    prefixes = [quote(str(k)) + ':' for k in fields]
+    fallback = json.JSONEncoder(default=str, **json_style()).encode
+    for t in rows:
+        try:
+            yield '{' + ','.join(map(operator.add, prefixes, map(quote, t))) + '}'
+        except TypeError:
+            yield fallback(dict(zip(fields, t)))
+
+
+def _json_stream_fmt(fmt, f, path, pretty):
+    """JSON arrays bound for a non-terminal stdout are written as JSON Lines instead."""
+    if fmt == 'json' and _is_stdout(path) and not pretty and not f.isatty():
+        return 'jsonl'
+    return fmt
+
+
+def _write_json_texts(f, texts, fmt):
+    """Write JSON texts as an array ('json') or one per line; returns the count."""
+    counter = itertools.count()
+    texts = _counted(texts, counter)
+    if fmt == 'json':
+        first = next(texts, None)
+        if first is None:
+            f.write('[]\n')
+            return 0
+        # Same layout as json.dump(rows, indent=2) for pretty texts, one object per line otherwise
+        sep = '\n  ' if '\n' in first else '\n'
+        f.write('[' + sep + first.replace('\n', sep))
+        for text in texts:
+            f.write(',' + sep + text.replace('\n', sep))
+        f.write('\n]\n')
+    else:
+        f.writelines(map(operator.add, texts, itertools.repeat('\n')))
+    return next(counter)
+
+
+def _write_csv_tuples(f, fields, rows, delimiter=','):
+    """Header plus row tuples through one ``csv.writer``; returns the row count."""
+    counter = itertools.count()
+    writer = csv.writer(f, delimiter=delimiter)
+    writer.writerow(fields)
+    writer.writerows(_counted(rows, counter))
+    return next(counter)
+
+
+def write_tuples(fields, rows, path=None, fmt=None, delimiter=None, pretty=False):
+    """Stream row tuples (in ``fields`` order) to ``path`` or stdout; returns the row count.
+
+    The format comes from ``fmt`` or the extension of ``path``. On stdout,
+    CSV is written unless ``fmt`` is a JSON format; JSON arrays become JSON
+    Lines there when stdout is not a terminal, so pipes get one record per line.
+    """
+    if fmt is None:
+        fmt = ('' if _is_stdout(path) else _ext(path)) or 'csv'
+    if fmt in ARROW_FORMATS:
+        return write_arrow_rows((dict(zip(fields, t)) for t in rows), path, fmt)
+    with _Output(path) as f:
+        if fmt in ('json', 'jsonl', 'ndjson'):
+            fmt = _json_stream_fmt(fmt, f, path, pretty)
+            return _write_json_texts(f, _json_tuple_texts(fields, rows, pretty), fmt)
+        if delimiter is None:
+            delimiter = '\t' if fmt == 'tsv' else ','
+        return _write_csv_tuples(f, fields, rows, delimiter)
+
+
+def write_data(rows, path, fmt=None, delimiter=None, pretty=False):
+    """Stream an iterable of dicts to CSV/JSON/JSONL/TSV/Parquet/Arrow. Returns the row count.
+
+    CSV columns come from the first row. JSON is compact (one object per
+    line) unless ``pretty``, which restores ``indent=2``.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        print("No rows to write.", file=sys.stderr)
+        return 0
+    rows = itertools.chain([first], rows)
+
+    if fmt is None:
+        fmt = _ext(path) or 'csv'
+
+    if fmt in ARROW_FORMATS:
+        count = write_arrow_rows(rows, path, fmt)
+    elif fmt in ('json', 'jsonl', 'ndjson'):
+        # Rows may not share keys, so JSON keeps the dicts as they are
+        with _Output(path) as f:
+            count = _write_json_texts(f, _json_texts(rows, pretty), _json_stream_fmt(fmt, f, path, pretty))
+    else:
+        fields = list(first)
+        count = write_tuples(fields, dict_tuples(fields, rows), path, fmt, delimiter)
+
+    print(f"Wrote {count} rows to {path}", file=sys.stderr)
+    return count
+
+
+def emit_rows(rows, output=None, fieldnames=None, pretty=False):
+    """Stream rows to ``output`` (format from extension) or to stdout as CSV.
+
+    Returns the number of rows written.
+    """
+    if output:
+        return write_data(rows, output, pretty=pretty)
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return write_tuples(list(fieldnames or []), ())
+    fields = list(first)
+    return write_tuples(fields, dict_tuples(fields, itertools.chain([first], rows)))
+
+
+def emit_tuples(fields, rows, output=None, pretty=False, atomic=False):
+    """``emit_rows`` for row tuples in ``fields`` order; no dict is built per row.
+
+    With ``atomic`` the file is written beside ``output`` and moved into
+    place once complete, so a run that stops midway leaves no partial file.
+    """
+    if not output:
+        return write_tuples(fields, rows)
+    target = output
+    if atomic:
+        head, tail = os.path.split(output)
+        output = os.path.join(head, f'.{os.getpid()}.tmp.{tail}')
+    try:
+        if _ext(output) in ARROW_FORMATS:
+            count = write_tuples(fields, rows, output)
+        else:
+            rows = iter(rows)
+            first = next(rows, None)
+            if first is None:
+                print("No rows to write.", file=sys.stderr)
+                return 0
+            count = write_tuples(fields, itertools.chain([first], rows), output, pretty=pretty)
+    except BaseException:
+        if atomic and os.path.exists(output):
+            os.unlink(output)
+        raise
+    if atomic:
+        os.replace(output, target)
+    print(f"Wrote {count} rows to {target}", file=sys.stderr)
+    return count
+
+
+def to_float(val, default=0.0):
+    """Safely convert a value to float."""
+    if val is None:
+        return default
+    try:
+        return float(str(val).strip())
+    except (ValueError, TypeError):
+        return default
+
+
+def parse_size(text):
+    """Parse a byte size such as '512M', '2G', '64k' or '1048576'."""
+    text = str(text).strip().upper().rstrip('B')
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        print(f"Error: invalid size '{text}' (use e.g. 512M, 2G)", file=sys.stderr)
+        sys.exit(1)
+
+
+def split_list(text):
+    """Split a comma-separated CLI value into stripped, non-empty items."""
+    return [c.strip() for c in text.split(',') if c.strip()] if text else []
+
+
+def _row_size(row):
+    """Rough in-memory footprint of a row dict, used for memory budgets."""
+    return 240 + sum(56 + len(str(v)) for v in row.values())
+
+
+# ---------------------------------------------------------------------------
+# External sort
+# ---------------------------------------------------------------------------
+
+_DEFAULT_MEMORY_LIMIT = '256M'
+_RUN_BATCH = 1024       # rows per pickle record in a spilled run
+_MERGE_FANIN = 128      # max runs open at once during a merge
+
+
+class _Desc:
+    """Sort-key wrapper that inverts ordering, for descending string keys."""
+    __slots__ = ('v',)
+
+    def __init__(self, v):
+        self.v = v
+
+    def __lt__(self, other):
+        return other.v < self.v
+
+    def __eq__(self, other):
+        return self.v == other.v
+
+
+def make_sort_key(columns, orders, numeric):
+    """Build ``(key_fn, reverse)`` for sorting rows by several columns.
+
+    ``orders`` holds 'asc'/'desc' per column (the last one repeats for any
+    remaining columns) and ``numeric`` the set of columns compared as floats.
+    Mixed directions are folded into the key so the sort stays stable.
+    """
+    orders = [orders[min(i, len(orders) - 1)] for i in range(len(columns))]
+    uniform = len(set(orders)) == 1
+
+    parts = []
+    for col, order in zip(columns, orders):
+        flip = not uniform and order == 'desc'
+        if col in numeric:
+            if flip:
+                parts.append(lambda r, c=col: -to_float(r.get(c, '')))
+            else:
+                parts.append(lambda r, c=col: to_float(r.get(c, '')))
+        elif flip:
+            parts.append(lambda r, c=col: _Desc(str(r.get(c, '')).strip().lower()))
+        else:
+            parts.append(lambda r, c=col: str(r.get(c, '')).strip().lower())
+
+    if len(parts) == 1:
+        key_fn = parts[0]
+    else:
+        key_fn = lambda r: tuple(p(r) for p in parts)
+    return key_fn, uniform and orders[0] == 'desc'
+
+
+def _spill_run(rows):
+    """Write rows to an anonymous temp file in pickled batches; return the file."""
+    f = tempfile.TemporaryFile()
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= _RUN_BATCH:
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+            batch = []
+    if batch:
+        pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+
+def _read_run(f, close=True):
+    """Yield the rows of a spilled run, closing the file when exhausted unless ``close`` is False."""
+    try:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+    finally:
+        if close:
+            f.close()
+
+
+def external_sort(rows, key, reverse=False, memory_limit=None, stats=None, sorter=None):
+    """Stable sort of an arbitrarily large row stream within a memory budget.
+
+    Rows are collected into runs of at most ``memory_limit`` bytes (estimated),
+    each run is sorted and spilled to a temp file, and the runs are k-way merged
+    with ``heapq.merge``. Input that fits the budget is sorted in memory.
+    ``stats`` (a dict) receives the row and run counts. ``sorter(rows)``, if
+    given, returns a run sorted in the same order as ``key``/``reverse``.
+    """
+    budget = parse_size(memory_limit or _DEFAULT_MEMORY_LIMIT)
+    if sorter is None:
+        def sorter(run):
+            run.sort(key=key, reverse=reverse)
+            return run
+    runs = []
+    buf, used, count = [], 0, 0
+    for r in rows:
+        buf.append(r)
+        count += 1
+        used += _row_size(r)
+        if used >= budget:
+            runs.append(_spill_run(sorter(buf)))
+            buf, used = [], 0
+    buf = sorter(buf)
+
+    if stats is not None:
+        stats['rows'] = count
+        stats['runs'] = len(runs) + (1 if buf or not runs else 0)
+    if not runs:
+        return iter(buf)
+    if buf:
+        runs.append(_spill_run(buf))
+        buf = None
+
+    # Runs are kept in input order, so merging neighbours preserves stability
+    while len(runs) > _MERGE_FANIN:
+        runs = [
+            _spill_run(heapq.merge(*map(_read_run, runs[i:i + _MERGE_FANIN]), key=key, reverse=reverse))
+            for i in range(0, len(runs), _MERGE_FANIN)
+        ]
+    return heapq.merge(*map(_read_run, runs), key=key, reverse=reverse)
+
+
+# ---------------------------------------------------------------------------
+# Hash join
+# ---------------------------------------------------------------------------
+
+JOIN_TYPES = ('inner', 'left', 'right', 'outer', 'semi', 'anti')
+_MAX_PARTITIONS = 128
+_MAX_JOIN_DEPTH = 3
+
+
+def _key_fn(columns):
+    """Key extractor for join/dedup columns: a str, or a tuple for several."""
+    if len(columns) == 1:
+        col = columns[0]
+        return lambda r: str(r.get(col, ''))
+    return lambda r: tuple(str(r.get(c, '')) for c in columns)
+
+
+def _peek(rows):
+    """Return ``(first_row_or_None, iterator_over_all_rows)``."""
+    rows = iter(rows)
+    first = next(rows, None)
+    return first, rows if first is None else itertools.chain([first], rows)
+
+
+def _partition(rows, key, count, salt):
+    """Hash-partition rows into ``count`` spilled temp files (see ``_read_run``)."""
+    files = [tempfile.TemporaryFile() for _ in range(count)]
+    buffers = [[] for _ in range(count)]
+    for r in rows:
+        i = hash((salt, key(r))) % count
+        buf = buffers[i]
+        buf.append(r)
+        if len(buf) >= _RUN_BATCH:
+            pickle.dump(buf, files[i], pickle.HIGHEST_PROTOCOL)
+            buffers[i] = []
+    for f, buf in zip(files, buffers):
+        if buf:
+            pickle.dump(buf, f, pickle.HIGHEST_PROTOCOL)
+        f.seek(0)
+    return files
+
+
+class HashJoin:
+    """Hash join that builds on one side and streams the other.
+
+    The build side is hashed in memory; if it outgrows ``budget`` bytes the
+    join falls back to a grace hash join: both sides are hash-partitioned to
+    disk and each partition pair is joined independently (recursively, with a
+    fresh salt, for skewed partitions).
+    """
+
+    def __init__(self, on, how, left_fields, right_fields, build_left=False, budget=None, partitions=8):
+        self.how = how
+        self.build_left = build_left
+        self.budget = budget
+        self.partitions = max(2, min(partitions, _MAX_PARTITIONS))
+        self.key = _key_fn(on)
+        self.spilled = 0
+
+        on_set = set(on)
+        self.right_extra = [c for c in right_fields if c not in on_set]
+        self.blank_left = dict.fromkeys(left_fields, '')
+        self.on = on
+
+    def combine(self, l, r):
+        """Output row for a left/right pair; either side may be None."""
+        if l is None:
+            row = dict(self.blank_left)
+            for c in self.on:
+                row[c] = r.get(c, '')
+        else:
+            row = dict(l)
+        if r is None:
+            for c in self.right_extra:
+                row[c] = ''
+        else:
+            for c in self.right_extra:
+                row[c] = r.get(c, '')
+        return row
+
+    def run(self, left, right):
+        """Yield joined rows for the ``left`` and ``right`` row iterators."""
+        build, probe = (left, right) if self.build_left else (right, left)
+        return self._join(build, probe, 0)
+
+    def _join(self, build, probe, depth):
+        key = self.key
+        index = {}
+        order = []
+        used = 0
+        build = iter(build)
+        for r in build:
+            k = key(r)
+            hits = index.get(k)
+            if hits is None:
+                index[k] = [r]
+            else:
+                hits.append(r)
+            order.append((k, r))
+            used += _row_size(r)
+            if self.budget and used > self.budget and depth < _MAX_JOIN_DEPTH:
+                index = None
+                replay = itertools.chain((row for _, row in order), build)
+                yield from self._grace(replay, probe, depth)
+                return
+        yield from self._probe(index, order, probe)
+
+    def _grace(self, build, probe, depth):
+        self.spilled += 1
+        bparts = _partition(build, self.key, self.partitions, depth)
+        pparts = _partition(probe, self.key, self.partitions, depth)
+        for bf, pf in zip(bparts, pparts):
+            yield from self._join(_read_run(bf), _read_run(pf), depth + 1)
+
+    def _probe(self, index, order, probe):
+        how, key, combine = self.how, self.key, self.combine
+        matched = set()
+
+        if self.build_left:
+            for r in probe:
+                k = key(r)
+                hits = index.get(k)
+                if hits:
+                    matched.add(k)
+                    if how in ('semi', 'anti'):
+                        continue
+                    for l in hits:
+                        yield combine(l, r)
+                elif how in ('right', 'outer'):
+                    yield combine(None, r)
+            # Left rows are replayed in input order
+            if how == 'semi':
+                yield from (l for k, l in order if k in matched)
+            elif how == 'anti':
+                yield from (l for k, l in order if k not in matched)
+            elif how in ('left', 'outer'):
+                yield from (combine(l, None) for k, l in order if k not in matched)
+            return
+
+        track = how in ('right', 'outer')
+        for l in probe:
+            k = key(l)
+            hits = index.get(k)
+            if how == 'semi':
+                if hits:
+                    yield l
+            elif how == 'anti':
+                if not hits:
+                    yield l
+            elif hits:
+                if track:
+                    matched.add(k)
+                for r in hits:
+                    yield combine(l, r)
+            elif how in ('left', 'outer'):
+                yield combine(l, None)
+        if track:
+            yield from (combine(None, r) for k, r in order if k not in matched)
+
+
+# ---------------------------------------------------------------------------
+# Dedup
+# ---------------------------------------------------------------------------
+
+_DIGEST_ENTRY_BYTES = 120   # set/dict slot plus a 16-byte bytes object
+
+
+def make_digest(key_cols=None):
+    """Return ``row -> 16-byte blake2b digest`` of ``key_cols`` or of the whole row.
+
+    Whole-row digests hash the values in sorted field order, so rows with the
+    same fields in a different order (JSON) still collide; rows with a
+    different field set hash their ``name=value`` pairs instead.
+    """
+    blake = hashlib.blake2b
+
+    if key_cols:
+        def digest(r):
+            return blake('\x1f'.join([str(r.get(c, '')) for c in key_cols]).encode('utf-8', 'surrogatepass'),
+                         digest_size=16).digest()
+        return digest
+
+    first = {}
+
+    def digest(r):
+        if not first:
+            first['keys'] = r.keys()
+            first['get'] = operator.itemgetter(*sorted(r)) if len(r) > 1 else (lambda d, k=next(iter(r), None): (d.get(k, ''),))
+        if r.keys() == first['keys']:
+            vals = first['get'](r)
+            try:
+                text = '\x1f'.join(vals)
+            except TypeError:
+                text = '\x1f'.join(map(str, vals))
+        else:
+            text = '\x1e' + '\x1f'.join(f'{k}={v}' for k, v in sorted(r.items(), key=lambda kv: str(kv[0])))
+        return blake(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    return digest
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte digests (double hashing)."""
+    __slots__ = ('bits', 'size', 'hashes', 'capacity', 'added')
+
+    def __init__(self, capacity, fp_rate=0.001):
+        capacity = max(1, int(capacity))
+        self.size = max(64, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.added = 0
+
+    def add(self, digest):
+        """Insert ``digest``; return True if it was (probably) not present yet."""
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        bits, size = self.bits, self.size
+        new = False
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self.added += 1
+        return new
+
+
+def _estimate_rows(path, sample=1 << 20):
+    """Rough row count from the newline density of the first ``sample`` bytes."""
+    if _ext(path) in ARROW_FORMATS:
+        return max(1, arrow_dataset(path).count_rows())
+    size = os.path.getsize(path)
+    with open_data(path, 'rb') as f:
+        head = f.read(sample)
+    lines = head.count(b'\n') or 1
+    if compression_of(path):
+        if len(head) < sample:
+            return max(1, lines)
+        size *= 5  # typical text compression ratio; overestimating only costs Bloom memory
+    return max(1, int(size / max(1, len(head)) * lines * 1.2))
+
+
+class Deduper:
+    """Duplicate removal over ``(digest, row)`` streams.
+
+    Exact mode keeps the first (or last) occurrence in input order. Up to
+    ``max_keys`` digests are held in memory; beyond that the remaining
+    records are hash-partitioned to disk, deduplicated partition by partition
+    and merged back by row index. With a ``bloom`` filter, keep-first runs
+    in one pass with bounded memory and a small false-positive rate.
+    """
+
+    def __init__(self, keep='first', max_keys=None, bloom=None, partitions=16):
+        self.keep = keep
+        self.max_keys = max_keys or float('inf')
+        self.bloom = bloom
+        self.partitions = max(2, min(partitions, _MAX_PARTITIONS))
+        self.spilled = False
+
+    def run(self, source):
+        """``source()`` returns a fresh (digest, row) iterator; keep='last' calls it twice."""
+        if self.bloom is not None:
+            return (r for d, r in source() if self.bloom.add(d))
+        if self.keep == 'first':
+            return self._first(source())
+        return self._last(source)
+
+    def _first(self, pairs):
+        seen = set()
+        pairs = enumerate(pairs)
+        for _, (d, r) in pairs:
+            if d in seen:
+                continue
+            seen.add(d)
+            yield r
+            if len(seen) > self.max_keys:
+                # Digests emitted so far travel with the rest as index -1
+                emitted = ((-1, e, None) for e in seen)
+                rest = ((i, d, r) for i, (d, r) in pairs)
+                yield from self._partitioned(itertools.chain(emitted, rest))
+                return
+
+    def _last(self, source):
+        last = {}
+        for i, (d, _) in enumerate(source()):
+            last[d] = i
+            if len(last) > self.max_keys:
+                last = None
+                break
+        if last is None:
+            yield from self._partitioned((i, d, r) for i, (d, r) in enumerate(source()))
+            return
+        for i, (d, r) in enumerate(source()):
+            if last[d] == i:
+                yield r
+
+    def _partitioned(self, records):
+        self.spilled = True
+        parts = _partition(records, operator.itemgetter(1), self.partitions, 'dedup')
+        survivors = [_spill_run(self._dedup_partition(_read_run(f))) for f in parts]
+        merged = heapq.merge(*map(_read_run, survivors), key=operator.itemgetter(0))
+        return (r for _, r in merged)
+
+    def _dedup_partition(self, records):
+        """Surviving ``(index, row)`` pairs of one partition, in index order."""
+        if self.keep == 'last':
+            last = {}
+            for i, d, r in records:
+                last[d] = (i, r)
+            return sorted(last.values(), key=operator.itemgetter(0))
+        seen = set()
+        out = []
+        for i, d, r in records:
+            if d not in seen:
+                seen.add(d)
+                if i >= 0:
+                    out.append((i, r))
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Vectorized numeric path (optional NumPy)
+# ---------------------------------------------------------------------------
+
+_VECTOR_MIN_ROWS = 256   # below this the per-call NumPy overhead outweighs the gain
+_numpy_mod = None
+
+
+def _numpy():
+    """numpy, or None when it is not installed."""
+    global _numpy_mod
+    if _numpy_mod is None:
+        try:
+            import numpy
+            _numpy_mod = numpy
+        except ImportError:
+            _numpy_mod = False
+    return _numpy_mod or None
+
+
+def np_parse_floats(np, cells):
+    """Bulk-parse cell strings into ``(values, numeric, non_empty)`` arrays.
+
+    ``values`` is float64 with NaN wherever ``numeric`` is False (empty or
+    non-numeric cells). Numeric columns, with or without blanks, convert with
+    one C-level ``map(float)`` (faster than NumPy's own string cast);
+    otherwise each distinct cell is converted once and looked up per row.
+    """
+    n = len(cells)
+    try:
+        vals = np.fromiter(map(float, cells), np.float64, n)
+        ones = np.ones(n, dtype=bool)
+        return vals, ones, ones
+    except (ValueError, TypeError):
+        pass
+    present = np.fromiter(map(bool, cells), bool, n)
+    try:
+        vals = np.fromiter(map(float, [c or 'nan' for c in cells]), np.float64, n)
+        return vals, present, present
+    except (ValueError, TypeError):
+        pass
+    table, ok = {}, {}
+    for c in set(cells):
+        try:
+            table[c] = float(c)
+            ok[c] = True
+        except (ValueError, TypeError):
+            table[c] = _NAN
+            ok[c] = False
+    vals = np.fromiter(map(table.__getitem__, cells), np.float64, n)
+    numeric = np.fromiter(map(ok.__getitem__, cells), bool, n)
+    non_empty = numeric | (present & np.fromiter(map(bool, map(str.strip, cells)), bool, n))
+    return vals, numeric, non_empty
+
+
+def np_group_codes(np, keycols):
+    """``(keys, inverse)``: distinct key tuples (sorted) and each row's group index."""
+    if len(keycols) == 1:
+        uniq, inv = np.unique(np.asarray(keycols[0], dtype=str), return_inverse=True)
+        return [(k,) for k in uniq.tolist()], inv.ravel()
+    levels, codes = [], []
+    for col in keycols:
+        uniq, inv = np.unique(np.asarray(col, dtype=str), return_inverse=True)
+        levels.append(uniq.tolist())
+        codes.append(inv.ravel())
+    dims = [len(level) for level in levels]
+    if math.prod(dims) < 1 << 62:
+        combined = np.ravel_multi_index(codes, dims)
+        uniq, inv = np.unique(combined, return_inverse=True)
+        parts = np.unravel_index(uniq, dims)
+    else:
+        uniq, inv = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+        parts = uniq.T
+    keys = list(zip(*([level[i] for i in part.tolist()] for level, part in zip(levels, parts))))
+    return keys, inv.ravel()
+
+
+class _NumpyWhere:
+    """Evaluates a --where AST over a batch of projected columns into a boolean mask.
+
+    Mirrors ``_WhereCompiler``: numeric comparisons see NaN for non-numeric
+    cells, text comparisons the stripped cell.
+    """
+
+    def __init__(self, np, columns, cells):
+        self.np = np
+        self.index = {c: i for i, c in enumerate(columns)}
+        self.cells = cells
+        self.size = len(cells[0]) if cells else 0
+        self.memo = {}
+
+    def text(self, tok):
+        if tok[0] != 'col':
+            return str(tok[1])
+        key = ('text', tok[1])
+        if key not in self.memo:
+            self.memo[key] = self.np.char.strip(self.np.asarray(self.cells[self.index[tok[1]]], dtype=str))
+        return self.memo[key]
+
+    def number(self, tok):
+        if tok[0] != 'col':
+            return _num(tok[1])
+        key = ('num', tok[1])
+        if key not in self.memo:
+            self.memo[key] = np_parse_floats(self.np, self.cells[self.index[tok[1]]])[0]
+        return self.memo[key]
+
+    def full(self, value):
+        return self.np.full(self.size, bool(value))
+
+    def mask(self, node):
+        np = self.np
+        kind = node[0]
+        if kind in ('and', 'or'):
+            parts = [self.mask(n) for n in node[1]]
+            return functools.reduce(np.logical_and if kind == 'and' else np.logical_or, parts)
+        if kind == 'not':
+            return ~self.mask(node[1])
+        if kind == 'cmp':
+            _, op, left, right = node
+            numeric = 'num' in (left[0], right[0])
+            if op not in ('==', '!=') and not numeric:
+                numeric = all(t[0] == 'col' or _num(t[1]) == _num(t[1]) for t in (left, right))
+            get = self.number if numeric else self.text
+            result = _CMP_FUNCS[op](get(left), get(right))
+            return result if isinstance(result, np.ndarray) else self.full(result)
+        if kind == 'in':
+            _, operand, items, negate = node
+            if all(t[0] == 'num' for t in items):
+                hit = np.isin(self.number(operand), [_num(t[1]) for t in items])
+            else:
+                hit = np.isin(self.text(operand), [str(t[1]) for t in items])
+            return ~hit if negate else hit
+        if kind == 'match':
+            _, operand, pattern, negate = node
+            search = re.compile(str(pattern)).search
+            values = self.text(operand)
+            values = values.tolist() if isinstance(values, np.ndarray) else [values] * self.size
+            hit = np.fromiter((search(v) is not None for v in values), dtype=bool, count=self.size)
+            return ~hit if negate else hit
+        if kind == 'empty':
+            _, operand, negate = node
+            hit = np.asarray(self.text(operand) == '')
+            hit = hit if hit.ndim else self.full(hit)
+            return ~hit if negate else hit
+        _, op, operand, literal = node
+        lowered = np.char.lower(np.asarray(self.text(operand), dtype=str))
+        needle = literal.lower()
+        if op == 'contains':
+            hit = np.char.find(lowered, needle) >= 0
+        elif op == 'startswith':
+            hit = np.char.startswith(lowered, needle)
+        else:
+            hit = np.char.endswith(lowered, needle)
+        return hit if hit.ndim else self.full(hit)
+
+
+def make_batch_predicate(where=None, column=None, op=None, value=None):
+    """Vectorized counterpart of ``make_predicate``, or None without NumPy.
+
+    Returns ``mask(cells)`` where ``cells`` holds one sequence per predicate
+    column (in ``make_predicate`` order) and the result is a bool array.
+    """
+    np = _numpy()
+    if np is None:
+        return None
+    if where:
+        columns, _ = make_predicate(where)
+        node = _WhereParser(where).parse()
+        return lambda cells: _NumpyWhere(np, columns, cells).mask(node)
+
+    val_f = to_float(value)
+    val_l = value.lower()
+
+    def mask(cells):
+        if op in ('gt', 'gte', 'lt', 'lte'):
+            vals, numeric, _ = np_parse_floats(np, cells[0])
+            # to_float() semantics: anything unparseable counts as 0
+            vals[~numeric] = 0.0
+            return _CMP_FUNCS[{'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}[op]](vals, val_f)
+        text = np.char.strip(np.asarray(cells[0], dtype=str))
+        if op == 'eq':
+            return text == value
+        if op == 'neq':
+            return text != value
+        lowered = np.char.lower(text)
+        if op == 'contains':
+            return np.char.find(lowered, val_l) >= 0
+        if op == 'startswith':
+            return np.char.startswith(lowered, val_l)
+        if op == 'endswith':
+            return np.char.endswith(lowered, val_l)
+        return np.zeros(len(text), dtype=bool)
+
+    return mask
+
+
+def numpy_sorter(columns, orders, numeric):
+    """In-memory run sorter matching ``make_sort_key``, or None without NumPy.
+
+    Each key column becomes one array (floats, or codes of the trimmed,
+    lower-cased text) and rows are ordered with a stable ``lexsort``.
+    """
+    np = _numpy()
+    if np is None:
+        return None
+    orders = [orders[min(i, len(orders) - 1)] for i in range(len(columns))]
+
+    def sort_rows(rows):
+        if len(rows) < _VECTOR_MIN_ROWS:
+            key_fn, reverse = make_sort_key(columns, orders, numeric)
+            rows.sort(key=key_fn, reverse=reverse)
+            return rows
+        keys = []
+        for col, order in zip(columns, orders):
+            if col in numeric:
+                cells = ['' if r.get(col) is None else str(r.get(col)) for r in rows]
+                vals, ok, _ = np_parse_floats(np, cells)
+                vals[~ok] = 0.0
+                key = vals
+            else:
+                text = np.char.lower(np.char.strip(np.asarray([str(r.get(col, '')) for r in rows], dtype=str)))
+                key = np.unique(text, return_inverse=True)[1].ravel()
+            # Negated keys in a stable ascending sort keep ties in input order,
+            # like list.sort(reverse=True)
+            keys.append(-key if order == 'desc' else key)
+        order_idx = np.lexsort(keys[::-1]) if len(keys) > 1 else np.argsort(keys[0], kind='stable')
+        return list(operator.itemgetter(*order_idx.tolist())(rows))
+
+    return sort_rows
+
+
+# ---------------------------------------------------------------------------
+# Columnar loader
+# ---------------------------------------------------------------------------
+
+_BATCH_ROWS = 65536
+# Batches that keep whole parsed rows alive (vectorized filtering) stay small:
+# thousands of live row lists make the cyclic GC rescan them repeatedly.
+_MASK_BATCH_ROWS = 4096
+
+
+class ColumnBatch:
+    """A slice of rows stored column-wise.
+
+    ``keys[col]`` holds the raw cell strings of a key column; ``values[col]`` is
+    ``(array('d'), bytearray)`` — parsed floats plus a validity mask where 1
+    marks a non-empty cell (non-numeric text parses as 0.0, like ``to_float``).
+    """
+    __slots__ = ('size', 'keys', 'values')
+
+    def __init__(self, size, keys, values):
+        self.size = size
+        self.keys = keys
+        self.values = values
+
+
+def parse_float_column(cells):
+    """Parse a sequence of cells into ``(array('d'), validity bytearray)``."""
+    np = _numpy() if len(cells) >= _VECTOR_MIN_ROWS else None
+    if np is not None:
+        vals, numeric, non_empty = np_parse_floats(np, ['' if c is None else str(c) for c in cells])
+        vals[~numeric] = 0.0
+        out = array('d')
+        out.frombytes(vals.tobytes())
+        return out, bytearray(non_empty.view(np.uint8).tobytes())
+    try:
+        return array('d', map(float, cells)), bytearray(b'\x01') * len(cells)
+    except (ValueError, TypeError):
+        pass
+    vals = array('d')
+    valid = bytearray(len(cells))
+    append = vals.append
+    for i, c in enumerate(cells):
+        try:
+            append(float(c))
+            valid[i] = 1
+        except (ValueError, TypeError):
+            append(0.0)
+            if c is not None and str(c).strip():
+                valid[i] = 1
+    return vals, valid
+
+
+def _iter_projected(path, columns, delimiter=None, chunk=None):
+    """Yield tuples holding only ``columns`` of each row ('' when absent).
+
+    With ``chunk`` only that byte range of a CSV/JSONL file is parsed.
+    """
+    ext = _ext(path)
+    if ext in ARROW_FORMATS:
+        yield from iter_arrow_projected(path, columns)
+        return
+    if ext in ('json', 'jsonl', 'ndjson'):
+        for r in (iter_chunk(chunk) if chunk else iter_data(path)):
+            yield tuple('' if r.get(c) is None else str(r.get(c)) for c in columns)
+        return
+
+    if delimiter is None:
+        delimiter = '\t' if ext == 'tsv' else ','
+    with (_open_chunk(chunk) if chunk else open_data(path, newline='', encoding='utf-8-sig')) as f:
+        reader = csv.reader(f, delimiter=delimiter, strict=bool(chunk and chunk.strict))
+        header = chunk.fieldnames if chunk else next(reader, None) or []
+        # Later duplicates win, as with csv.DictReader
+        index = {name: i for i, name in enumerate(header)}
+        idx = [index.get(c) for c in columns]
+        if not columns:
+            get = lambda row: ()
+        elif None not in idx:
+            get = operator.itemgetter(*idx) if len(idx) > 1 else (lambda row, i=idx[0]: (row[i],))
+        else:
+            get = lambda row: tuple(row[i] if i is not None else '' for i in idx)
+        for row in reader:
+            if not row:
+                continue
+            try:
+                yield get(row)
+            except IndexError:
+                yield tuple(row[i] if i is not None and i < len(row) else '' for i in idx)
+
+
+def iter_column_batches(path, keys=(), values=(), batch_rows=_BATCH_ROWS, delimiter=None, chunk=None):
+    """Parse only the referenced columns of ``path`` into ``ColumnBatch`` slices.
+
+    Key columns stay strings; value columns are parsed once into typed float
+    buffers. Memory is bounded by ``batch_rows`` regardless of file size.
+    A valid sidecar ``ColumnCache`` is used instead of parsing when present.
+    """
+    keys, values = list(keys), list(values)
+    if chunk is None:
+        cache = ColumnCache.open(path)
+        if cache is not None:
+            with cache:
+                if cache.covers(keys + values):
+                    yield from cache.batches(keys, values, batch_rows)
+                    return
+
+    yield from tuple_batches(_iter_projected(path, keys + values, delimiter, chunk), keys, values, batch_rows)
+
+
+def tuple_batches(rows, keys=(), values=(), batch_rows=_BATCH_ROWS):
+    """Slice tuples laid out as ``keys + values`` into ``ColumnBatch`` objects."""
+    keys, values = list(keys), list(values)
+    columns = keys + values
+    while True:
+        part = list(itertools.islice(rows, batch_rows))
+        if not part:
+            return
+        cols = list(zip(*part)) if columns else []
+        yield ColumnBatch(
+            len(part),
+            {c: cols[i] for i, c in enumerate(keys)},
+            {c: parse_float_column(cols[len(keys) + i]) for i, c in enumerate(values)},
+        )
+
+
+# ---------------------------------------------------------------------------
+# Columnar cache
+# ---------------------------------------------------------------------------
+
+def _align(f):
+    """Pad ``f`` with zeros to the next 8-byte boundary; return the offset."""
+    pos = f.tell()
+    if pos % 8:
+        f.write(b'\0' * (8 - pos % 8))
+    return f.tell()
+
+
+def file_signature(path):
+    """Identity of a source file for sidecar invalidation: path, mtime and size."""
+    st = os.stat(path)
+    return {'source': os.path.abspath(path), 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+class ColumnCache:
+    """Memory-mapped sidecar cache (``<input>.colcache``) of a parsed data file.
+
+    Layout: magic, a JSON header (source path, mtime, size, per-column
+    metadata and section offsets), then 8-byte aligned sections. Every
+    column is dictionary-encoded as uint32 codes plus a UTF-8 string pool;
+    columns whose non-empty values are all numeric also carry float64 values
+    and a validity byte per row. Only the columns a command touches are read.
+    Building holds every column's distinct values; past ``MAX_DISTINCT`` in
+    total the column with the most is left out (``cached`` false, only its
+    non-empty count kept), so unique-id columns do not pull the file into memory.
+    """
+    SUFFIX = '.colcache'
+    MAGIC = b'CSVTOOLCACHE1\n'
+    MAX_DISTINCT = 1 << 21
+
+    def __init__(self, cache_path, header, f, mm, base):
+        self.cache_path = cache_path
+        self.base = base
+        self.header = header
+        self.rows = header['rows']
+        self.columns = {c['name']: c for c in header['columns']}
+        self._f = f
+        self._mm = mm
+        self._pools = {}
+
+    @classmethod
+    def path_for(cls, path):
+        return path + cls.SUFFIX
+
+    @classmethod
+    def open(cls, path, check=True):
+        """Open the cache of ``path``; None when missing, unreadable or stale."""
+        cache_path = cls.path_for(path)
+        try:
+            f = open(cache_path, 'rb')
+        except OSError:
+            return None
+        try:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError('bad magic')
+            size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(size))
+            if check and any(header.get(k) != v for k, v in file_signature(path).items()):
+                raise ValueError('stale')
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            f.close()
+            return None
+        base = len(cls.MAGIC) + 8 + size
+        return cls(cache_path, header, f, mm, base + -base % 8)
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            pass    # a caller still holds a view; the map is freed with it
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _section(self, col, name, fmt):
+        off, nbytes = col[name]
+        off += self.base
+        return memoryview(self._mm)[off:off + nbytes].cast(fmt)
+
+    def pool(self, name):
+        """Decoded string pool of a column (code -> string)."""
+        pool = self._pools.get(name)
+        if pool is None:
+            col = self.columns[name]
+            offsets = self._section(col, 'pool_offsets', 'Q')
+            off = self.base + col['pool'][0]
+            blob = self._mm[off:off + col['pool'][1]]
+            pool = self._pools[name] = [blob[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+        return pool
+
+    def codes(self, name):
+        return self._section(self.columns[name], 'codes', 'I')
+
+    def covers(self, names):
+        """True when each of ``names`` is cached or not a column of the file at all."""
+        return all(self.columns.get(c, {}).get('cached', True) for c in names)
+
+    @classmethod
+    def serves(cls, path, names):
+        """True when ``path`` has a valid cache that covers ``names``."""
+        cache = cls.open(path)
+        if cache is None:
+            return False
+        with cache:
+            return cache.covers(names)
+
+    def float_column(self, name):
+        """``(values, valid)`` views of a numeric column's sections; None for other columns."""
+        col = self.columns[name]
+        if col['numeric']:
+            return self._section(col, 'values', 'd'), self._section(col, 'valid', 'B')
+        return None
+
+    def batches(self, keys, values, batch_rows=_BATCH_ROWS):
+        """Yield ``ColumnBatch`` slices straight from the mapped sections."""
+        key_src = {}
+        for c in keys:
+            key_src[c] = (self.pool(c), self.codes(c)) if c in self.columns else None
+        val_src = {}
+        for c in values:
+            if c not in self.columns:
+                val_src[c] = None
+            elif self.columns[c]['numeric']:
+                val_src[c] = ('typed',) + self.float_column(c)
+            else:
+                table, mask = parse_float_column(self.pool(c))
+                val_src[c] = ('pool', table, mask, self.codes(c))
+
+        for start in range(0, self.rows, batch_rows):
+            end = min(start + batch_rows, self.rows)
+            n = end - start
+            batch_keys = {}
+            for c, src in key_src.items():
+                batch_keys[c] = tuple(map(src[0].__getitem__, src[1][start:end])) if src else ('',) * n
+            batch_vals = {}
+            for c, src in val_src.items():
+                if src is None:
+                    batch_vals[c] = (array('d', bytes(8 * n)), bytearray(n))
+                elif src[0] == 'typed':
+                    vals = array('d')
+                    vals.frombytes(src[1][start:end].cast('B'))
+                    batch_vals[c] = (vals, bytearray(src[2][start:end]))
+                else:
+                    codes = src[3][start:end]
+                    batch_vals[c] = (array('d', map(src[1].__getitem__, codes)),
+                                     bytearray(map(src[2].__getitem__, codes)))
+            yield ColumnBatch(n, batch_keys, batch_vals)
+
+    @classmethod
+    def build(cls, path, batch_rows=_BATCH_ROWS):
+        """Parse ``path`` once and write its sidecar cache; returns the header."""
+        signature = file_signature(path)
+        first = next(iter_data(path), None)
+        fields = [k for k in (first or {}) if k is not None]
+        encoders = [{} for _ in fields]
+        empties = [[] for _ in fields]
+        non_empty = [0] * len(fields)
+        spools = [tempfile.TemporaryFile() for _ in fields]
+        rows = 0
+        projected = _iter_projected(path, fields)
+        try:
+            while True:
+                part = list(itertools.islice(projected, batch_rows))
+                if not part:
+                    break
+                rows += len(part)
+                for j, cells in enumerate(zip(*part)):
+                    enc = encoders[j]
+                    if enc is None:
+                        non_empty[j] += sum(map(bool, map(str.strip, cells)))
+                        continue
+                    seen = len(enc)
+                    codes = array('I', [enc.setdefault(c, len(enc)) for c in cells])
+                    if len(enc) > seen:
+                        empties[j].extend(code for v, code in itertools.islice(enc.items(), seen, None)
+                                          if not v.strip())
+                    non_empty[j] += len(codes) - sum(codes.count(e) for e in empties[j])
+                    codes.tofile(spools[j])
+                while sum(len(enc) for enc in encoders if enc is not None) > cls.MAX_DISTINCT:
+                    j = max(range(len(fields)), key=lambda i: len(encoders[i] or ()))
+                    encoders[j] = empties[j] = None
+                    spools[j].close()
+
+            tmp_path = cls.path_for(path) + '.tmp'
+            columns = []
+            with open(tmp_path, 'wb') as out:
+                # Sections go to a temp body first; the header needs their offsets
+                body = tempfile.TemporaryFile()
+                for j, name in enumerate(fields):
+                    if encoders[j] is None:
+                        columns.append({'name': name, 'cached': False, 'numeric': False, 'unique': None,
+                                        'non_empty': non_empty[j]})
+                        continue
+                    pool = list(encoders[j])
+                    encoders[j] = None
+                    col = {'name': name, 'cached': True, 'unique': len(pool), 'non_empty': non_empty[j]}
+
+                    spool = spools[j]
+                    spool.seek(0)
+                    col['codes'] = [_align(body), rows * 4]
+                    shutil.copyfileobj(spool, body)
+
+                    blobs = [v.encode('utf-8', 'surrogatepass') for v in pool]
+                    offsets = array('Q', itertools.accumulate(map(len, blobs), initial=0))
+                    col['pool_offsets'] = [_align(body), len(offsets) * 8]
+                    offsets.tofile(body)
+                    col['pool'] = [body.tell(), offsets[-1]]
+                    body.writelines(blobs)
+
+                    col['numeric'] = (any(v.strip() for v in pool)
+                                      and all(_is_number(v) for v in pool if v.strip()))
+                    if col['numeric']:
+                        table, mask = parse_float_column(pool)
+                        spool.seek(0)
+                        col['values'] = [_align(body), rows * 8]
+                        valid_parts = tempfile.TemporaryFile()
+                        while True:
+                            codes = array('I')
+                            try:
+                                codes.fromfile(spool, batch_rows)
+                            except EOFError:
+                                pass
+                            if not codes:
+                                break
+                            array('d', map(table.__getitem__, codes)).tofile(body)
+                            valid_parts.write(bytes(map(mask.__getitem__, codes)))
+                        valid_parts.seek(0)
+                        col['valid'] = [_align(body), rows]
+                        shutil.copyfileobj(valid_parts, body)
+                        valid_parts.close()
+                    columns.append(col)
+
+                # Section offsets are relative to the 8-byte aligned body start
+                header = dict(signature, version=1, rows=rows, fields=fields, columns=columns)
+                raw = json.dumps(header).encode('utf-8')
+                out.write(cls.MAGIC)
+                out.write(len(raw).to_bytes(8, 'little'))
+                out.write(raw)
+                _align(out)
+                body.seek(0)
+                shutil.copyfileobj(body, out)
+                body.close()
+            os.replace(tmp_path, cls.path_for(path))
+        finally:
+            for spool in spools:
+                spool.close()
+        return header
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Key index
+# ---------------------------------------------------------------------------
+
+def _key_hashes(keys):
+    """Packed native uint64 blake2b hashes of lookup keys (already stripped)."""
+    blake = hashlib.blake2b
+    return b''.join([blake(k.encode('utf-8', 'surrogatepass'), digest_size=8).digest() for k in keys])
+
+
+def iter_record_batches(f, quoted=True, block_size=1 << 22):
+    """Yield ``(offsets, records)`` lists for the records from the current position of binary ``f``.
+
+    Newlines inside quoted fields do not end a record (``quoted=False``
+    for JSONL). Blocks without a quote character are split in one call;
+    the others are walked line by line tracking quote parity. Empty lines
+    are skipped.
+    """
+    pos = f.tell()
+    carry = b''
+    while True:
+        block = f.read(block_size)
+        data = carry + block
+        if not block:
+            cut = len(data)
+        else:
+            cut = data.rfind(b'\n') + 1
+            if not cut:
+                carry = data
+                continue
+        data, carry = data[:cut], data[cut:]
+        if not data:
+            return
+        lines = data.split(b'\n')
+        if data.endswith(b'\n'):
+            lines.pop()
+        starts = list(itertools.accumulate(map(len, lines), lambda a, n: a + n + 1, initial=pos))
+        pos += len(data)
+        if quoted and b'"' in data:
+            offsets, records, parts = [], [], []
+            odd = False
+            for start, line in zip(starts, lines):
+                if not parts:
+                    first = start
+                parts.append(line)
+                if line.count(b'"') & 1:
+                    odd = not odd
+                if not odd:
+                    offsets.append(first)
+                    records.append(b'\n'.join(parts))
+                    parts = []
+            if parts and block:
+                # The record continues in the next block: parse it again from its start
+                carry = b'\n'.join(parts) + b'\n' + carry
+                pos = first
+            elif parts:
+                offsets.append(first)
+                records.append(b'\n'.join(parts))
+        else:
+            offsets, records = starts[:len(lines)], lines
+        # Empty lines are no record for csv.reader; JSONL also ignores whitespace-only lines
+        keep = None
+        if not quoted:
+            keep = [bool(r.strip()) for r in records]
+        elif b'' in records or b'\r' in records:
+            keep = [r != b'' and r != b'\r' for r in records]
+        if keep is not None and not all(keep):
+            offsets = list(itertools.compress(offsets, keep))
+            records = list(itertools.compress(records, keep))
+        if records:
+            yield offsets, records
+        if not block and not carry:
+            return
+
+
+class KeyIndex:
+    """Persistent index (``<input>.<column>.idx``) of record byte offsets by key.
+
+    Layout follows ``ColumnCache``: magic, a JSON header (source signature,
+    column, format, field names, section offsets), then two 8-byte aligned
+    uint64 sections sorted together: the blake2b hash of each record's
+    stripped key and the record's byte offset. A lookup binary-searches the
+    hashes, then seeks to the candidate records in the memory-mapped source
+    and checks the real key, so hash collisions cost a parse, never a miss.
+    """
+    SUFFIX = '.idx'
+    MAGIC = b'CSVTOOLINDEX1\n'
+
+    def __init__(self, index_path, header, f, mm, base):
+        self.index_path = index_path
+        self.header = header
+        self.column = header['column']
+        self.base = base
+        self._f = f
+        self._mm = mm
+        self.hashes = self._section('hashes')
+        self.offsets = self._section('offsets')
+
+    @classmethod
+    def path_for(cls, path, column):
+        safe = re.sub(r'[^\w.-]', '_', column)
+        return f"{path}.{safe}{cls.SUFFIX}"
+
+    @classmethod
+    def open(cls, path, column, check=True):
+        """Open the index of ``path`` on ``column``; None when missing, unreadable or stale."""
+        index_path = cls.path_for(path, column)
+        try:
+            f = open(index_path, 'rb')
+        except OSError:
+            return None
+        try:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError('bad magic')
+            size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(size))
+            if header.get('column') != column:
+                raise ValueError('other column')
+            if check and any(header.get(k) != v for k, v in file_signature(path).items()):
+                raise ValueError('stale')
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            f.close()
+            return None
+        base = len(cls.MAGIC) + 8 + size
+        return cls(index_path, header, f, mm, base + -base % 8)
+
+    def _section(self, name):
+        off, nbytes = self.header[name]
+        off += self.base
+        return memoryview(self._mm)[off:off + nbytes].cast('Q')
+
+    def close(self):
+        self.hashes.release()
+        self.offsets.release()
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def candidates(self, key):
+        """Byte offsets of the records whose key hashes like ``key``."""
+        h = array('Q', _key_hashes([key]))[0]
+        i = bisect.bisect_left(self.hashes, h)
+        found = []
+        while i < len(self.hashes) and self.hashes[i] == h:
+            found.append(self.offsets[i])
+            i += 1
+        return found
+
+    @classmethod
+    def build(cls, path, column):
+        """Scan ``path`` once and write the index of ``column``; returns the header."""
+        ext = _ext(path)
+        if ext not in ('csv', 'tsv', 'jsonl', 'ndjson', '') or compression_of(path):
+            print(f"Error: index needs an uncompressed CSV, TSV or JSON Lines file (got '{path}')",
+                  file=sys.stderr)
+            sys.exit(1)
+        fmt = 'jsonl' if ext in ('jsonl', 'ndjson') else 'csv'
+        delimiter = '\t' if ext == 'tsv' else ','
+        signature = file_signature(path)
+        hashes, offsets = array('Q'), array('Q')
+
+        with open(path, 'rb') as f:
+            if fmt == 'csv':
+                end = _record_end(f, 0)
+                f.seek(0)
+                fields = next(csv.reader([f.read(end).decode('utf-8-sig')], delimiter=delimiter), [])
+                if column not in fields:
+                    print(f"Error: column '{column}' not found (columns: {', '.join(fields)})", file=sys.stderr)
+                    sys.exit(1)
+                col = fields.index(column)
+            else:
+                fields = None
+            for starts, records in iter_record_batches(f, quoted=fmt == 'csv'):
+                texts = [raw.decode('utf-8') for raw in records]
+                if fmt == 'csv':
+                    keys = [r[col] if col < len(r) else '' for r in csv.reader(texts, delimiter=delimiter)]
+                else:
+                    keys = [json.loads(s).get(column) for s in texts]
+                    keys = ['' if k is None else str(k) for k in keys]
+                hashes.frombytes(_key_hashes(map(str.strip, keys)))
+                offsets.extend(starts)
+
+        np = _numpy()
+        if np is not None and hashes:
+            order = np.argsort(np.frombuffer(hashes, dtype=np.uint64), kind='stable').tolist()
+        else:
+            order = sorted(range(len(hashes)), key=hashes.__getitem__)
+        tmp_path = cls.path_for(path, column) + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            header = dict(signature, version=1, column=column, format=fmt, delimiter=delimiter, fields=fields,
+                          rows=len(hashes), hashes=[0, 8 * len(hashes)], offsets=[8 * len(hashes), 8 * len(hashes)])
+            raw = json.dumps(header).encode('utf-8')
+            out.write(cls.MAGIC)
+            out.write(len(raw).to_bytes(8, 'little'))
+            out.write(raw)
+            _align(out)
+            array('Q', map(hashes.__getitem__, order)).tofile(out)
+            array('Q', map(offsets.__getitem__, order)).tofile(out)
+        os.replace(tmp_path, cls.path_for(path, column))
+        return header
+
+
+def lookup_records(path, index, keys):
+    """Yield the records of ``path`` whose stripped ``index.column`` equals one of ``keys``.
+
+    Candidate offsets from ``index`` are visited in file order through a
+    memory map of ``path``, so output order matches a full scan. CSV/TSV
+    records come back as cell lists (header width), JSONL records as dicts.
+    """
+    header = index.header
+    offsets = sorted({off for k in dict.fromkeys(keys) for off in index.candidates(k)})
+    if not offsets:
+        return
+    wanted = set(keys)
+    quoted = header['format'] == 'csv'
+    fields = header['fields']
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for off in offsets:
+            text = mm[off:_record_end(mm, off, quoted=quoted)].decode('utf-8')
+            if quoted:
+                row = next(csv.reader([text], delimiter=header['delimiter']), [])
+                col = fields.index(index.column)
+                if (row[col] if col < len(row) else '').strip() in wanted:
+                    yield (row + [''] * (len(fields) - len(row)))[:len(fields)]
+            else:
+                row = json.loads(text)
+                value = row.get(index.column)
+                if ('' if value is None else str(value)).strip() in wanted:
+                    yield row
+
+
+# ---------------------------------------------------------------------------
+# Mergeable accumulators and sketches
+# ---------------------------------------------------------------------------
+
+class Moments:
+    """Running count/sum/min/max plus Welford mean and M2 for the variance."""
+    __slots__ = ('count', 'sum', 'min', 'max', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        """Fold a list of floats into the running state."""
+        n = len(values)
+        if not n:
+            return
+        self.sum = sum(values, self.sum)
+        lo, hi = min(values), max(values)
+        if lo < self.min:
+            self.min = lo
+        if hi > self.max:
+            self.max = hi
+        try:
+            mean = math.fsum(values) / n
+        except ValueError:  # both +inf and -inf
+            mean = _NAN
+        m2 = math.fsum((v - mean) ** 2 for v in values) if mean == mean else _NAN
+        self._combine(n, mean, m2)
+
+    def add_summary(self, n, total, lo, hi, mean, m2):
+        """Fold the precomputed count/sum/min/max/mean/M2 of a batch (e.g. from NumPy)."""
+        if not n:
+            return
+        self.sum += total
+        if lo < self.min:
+            self.min = lo
+        if hi > self.max:
+            self.max = hi
+        self._combine(n, mean, m2)
+
+    def merge(self, other):
+        """Combine another ``Moments`` into this one (Chan et al.)."""
+        if not other.count:
+            return
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._combine(other.count, other.mean, other.m2)
+
+    def _combine(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def stddev(self):
+        """Sample standard deviation (0 for fewer than two values)."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class TDigest:
+    """Merging t-digest (Dunning) for streaming quantiles.
+
+    Small inputs that were never compressed answer quantiles exactly, with
+    the same linear interpolation as ``numpy.percentile``.
+    """
+    __slots__ = ('delta', 'means', 'weights', 'pending', 'total', 'min', 'max')
+
+    def __init__(self, delta=100):
+        self.delta = delta
+        self.means = []
+        self.weights = []
+        self.pending = []
+        self.total = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def update(self, values):
+        """Add a list of floats."""
+        if not values:
+            return
+        self.pending.extend(values)
+        self.total += len(values)
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+        if len(self.pending) > 10 * self.delta:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another digest into this one."""
+        if not other.total:
+            return
+        other._compress()
+        self._compress()
+        items = sorted(zip(self.means + other.means, self.weights + other.weights))
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._rebuild(items)
+
+    def _compress(self):
+        if not self.pending:
+            return
+        items = sorted(itertools.chain(zip(self.means, self.weights), ((v, 1) for v in self.pending)))
+        self.pending = []
+        self._rebuild(items)
+
+    def _rebuild(self, items):
+        total = self.total
+        scale = self.delta / (2 * math.pi)
+        means, weights = [], []
+        cur_mean, cur_w = items[0]
+        done = 0
+        limit = total * (math.sin(min(math.asin(-1.0) + 1 / scale, math.pi / 2)) + 1) / 2
+        for mean, w in items[1:]:
+            if done + cur_w + w <= limit:
+                cur_w += w
+                cur_mean += (mean - cur_mean) * w / cur_w
+            else:
+                means.append(cur_mean)
+                weights.append(cur_w)
+                done += cur_w
+                k = math.asin(max(-1.0, min(1.0, 2 * done / total - 1))) + 1 / scale
+                limit = total * (math.sin(min(k, math.pi / 2)) + 1) / 2
+                cur_mean, cur_w = mean, w
+        means.append(cur_mean)
+        weights.append(cur_w)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile (0..1); ``None`` when empty."""
+        if not self.total:
+            return None
+        self._compress()
+        means, weights = self.means, self.weights
+        if all(w == 1 for w in weights):
+            pos = q * (len(means) - 1)
+            lo = int(pos)
+            hi = min(lo + 1, len(means) - 1)
+            return means[lo] + (means[hi] - means[lo]) * (pos - lo)
+
+        target = q * self.total
+        cum = 0.0
+        prev_center, prev_mean = 0.0, self.min
+        for mean, w in zip(means, weights):
+            center = cum + w / 2
+            if target < center:
+                span = center - prev_center
+                return prev_mean + (mean - prev_mean) * ((target - prev_center) / span if span else 0)
+            cum += w
+            prev_center, prev_mean = center, mean
+        span = self.total - prev_center
+        return prev_mean + (self.max - prev_mean) * ((target - prev_center) / span if span else 0)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter; exact while the cardinality is small."""
+    __slots__ = ('p', 'exact', 'registers')
+
+    def __init__(self, p=12):
+        self.p = p
+        self.exact = set()
+        self.registers = None
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def update(self, values):
+        """Add a list of strings."""
+        hashes = map(self._hash, values)
+        if self.registers is None:
+            self.exact.update(hashes)
+            if len(self.exact) > (1 << self.p) // 4:
+                self._densify()
+            return
+        self._add_hashes(hashes)
+
+    def _densify(self):
+        self.registers = bytearray(1 << self.p)
+        self._add_hashes(self.exact)
+        self.exact = set()
+
+    def _add_hashes(self, hashes):
+        p, regs = self.p, self.registers
+        bits = 64 - p
+        mask = (1 << bits) - 1
+        for h in hashes:
+            rank = bits - (h & mask).bit_length() + 1
+            i = h >> bits
+            if rank > regs[i]:
+                regs[i] = rank
+
+    def merge(self, other):
+        """Fold another counter (same precision) into this one."""
+        if self.registers is None and other.registers is None:
+            self.exact |= other.exact
+            if len(self.exact) > (1 << self.p) // 4:
+                self._densify()
+            return
+        if self.registers is None:
+            self._densify()
+        if other.registers is None:
+            self._add_hashes(other.exact)
+        else:
+            self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """Estimated number of distinct values."""
+        if self.registers is None:
+            return len(self.exact)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+AGG_FUNCS = ('sum', 'avg', 'count', 'min', 'max', 'median', 'p95', 'stddev', 'count_distinct')
+_AGG_KIND = {'median': TDigest, 'p95': TDigest, 'count_distinct': HyperLogLog}
+
+
+def agg_quantile(func):
+    """Quantile (0..1) computed by a ``median`` or ``pNN`` function (e.g. p99.9), else None."""
+    if func == 'median':
+        return 0.5
+    if not func.startswith('p'):
+        return None
+    try:
+        pct = float(func[1:])
+    except ValueError:
+        return None
+    return pct / 100 if 0 <= pct <= 100 else None
+
+
+def _take(seq, idx):
+    """Pick ``seq[i] for i in idx`` as a list (C-speed via itemgetter)."""
+    if len(idx) == 1:
+        return [seq[idx[0]]]
+    return list(operator.itemgetter(*idx)(seq))
+
+
+class AggPlan:
+    """Compiled group-by plan: the accumulators each group needs, fed in one scan.
+
+    Group state is ``[rows, acc...]`` with one accumulator per distinct
+    (column, kind) pair, so e.g. sum/avg/max of one column share a ``Moments``.
+    States are picklable and merge with ``merge_states``.
+    """
+
+    def __init__(self, group_cols, specs):
+        self.group_cols = list(group_cols)
+        self.specs = list(specs)
+        self.slots = []
+        self.outputs = []
+        for col, func in self.specs:
+            kind = _AGG_KIND.get(func) or (TDigest if agg_quantile(func) is not None else Moments)
+            if (col, kind) not in self.slots:
+                self.slots.append((col, kind))
+            self.outputs.append((col, func, 1 + self.slots.index((col, kind))))
+
+    @property
+    def key_columns(self):
+        """Columns the loader must keep as strings."""
+        extra = [c for c, kind in self.slots if kind is HyperLogLog]
+        return self.group_cols + [c for c in dict.fromkeys(extra) if c not in self.group_cols]
+
+    @property
+    def value_columns(self):
+        """Columns the loader must parse as floats."""
+        return list(dict.fromkeys(c for c, kind in self.slots if kind is not HyperLogLog))
+
+    def new_state(self):
+        return [0] + [kind() for _, kind in self.slots]
+
+    def update(self, groups, batch):
+        """Fold one ``ColumnBatch`` into ``groups`` ({key tuple: state})."""
+        np = _numpy() if batch.size >= _VECTOR_MIN_ROWS else None
+        if np is not None:
+            return self._update_numpy(np, groups, batch)
+        keycols = [batch.keys[c] for c in self.group_cols]
+        buckets = {}
+        for i, k in enumerate(zip(*keycols) if len(keycols) > 1 else keycols[0]):
+            b = buckets.get(k)
+            if b is None:
+                buckets[k] = [i]
+            else:
+                b.append(i)
+
+        columns = []
+        for col, kind in self.slots:
+            if kind is HyperLogLog:
+                cells = batch.keys[col]
+                columns.append((cells, None))
+            else:
+                vals, valid = batch.values[col]
+                valid = None if valid.count(0) == 0 else valid
+                total = sum(vals)
+                if total != total:
+                    # 'nan' cells are not numbers (as for _num), so they are skipped like blanks
+                    valid = bytearray(v == v and (valid is None or valid[i]) for i, v in enumerate(vals))
+                columns.append((vals, valid))
+
+        single = len(keycols) == 1
+        for k, idx in buckets.items():
+            key = (k,) if single else k
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = self.new_state()
+            state[0] += len(idx)
+            for slot, (vals, valid) in enumerate(columns, 1):
+                acc = state[slot]
+                if acc.__class__ is HyperLogLog:
+                    acc.update([v for v in _take(vals, idx) if v.strip()])
+                elif valid is None:
+                    acc.update(_take(vals, idx))
+                else:
+                    acc.update([vals[i] for i in idx if valid[i]])
+
+    def _update_numpy(self, np, groups, batch):
+        """``update`` with array ops: group codes from ``np.unique``, per-group
+        count/sum/M2 from ``bincount`` and min/max from ``reduceat``.
+        """
+        keys, inv = np_group_codes(np, [batch.keys[c] for c in self.group_cols])
+        ngroups = len(keys)
+        states = []
+        for key, n in zip(keys, np.bincount(inv, minlength=ngroups).tolist()):
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = self.new_state()
+            state[0] += n
+            states.append(state)
+        order = np.argsort(inv, kind='stable')
+
+        for slot, (col, kind) in enumerate(self.slots, 1):
+            if kind is HyperLogLog:
+                cells = batch.keys[col]
+                bounds = np.searchsorted(inv[order], np.arange(ngroups + 1)).tolist()
+                rows = order.tolist()
+                for g, state in enumerate(states):
+                    state[slot].update([v for v in _take(cells, rows[bounds[g]:bounds[g + 1]]) if v.strip()]
+                                       if bounds[g + 1] > bounds[g] else [])
+                continue
+
+            vals, valid = batch.values[col]
+            x = np.frombuffer(vals, dtype=np.float64)
+            keep = np.frombuffer(valid, dtype=np.uint8).astype(bool) & ~np.isnan(x)
+            idx = order[keep[order]]
+            if not len(idx):
+                continue
+            g, xs = inv[idx], x[idx]
+            starts = np.flatnonzero(np.concatenate(([True], g[1:] != g[:-1])))
+            present = g[starts].tolist()
+            if kind is Moments:
+                counts = np.bincount(g, minlength=ngroups)
+                sums = np.bincount(g, weights=xs, minlength=ngroups)
+                means = sums / np.maximum(counts, 1)
+                m2 = np.bincount(g, weights=(xs - means[g]) ** 2, minlength=ngroups)
+                lows = np.minimum.reduceat(xs, starts).tolist()
+                highs = np.maximum.reduceat(xs, starts).tolist()
+                counts, sums, means, m2 = counts.tolist(), sums.tolist(), means.tolist(), m2.tolist()
+                for i, grp in enumerate(present):
+                    states[grp][slot].add_summary(counts[grp], sums[grp], lows[i], highs[i], means[grp], m2[grp])
+            else:
+                bounds = starts.tolist() + [len(xs)]
+                values = xs.tolist()
+                for i, grp in enumerate(present):
+                    states[grp][slot].update(values[bounds[i]:bounds[i + 1]])
+
+    def result(self, state, col, func, slot):
+        """Final value of one output for a group state."""
+        acc = state[slot]
+        if func == 'count_distinct':
+            return acc.count()
+        if acc.__class__ is TDigest:
+            return acc.quantile(agg_quantile(func)) or 0
+        if func == 'sum':
+            return acc.sum
+        if func == 'count':
+            return acc.count
+        if not acc.count:
+            return 0
+        if func == 'avg':
+            return acc.sum / acc.count
+        if func == 'min':
+            return acc.min
+        if func == 'max':
+            return acc.max
+        return acc.stddev()
+
+
+def merge_states(groups, other):
+    """Merge the group states of ``other`` into ``groups`` (both {key: state})."""
+    for key, state in other.items():
+        mine = groups.get(key)
+        if mine is None:
+            groups[key] = state
+            continue
+        mine[0] += state[0]
+        for acc, theirs in zip(mine[1:], state[1:]):
+            acc.merge(theirs)
+    return groups
+
+
+def aggregate_groups(batches, plan):
+    """Single pass over column batches; returns ``(total_rows, {key: state})``."""
+    groups = {}
+    total = 0
+    for batch in batches:
+        total += batch.size
+        if batch.size:
+            plan.update(groups, batch)
+    return total, groups
+
+
+def finish_groups(plan, groups):
+    """``{key: (rows, values)}`` with one final value per ``plan.outputs``."""
+    return {
+        key: (state[0], [plan.result(state, col, func, slot) for col, func, slot in plan.outputs])
+        for key, state in groups.items()
+    }
+
+
+def aggregate_rows(plan, groups):
+    """Output rows of ``aggregate`` for finished groups, sorted by key."""
+    results = []
+    for key in sorted(groups):
+        rows, values = groups[key]
+        row = dict(zip(plan.group_cols, key))
+        for (col, func, _), agg in zip(plan.outputs, values):
+            row[f'{func}_{col}'] = str(agg) if func == 'count_distinct' else f'{agg:.2f}'
+        row['count'] = str(rows)
+        results.append(row)
+    return results
+
+
+def parse_agg_specs(specs):
+    """Parse repeatable ``col:func`` values into ``[(col, func)]``."""
+    parsed = []
+    for spec in specs or []:
+        col, sep, func = spec.rpartition(':')
+        if not sep or not col or (func not in AGG_FUNCS and agg_quantile(func) is None):
+            print(f"Error: invalid --agg '{spec}' (expected column:func, func one of {', '.join(AGG_FUNCS)} "
+                  f"or a percentile pNN)", file=sys.stderr)
+            sys.exit(1)
+        parsed.append((col, func))
+    return parsed
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+
+_PROFILE_TYPES = ('int', 'float', 'bool', 'date', 'string')
+_KIND_RE = re.compile(r"""
+    (?P<int>[+-]?\d+)
+  | (?P<float>[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?|[+-]?(?:inf|nan))
+  | (?P<date>\d{4}[-/]\d{2}[-/]\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?)
+  | (?P<bool>true|false|yes|no)
+""", re.VERBOSE | re.IGNORECASE)
+_TINY = 1e-300
+
+
+def value_kind(text):
+    """Classify a stripped, non-empty cell as int, float, date, bool or string."""
+    m = _KIND_RE.fullmatch(text)
+    return m.lastgroup if m else 'string'
+
+
+class TopK:
+    """Weighted Misra-Gries heavy hitters, exact until ``capacity`` distinct values.
+
+    Once values have been evicted (``exact`` False) the counts are lower
+    bounds, off by at most rows / capacity.
+    """
+    __slots__ = ('capacity', 'counts', 'exact')
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.counts = {}
+        self.exact = True
+
+    def update(self, counts):
+        """Add a {value: count} mapping."""
+        mine = self.counts
+        for v, n in counts.items():
+            mine[v] = mine.get(v, 0) + n
+        if len(mine) > self.capacity:
+            # Subtract the (capacity+1)-th largest count; at most capacity survive
+            cut = heapq.nlargest(self.capacity + 1, mine.values())[-1]
+            self.counts = {v: n - cut for v, n in mine.items() if n > cut}
+            self.exact = False
+
+    def merge(self, other):
+        self.update(other.counts)
+        self.exact = self.exact and other.exact
+
+    def top(self, k):
+        return heapq.nlargest(k, self.counts.items(), key=operator.itemgetter(1))
+
+
+class ColumnProfile:
+    """Mergeable one-pass summary of a column: types, nulls, range, distinct, top values."""
+    __slots__ = ('rows', 'nulls', 'kinds', 'low', 'high', 'date_low', 'date_high',
+                 'text_low', 'text_high', 'distinct', 'top')
+
+    def __init__(self, top_capacity=1024):
+        self.rows = 0
+        self.nulls = 0
+        self.kinds = dict.fromkeys(_PROFILE_TYPES, 0)
+        self.low = self.high = None
+        self.date_low = self.date_high = None
+        self.text_low = self.text_high = None
+        self.distinct = HyperLogLog()
+        self.top = TopK(top_capacity)
+
+    def update(self, cells):
+        """Fold a sequence of cell strings into the profile.
+
+        Work is per distinct value of the batch, so repeated values cost one
+        dict increment in C.
+        """
+        self.rows += len(cells)
+        counts = collections.Counter(map(str.strip, cells))
+        values = {}
+        kinds = self.kinds
+        numbers, dates = [], []
+        for v, n in counts.items():
+            if v.lower() in _EMPTY_VALUES:
+                self.nulls += n
+                continue
+            values[v] = n
+            kind = value_kind(v)
+            kinds[kind] += n
+            if kind == 'int' or kind == 'float':
+                numbers.append(float(v))
+            elif kind == 'date':
+                dates.append(v)
+        if not values:
+            return
+        if numbers:
+            self.low = min(numbers) if self.low is None else min(self.low, min(numbers))
+            self.high = max(numbers) if self.high is None else max(self.high, max(numbers))
+        if dates:
+            self.date_low = min(dates) if self.date_low is None else min(self.date_low, min(dates))
+            self.date_high = max(dates) if self.date_high is None else max(self.date_high, max(dates))
+        lo, hi = min(values), max(values)
+        self.text_low = lo if self.text_low is None else min(self.text_low, lo)
+        self.text_high = hi if self.text_high is None else max(self.text_high, hi)
+        self.distinct.update(list(values))
+        self.top.update(values)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        for kind, n in other.kinds.items():
+            self.kinds[kind] += n
+        for lo, hi in (('low', 'high'), ('date_low', 'date_high'), ('text_low', 'text_high')):
+            theirs_lo, theirs_hi = getattr(other, lo), getattr(other, hi)
+            if theirs_lo is None:
+                continue
+            mine_lo, mine_hi = getattr(self, lo), getattr(self, hi)
+            setattr(self, lo, theirs_lo if mine_lo is None else min(mine_lo, theirs_lo))
+            setattr(self, hi, theirs_hi if mine_hi is None else max(mine_hi, theirs_hi))
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+
+    def inferred_type(self):
+        """Narrowest type covering every non-null value ('empty' when there are none)."""
+        seen = {kind for kind, n in self.kinds.items() if n}
+        if not seen:
+            return 'empty'
+        for kind, allowed in (('int', {'int'}), ('float', {'int', 'float'}), ('bool', {'bool'}),
+                              ('date', {'date'})):
+            if seen <= allowed:
+                return kind
+        return 'string'
+
+    def summary(self, name, top_k=5):
+        kind = self.inferred_type()
+        if kind == 'int':
+            low, high = int(self.low), int(self.high)
+        elif kind == 'float':
+            low, high = self.low, self.high
+        elif kind == 'date':
+            low, high = self.date_low, self.date_high
+        elif kind == 'string':
+            low, high = self.text_low, self.text_high
+        else:
+            low = high = None
+        return {
+            'name': name,
+            'type': kind,
+            'non_null': self.rows - self.nulls,
+            'nulls': self.nulls,
+            'null_ratio': round(self.nulls / self.rows, 4) if self.rows else 0.0,
+            'min': low,
+            'max': high,
+            'distinct': self.distinct.count(),
+            'distinct_exact': self.distinct.registers is None,
+            'top': [{'value': v, 'count': n} for v, n in self.top.top(top_k)],
+            'top_exact': self.top.exact,
+            'types': {kind: n for kind, n in self.kinds.items() if n},
+        }
+
+
+def profile_tuples(rows, width, batch_rows=_BATCH_ROWS):
+    """Profile projected row tuples of ``width`` columns; returns ``(rows, [ColumnProfile])``."""
+    profiles = [ColumnProfile() for _ in range(width)]
+    total = 0
+    while True:
+        part = list(itertools.islice(rows, batch_rows))
+        if not part:
+            return total, profiles
+        total += len(part)
+        for prof, cells in zip(profiles, zip(*part)):
+            prof.update(cells)
+
+
+def reservoir_sample(rows, n, seed=0):
+    """Uniform sample of ``n`` items in one pass (Algorithm L); returns ``(sample, total)``.
+
+    Rows between picks are skipped with ``islice``, so the Python-level work
+    grows with ``n log(total / n)`` rather than with ``total``.
+    """
+    rng = random.Random(seed)
+    counter = itertools.count()
+    # zip pulls the counter before the row, so after exhaustion it sits one past the count
+    indexed = zip(counter, rows)
+    sample = [r for _, r in itertools.islice(indexed, n)]
+    if len(sample) < n:
+        return sample, len(sample)
+    w = math.exp(math.log(rng.random() or _TINY) / n)
+    while w < 1.0:
+        skip = int(math.log(rng.random() or _TINY) / math.log1p(-w))
+        item = next(itertools.islice(indexed, skip, None), None)
+        if item is None:
+            break
+        sample[rng.randrange(n)] = item[1]
+        w *= math.exp(math.log(rng.random() or _TINY) / n)
+    else:
+        collections.deque(indexed, maxlen=0)
+    return sample, next(counter) - 1
+
+
+def profile_file(path, sample=None, workers=1):
+    """Profile every column of ``path``.
+
+    Returns ``(fields, total_rows, profiled_rows, [ColumnProfile])``. With
+    ``sample`` only a reservoir of that many rows is profiled; otherwise
+    CSV/JSONL chunks can be profiled in ``workers`` processes and merged.
+    """
+    first = next(iter_data(path), None)
+    fields = [k for k in (first or {}) if k is not None]
+    if sample:
+        rows, total = reservoir_sample(_iter_projected(path, fields), sample)
+        profiled, profiles = profile_tuples(iter(rows), len(fields))
+        return fields, total, profiled, profiles
+
+    results = run_parallel(path, _profile_task, workers, fields) if workers > 1 else None
+    if results is None:
+        total, profiles = profile_tuples(_iter_projected(path, fields), len(fields))
+        return fields, total, total, profiles
+    total, profiles = 0, [ColumnProfile() for _ in fields]
+    for part_total, part in results:
+        total += part_total
+        for mine, theirs in zip(profiles, part):
+            mine.merge(theirs)
+    return fields, total, total, profiles
+
+
+# ---------------------------------------------------------------------------
+# Filter expressions
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<num>-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?![\w.])
+    | '(?P<str>(?:[^']|'')*)'
+    | "(?P<qid>(?:[^"]|"")*)"
+    | `(?P<bid>[^`]*)`
+    | (?P<op>==|!=|<>|<=|>=|!~|[=<>~(),])
+    | (?P<word>[A-Za-z_][\w.]*)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'and', 'or', 'not', 'in', 'is', 'empty', 'contains', 'startswith', 'endswith'}
+_CMP_OPS = {'=': '==', '==': '==', '!=': '!=', '<>': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+_CMP_FUNCS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+              '>': operator.gt, '>=': operator.ge}
+_NAN = float('nan')
+
+
+def _num(cell):
+    """float(cell), or NaN (which fails every ordered comparison) when not numeric."""
+    try:
+        return float(cell)
+    except (ValueError, TypeError):
+        return _NAN
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"unexpected input at position {pos}: {text[pos:pos + 15]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        val = m.group(kind)
+        if kind == 'num':
+            # Source text: text operators match '10' as written; numeric ones parse it with _num
+            tokens.append(('num', val))
+        elif kind == 'str':
+            tokens.append(('str', val.replace("''", "'")))
+        elif kind in ('qid', 'bid'):
+            tokens.append(('col', val.replace('""', '"')))
+        elif kind == 'word' and val.lower() in _KEYWORDS:
+            tokens.append(('kw', val.lower()))
+        elif kind == 'word':
+            tokens.append(('col', val))
+        else:
+            tokens.append(('op', val))
+    tokens.append(('end', None))
+    return tokens
+
+
+class _WhereParser:
+    """Recursive-descent parser producing a small tuple AST."""
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i]
+
+    def take(self, kind=None, val=None):
+        tok = self.tokens[self.i]
+        if (kind and tok[0] != kind) or (val is not None and tok[1] != val):
+            raise ValueError(f"expected {val or kind!r}, got {self.describe(tok)}")
+        self.i += 1
+        return tok
+
+    def accept(self, kind, val):
+        if self.tokens[self.i] == (kind, val):
+            self.i += 1
+            return True
+        return False
+
+    def parse(self):
+        node = self.parse_or()
+        self.take('end')
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.accept('kw', 'or'):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept('kw', 'and'):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_not(self):
+        if self.accept('kw', 'not'):
+            return ('not', self.parse_not())
+        if self.accept('op', '('):
+            node = self.parse_or()
+            self.take('op', ')')
+            return node
+        return self.parse_predicate()
+
+    @staticmethod
+    def describe(tok):
+        return 'end of expression' if tok[0] == 'end' else repr(tok[1])
+
+    def parse_operand(self):
+        tok = self.peek()
+        if tok[0] not in ('col', 'num', 'str'):
+            raise ValueError(f"expected a column or literal, got {self.describe(tok)}")
+        self.i += 1
+        return tok
+
+    def parse_literal(self):
+        tok = self.peek()
+        if tok[0] not in ('num', 'str'):
+            raise ValueError(f"expected a literal, got {self.describe(tok)}")
+        self.i += 1
+        return tok
+
+    def parse_predicate(self):
+        left = self.parse_operand()
+        kind, val = self.peek()
+        if kind == 'op' and val in _CMP_OPS:
+            self.i += 1
+            return ('cmp', _CMP_OPS[val], left, self.parse_operand())
+        if kind == 'op' and val in ('~', '!~'):
+            self.i += 1
+            return ('match', left, self.parse_literal()[1], val == '!~')
+        negate = self.accept('kw', 'not')
+        if self.accept('kw', 'in'):
+            self.take('op', '(')
+            items = [self.parse_literal()]
+            while self.accept('op', ','):
+                items.append(self.parse_literal())
+            self.take('op', ')')
+            return ('in', left, items, negate)
+        if negate:
+            raise ValueError("expected 'in' after 'not'")
+        if self.accept('kw', 'is'):
+            negate = self.accept('kw', 'not')
+            self.take('kw', 'empty')
+            return ('empty', left, negate)
+        if kind == 'kw' and val in ('contains', 'startswith', 'endswith'):
+            self.i += 1
+            return ('text', val, left, str(self.parse_literal()[1]))
+        raise ValueError(f"expected an operator after {left[1]!r}")
+
+
+class _WhereCompiler:
+    """Turns the AST into the source of one Python function over a projected row."""
+
+    def __init__(self):
+        self.columns = []
+        self.consts = {}
+
+    def column(self, name):
+        if name not in self.columns:
+            self.columns.append(name)
+        return f'r[{self.columns.index(name)}]'
+
+    def const(self, value):
+        name = f'_k{len(self.consts)}'
+        self.consts[name] = value
+        return name
+
+    def text(self, tok):
+        return self.column(tok[1]) + '.strip()' if tok[0] == 'col' else repr(str(tok[1]))
+
+    def number(self, tok):
+        if tok[0] == 'col':
+            return f'_num({self.column(tok[1])})'
+        return self.const(_num(tok[1]))
+
+    def emit(self, node):
+        kind = node[0]
+        if kind in ('and', 'or'):
+            return '(' + f' {kind} '.join(self.emit(n) for n in node[1]) + ')'
+        if kind == 'not':
+            return f'(not {self.emit(node[1])})'
+        if kind == 'cmp':
+            _, op, left, right = node
+            numeric = 'num' in (left[0], right[0])
+            if op not in ('==', '!=') and not numeric:
+                # Ordered comparisons are numeric unless a side is non-numeric text
+                numeric = all(t[0] == 'col' or _num(t[1]) == _num(t[1]) for t in (left, right))
+            if numeric:
+                return f'({self.number(left)} {op} {self.number(right)})'
+            return f'({self.text(left)} {op} {self.text(right)})'
+        if kind == 'in':
+            _, operand, items, negate = node
+            neg = 'not ' if negate else ''
+            if all(t[0] == 'num' for t in items):
+                values = self.const(frozenset(_num(t[1]) for t in items))
+                return f'({self.number(operand)} {neg}in {values})'
+            values = self.const(frozenset(str(t[1]) for t in items))
+            return f'({self.text(operand)} {neg}in {values})'
+        if kind == 'match':
+            _, operand, pattern, negate = node
+            search = self.const(re.compile(str(pattern)).search)
+            return f'({search}({self.text(operand)}) is {"" if negate else "not "}None)'
+        if kind == 'empty':
+            _, operand, negate = node
+            return f'({self.text(operand)} {"!=" if negate else "=="} "")'
+        _, op, operand, literal = node
+        lowered = self.text(operand) + '.lower()'
+        needle = repr(literal.lower())
+        if op == 'contains':
+            return f'({needle} in {lowered})'
+        return f'{lowered}.{op}({needle})'
+
+
+def compile_where(text):
+    """Compile a --where expression into ``(columns, predicate)``.
+
+    The expression is parsed once into a single Python function; constants
+    are pre-converted, regexes precompiled and ``predicate`` receives a tuple
+    of just the referenced ``columns``. Syntax::
+
+        price > 10 and region in ('EU', 'US') and not name ~ '^test'
+        "unit price" >= 2.5 or status is empty
+
+    Comparisons with a number are numeric (non-numeric cells never match);
+    text comparisons use the stripped cell; contains/startswith/endswith
+    ignore case; ``~`` / ``!~`` are regex search.
+    """
+    compiler = _WhereCompiler()
+    body = compiler.emit(_WhereParser(text).parse())
+    args = ''.join(f', {name}={name}' for name in compiler.consts)
+    source = f'def _where(r, _num=_num{args}):\n    return {body}\n'
+    namespace = {'_num': _num, **compiler.consts}
+    exec(compile(source, '<where>', 'exec'), namespace)
+    return compiler.columns, namespace['_where']
+
+
+def compile_simple_filter(col, op, val):
+    """``(columns, predicate)`` for the single --column/--op/--value form.
+
+    Keeps the original semantics (numeric ops treat non-numeric cells as 0)
+    but resolves the operator and converts ``val`` once instead of per row.
+    """
+    val_f = to_float(val)
+    val_l = val.lower()
+    ops = {
+        'gt': lambda r: to_float(r[0]) > val_f,
+        'gte': lambda r: to_float(r[0]) >= val_f,
+        'lt': lambda r: to_float(r[0]) < val_f,
+        'lte': lambda r: to_float(r[0]) <= val_f,
+        'eq': lambda r: r[0].strip() == val,
+        'neq': lambda r: r[0].strip() != val,
+        'contains': lambda r: val_l in r[0].strip().lower(),
+        'startswith': lambda r: r[0].strip().lower().startswith(val_l),
+        'endswith': lambda r: r[0].strip().lower().endswith(val_l),
+    }
+    return [col], ops.get(op, lambda r: False)
+
+
+def make_predicate(where=None, column=None, op=None, value=None):
+    """Build ``(columns, predicate)`` from --where or the --column/--op/--value trio."""
+    if where:
+        try:
+            return compile_where(where)
+        except (ValueError, re.error) as e:
+            print(f"Error: invalid --where expression: {e}", file=sys.stderr)
+            sys.exit(1)
+    if not (column and op and value is not None):
+        print("Error: filter needs --where EXPR or all of --column/--op/--value", file=sys.stderr)
+        sys.exit(1)
+    return compile_simple_filter(column, op, value)
+
+
+def _row_dict(header, row):
+    """Build the dict csv.DictReader would produce for ``row``."""
+    if len(row) == len(header):
+        return dict(zip(header, row))
+    d = dict(zip(header, row))
+    if len(row) > len(header):
+        d[None] = row[len(header):]
+    else:
+        for k in header[len(row):]:
+            d[k] = None
+    return d
+
+
+def filter_batches(rows, columns, mask_fn, stats=None):
+    """Yield the dict rows whose projected cells pass ``mask_fn``, one batch at a time."""
+    rows = iter(rows)
+    while True:
+        part = list(itertools.islice(rows, _MASK_BATCH_ROWS))
+        if not part:
+            return
+        if stats is not None:
+            stats['rows'] += len(part)
+        cells = [['' if r.get(c) is None else str(r.get(c)) for r in part] for c in columns]
+        for i in mask_fn(cells).nonzero()[0].tolist():
+            yield part[i]
+
+
+def iter_matching(path, columns, predicate, delimiter=None, chunk=None, stats=None, batch_predicate=None,
+                  raw=False):
+    """Yield the rows of ``path`` for which ``predicate(projected_columns)`` holds.
+
+    CSV rows are tested on the raw cell list and only matches become dicts,
+    or with ``raw`` stay cell lists padded/truncated to the header width.
+    With ``batch_predicate`` (see ``make_batch_predicate``) rows are tested
+    in batches with array ops instead. ``stats['rows']`` receives the number
+    of rows scanned.
+    """
+    total = 0
+    ext = _ext(path)
+    if not columns:
+        batch_predicate = None
+    try:
+        if ext in ('json', 'jsonl', 'ndjson') or ext in ARROW_FORMATS:
+            rows = iter_chunk(chunk) if chunk else iter_data(path)
+            if batch_predicate is not None:
+                counted = {'rows': 0}
+                try:
+                    yield from filter_batches(rows, columns, batch_predicate, counted)
+                finally:
+                    total = counted['rows']
+                return
+            for r in rows:
+                total += 1
+                if predicate(tuple('' if r.get(c) is None else str(r.get(c)) for c in columns)):
+                    yield r
+            return
+
+        if delimiter is None:
+            delimiter = '\t' if ext == 'tsv' else ','
+        with (_open_chunk(chunk) if chunk else open_data(path, newline='', encoding='utf-8-sig')) as f:
+            reader = csv.reader(f, delimiter=delimiter, strict=bool(chunk and chunk.strict))
+            header = chunk.fieldnames if chunk else next(reader, None) or []
+            index = {name: i for i, name in enumerate(header)}
+            idx = [index.get(c) for c in columns]
+            if None not in idx and idx:
+                get = operator.itemgetter(*idx) if len(idx) > 1 else (lambda row, i=idx[0]: (row[i],))
+            else:
+                get = lambda row: tuple(row[i] if i is not None else '' for i in idx)
+            width = len(header)
+            if raw:
+                make = lambda row: row if len(row) == width else (row + [''] * (width - len(row)))[:width]
+            else:
+                make = functools.partial(_row_dict, header)
+            if batch_predicate is not None:
+                safe = lambda row: tuple(row[i] if i is not None and i < len(row) else '' for i in idx)
+                rows = filter(None, reader)
+                while True:
+                    part = list(itertools.islice(rows, _MASK_BATCH_ROWS))
+                    if not part:
+                        return
+                    total += len(part)
+                    try:
+                        cells = [list(map(operator.itemgetter(i), part)) if i is not None else [''] * len(part)
+                                 for i in idx]
+                    except IndexError:
+                        cells = list(zip(*map(safe, part)))
+                    for i in batch_predicate(cells).nonzero()[0].tolist():
+                        yield make(part[i])
+            for row in reader:
+                if not row:
+                    continue
+                total += 1
+                try:
+                    proj = get(row)
+                except IndexError:
+                    proj = tuple(row[i] if i is not None and i < len(row) else '' for i in idx)
+                if predicate(proj):
+                    yield make(row)
+    finally:
+        if stats is not None:
+            stats['rows'] = total
+
+
+# ---------------------------------------------------------------------------
+# Parallel chunked reader
+# ---------------------------------------------------------------------------
+
+_CHUNK_BYTES = 64 << 20
+_MIN_CHUNK_BYTES = 1 << 20
+
+# ``strict`` chunks parse CSV with csv's strict mode, so one that ends inside
+# a quoted field raises csv.Error instead of yielding a torn record
+Chunk = namedtuple('Chunk', 'path start end fmt delimiter fieldnames strict', defaults=(True,))
+
+
+def _record_end(f, pos, in_quote=False, quoted=True):
+    """Offset just past the first newline at/after ``pos`` that is outside quotes.
+
+    ``in_quote`` is the quote state at ``pos``; ``quoted=False`` (JSONL)
+    ignores quotes entirely. Returns the file size at EOF.
+    """
+    f.seek(pos)
+    while True:
+        block = f.read(1 << 16)
+        if not block:
+            return pos
+        i = 0
+        while True:
+            if in_quote:
+                j = block.find(b'"', i)
+                if j < 0:
+                    break
+                in_quote = False
+                i = j + 1
+                continue
+            nl = block.find(b'\n', i)
+            q = block.find(b'"', i) if quoted else -1
+            if q >= 0 and (nl < 0 or q < nl):
+                in_quote = True
+                i = q + 1
+            elif nl >= 0:
+                return pos + nl + 1
+            else:
+                break
+        pos += len(block)
+
+
+def _count_quotes(f, start, end):
+    """Number of '"' bytes in ``[start, end)``."""
+    f.seek(start)
+    count = 0
+    while start < end:
+        block = f.read(min(1 << 20, end - start))
+        if not block:
+            break
+        count += block.count(b'"')
+        start += len(block)
+    return count
+
+
+def _data_start(f, quoted, delimiter):
+    """``(offset of the first data record, field names)`` of a CSV (``quoted``) or JSONL file."""
+    if quoted:
+        data_start = _record_end(f, 0)
+        f.seek(0)
+        header = f.read(data_start).decode('utf-8-sig')
+        return data_start, next(csv.reader(io.StringIO(header, newline=''), delimiter=delimiter), [])
+    f.seek(0)
+    first = f.readline().strip()
+    return 0, list(json.loads(first).keys()) if first else []
+
+
+def _complete_end(f, start, end, quoted=True):
+    """Largest record boundary in ``[start, end]``: drops a trailing record still being written.
+
+    A boundary is just past a newline with an even number of quotes since
+    ``start`` (which must itself be a boundary).
+    """
+    pos = end
+    while pos > start:
+        f.seek(max(start, pos - (1 << 16)))
+        block = f.read(pos - f.tell())
+        nl = block.rfind(b'\n')
+        while nl >= 0:
+            cand = pos - len(block) + nl + 1
+            if not quoted or _count_quotes(f, start, cand) % 2 == 0:
+                return cand
+            nl = block.rfind(b'\n', 0, nl)
+        pos -= len(block)
+    return start
+
+
+def split_chunks(path, workers, delimiter=None, start=None, end=None):
+    """Split a CSV/TSV/JSONL file into ``Chunk`` byte ranges on record boundaries.
+
+    Boundaries are only placed on newlines outside quoted fields, tracking
+    quote parity from the previous boundary; ``_pool_imap`` recovers when a
+    stray quote makes that wrong. ``start``/``end`` (record
+    boundaries) restrict the split to that byte range of the data. Returns
+    None for inputs that cannot be split (JSON arrays, Parquet/Arrow,
+    compressed files).
+    """
+    ext = _ext(path)
+    if ext == 'json' or ext in ARROW_FORMATS or compression_of(path):
+        return None
+    fmt = 'jsonl' if ext in ('jsonl', 'ndjson') else 'csv'
+    if delimiter is None:
+        delimiter = '\t' if ext == 'tsv' else ','
+    quoted = fmt == 'csv'
+    size = os.path.getsize(path) if end is None else end
+
+    with open(path, 'rb') as f:
+        data_start, fieldnames = _data_start(f, quoted, delimiter)
+        if start is not None:
+            data_start = max(start, data_start)
+
+        span = size - data_start
+        if span <= 0:
+            return []
+        parts = max(workers * 4, -(-span // _CHUNK_BYTES))
+        parts = max(1, min(parts, span // _MIN_CHUNK_BYTES + 1))
+
+        bounds = [data_start]
+        for i in range(1, parts):
+            target = data_start + span * i // parts
+            if target <= bounds[-1]:
+                continue
+            in_quote = quoted and _count_quotes(f, bounds[-1], target) % 2 == 1
+            bound = _record_end(f, target, in_quote, quoted)
+            if bounds[-1] < bound < size:
+                bounds.append(bound)
+        bounds.append(size)
+
+    return [Chunk(path, a, b, fmt, delimiter, fieldnames) for a, b in zip(bounds, bounds[1:])]
+
+
+def _open_chunk(chunk):
+    """Text stream over the bytes of one chunk."""
+    with open(chunk.path, 'rb') as f:
+        f.seek(chunk.start)
+        data = f.read(chunk.end - chunk.start)
+    return io.StringIO(data.decode('utf-8-sig' if chunk.start == 0 else 'utf-8'), newline='')
+
+
+def iter_chunk(chunk):
+    """Yield the rows of one chunk as dicts."""
+    with _open_chunk(chunk) as f:
+        if chunk.fmt == 'jsonl':
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f, fieldnames=chunk.fieldnames, delimiter=chunk.delimiter, strict=chunk.strict)
+
+
+def run_parallel(path, task, workers, *task_args):
+    """Map ``task(*task_args, chunk)`` over the chunks of ``path`` in a process pool.
+
+    Yields per-chunk results in file order, or returns None when the file
+    cannot be split (callers then take the serial path).
+    """
+    chunks = split_chunks(path, workers)
+    if chunks is None:
+        return None
+    return _pool_imap(functools.partial(task, *task_args), chunks, workers)
+
+
+def _pool_imap(func, chunks, workers):
+    """``func(chunk)`` for each chunk in file order, in a pool when ``workers`` > 1.
+
+    Chunk boundaries come from quote parity, which one '"' inside an
+    unquoted field throws off. The first chunk whose end is not a record
+    boundary fails its strict parse; every chunk before it started and
+    ended on true boundaries, so their results stand, and the rest of the
+    file is re-split on boundaries found by ``csv`` and read in this process.
+    """
+    done = 0
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and len(chunks) > 1:
+            results = stack.enter_context(multiprocessing.Pool(min(workers, len(chunks)))).imap(func, chunks)
+        else:
+            results = map(func, chunks)
+        while done < len(chunks):
+            try:
+                result = next(results)
+            except csv.Error as e:
+                print(f"Warning: byte range {chunks[done].start}-{chunks[done].end} of {chunks[done].path} "
+                      f"did not split cleanly ({e}); reading the rest in one process", file=sys.stderr)
+                break
+            yield result
+            done += 1
+    if done < len(chunks):
+        bounds = _parsed_bounds(chunks[done], chunks[-1].end)
+        for a, b in zip(bounds, bounds[1:]):
+            yield func(chunks[done]._replace(start=a, end=b, strict=False))
+
+
+def _parsed_bounds(chunk, end, step=_CHUNK_BYTES):
+    """Record boundaries from ``chunk.start`` to ``end``, ``step`` bytes or more apart, found by ``csv``."""
+    bounds = [chunk.start]
+    with open(chunk.path, 'rb') as raw:
+        raw.seek(chunk.start)
+        pos = chunk.start
+
+        def lines():
+            nonlocal pos
+            for line in io.TextIOWrapper(raw, encoding='utf-8', newline=''):
+                if pos >= end:
+                    return
+                pos += len(line.encode('utf-8'))
+                yield line
+
+        for _ in csv.reader(lines(), delimiter=chunk.delimiter):
+            if pos - bounds[-1] >= step and pos < end:
+                bounds.append(pos)
+    bounds.append(end)
+    return bounds
+
+
+def _inspect_task(chunk):
+    total = 0
+    non_empty = dict.fromkeys(chunk.fieldnames, 0)
+    for r in iter_chunk(chunk):
+        total += 1
+        for col in chunk.fieldnames:
+            v = r.get(col)
+            if v is not None and str(v).strip():
+                non_empty[col] += 1
+    return total, non_empty
+
+
+def _profile_task(fields, chunk):
+    return profile_tuples(_iter_projected(chunk.path, fields, chunk=chunk), len(fields))
+
+
+def _filter_task(where, col, op, val, chunk):
+    columns, predicate = make_predicate(where, col, op, val)
+    stats = {}
+    batch_predicate = make_batch_predicate(where, col, op, val)
+    rows = list(iter_matching(chunk.path, columns, predicate, chunk=chunk, stats=stats,
+                              batch_predicate=batch_predicate))
+    return stats['rows'], rows
+
+
+def _aggregate_task(plan, chunk):
+    batches = iter_column_batches(chunk.path, plan.key_columns, plan.value_columns, chunk=chunk)
+    return aggregate_groups(batches, plan)
+
+
+def _dedup_task(key_cols, keep, chunk):
+    digest = make_digest(key_cols)
+    seen = set()
+    kept = []
+    total = 0
+    for r in iter_chunk(chunk):
+        total += 1
+        d = digest(r)
+        # A repeat inside the chunk can never be the first occurrence overall
+        if keep == 'first':
+            if d in seen:
+                continue
+            seen.add(d)
+        kept.append((d, r))
+    return total, kept
+
+
+# ---------------------------------------------------------------------------
+# Parquet / Arrow IPC (optional pyarrow)
+# ---------------------------------------------------------------------------
+
+ARROW_FORMATS = {'parquet': 'parquet', 'pq': 'parquet', 'arrow': 'ipc', 'feather': 'ipc', 'ipc': 'ipc'}
+_ARROW_JOIN_TYPES = {'inner': 'inner', 'left': 'left outer', 'right': 'right outer', 'outer': 'full outer',
+                     'semi': 'left semi', 'anti': 'left anti'}
+# (pyarrow hash aggregate, option) per --agg function
+_ARROW_AGGS = {'sum': ('sum', None), 'avg': ('mean', None), 'count': ('count', None), 'min': ('min', None),
+               'max': ('max', None), 'median': ('approximate_median', None), 'p95': ('tdigest', 0.95),
+               'stddev': ('stddev', 1), 'count_distinct': ('count_distinct', None)}
+_pyarrow = None
+
+
+def _arrow():
+    """pyarrow with its compute/csv/dataset/ipc/parquet modules loaded, or None."""
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.compute
+            import pyarrow.csv
+            import pyarrow.dataset
+            import pyarrow.ipc
+            import pyarrow.parquet
+            _pyarrow = pyarrow
+        except ImportError:
+            _pyarrow = False
+    return _pyarrow or None
+
+
+def require_arrow(path):
+    """pyarrow, or exit with an install hint when ``path`` needs it."""
+    pa = _arrow()
+    if pa is None:
+        print(f"Error: pyarrow is required for {path}. Install with: pip install pyarrow", file=sys.stderr)
+        sys.exit(1)
+    if compression_of(path, sniff=False):
+        print(f"Error: Parquet/Arrow files compress internally; drop the compression suffix of {path}",
+              file=sys.stderr)
+        sys.exit(1)
+    return pa
+
+
+def is_arrow(path):
+    """True for Parquet and Arrow IPC/Feather paths."""
+    return _ext(path) in ARROW_FORMATS
+
+
+def arrow_dataset(path):
+    """``pyarrow.dataset`` over a Parquet or Arrow IPC file."""
+    pa = require_arrow(path)
+    return pa.dataset.dataset(path, format=ARROW_FORMATS[_ext(path)])
+
+
+def _arrow_bytes(path):
+    """Uncompressed data size of an Arrow/Parquet file, for memory budgets."""
+    if ARROW_FORMATS[_ext(path)] == 'parquet':
+        meta = _arrow().parquet.read_metadata(path)
+        return sum(meta.row_group(i).total_byte_size for i in range(meta.num_row_groups))
+    return os.path.getsize(path)
+
+
+def _arrow_kind(pa, typ):
+    """'text', 'int' or 'float' for the column types pushdown understands, else None."""
+    if pa.types.is_string(typ) or pa.types.is_large_string(typ):
+        return 'text'
+    if pa.types.is_integer(typ):
+        return 'int'
+    if pa.types.is_floating(typ) or pa.types.is_decimal(typ):
+        return 'float'
+    return None
+
+
+def iter_arrow_rows(path):
+    """Yield the rows of a Parquet/Arrow file as dicts, one record batch at a time."""
+    for batch in arrow_dataset(path).to_batches(batch_size=_BATCH_ROWS):
+        yield from batch.to_pylist()
+
+
+def iter_arrow_projected(path, columns):
+    """``_iter_projected`` for Parquet/Arrow: only ``columns`` are read from disk."""
+    dataset = arrow_dataset(path)
+    present = [c for c in dict.fromkeys(columns) if c in dataset.schema.names]
+    for batch in dataset.to_batches(columns=present, batch_size=_BATCH_ROWS):
+        cells = {c: ['' if v is None else str(v) for v in batch.column(c).to_pylist()] for c in present}
+        blank = [''] * batch.num_rows
+        if columns:
+            yield from zip(*(cells.get(c, blank) for c in columns))
+        else:
+            yield from itertools.repeat((), batch.num_rows)
+
+
+def write_arrow_batches(batches, schema, path, fmt=None):
+    """Write record batches to Parquet or Arrow IPC. Returns the row count."""
+    pa = require_arrow(path)
+    if ARROW_FORMATS[fmt or _ext(path)] == 'parquet':
+        writer = pa.parquet.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    count = 0
+    with writer:
+        for batch in batches:
+            if batch.num_rows:
+                writer.write_batch(batch)
+                count += batch.num_rows
+    return count
+
 
-    if ext in ('json',):
-        with open(path, encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            return [data]
+def write_arrow_rows(rows, path, fmt=None):
+    """Write dict rows to Parquet or Arrow IPC; the schema comes from the first batch."""
+    pa = require_arrow(path)
+    rows = iter(rows)
+    first = list(itertools.islice(rows, _BATCH_ROWS))
+    table = pa.Table.from_pylist(first)
+    # All-null columns in the first batch are typed as strings
+    schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])
 
-    if ext in ('jsonl', 'ndjson'):
-        rows = []
-        with open(path, encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    rows.append(json.loads(line))
-        return rows
+    def batches():
+        part, done = first, len(first)
+        while part:
+            try:
+                yield from pa.Table.from_pylist(part, schema=schema).to_batches()
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as e:
+                print(f"Error: column types change after row {done - len(part)} ({e}); "
+                      f"convert to CSV first or clean the column", file=sys.stderr)
+                sys.exit(1)
+            part = list(itertools.islice(rows, _BATCH_ROWS))
+            done += len(part)
 
-    # CSV / TSV
+    return write_arrow_batches(batches(), schema, path, fmt)
+
+
+def convert_csv_to_arrow(path, output, fmt, delimiter=None):
+    """CSV/TSV to Parquet/Arrow with pyarrow's streaming reader and type inference.
+
+    Columns whose inferred type breaks in a later block are re-read as strings.
+    """
+    pa = require_arrow(output)
     if delimiter is None:
-        delimiter = '\t' if ext == 'tsv' else ','
-    with open(path, newline='', encoding='utf-8-sig') as f:
-        return list(csv.DictReader(f, delimiter=delimiter))
+        delimiter = '\t' if _ext(path) == 'tsv' else ','
+    parse = pa.csv.ParseOptions(delimiter=delimiter)
 
+    def write(convert):
+        # pyarrow only knows some codecs, and only by extension; ours are sniffed too
+        source = open_data(path, 'rb') if compression_of(path) else path
+        try:
+            reader = pa.csv.open_csv(source, parse_options=parse, convert_options=convert)
+            return write_arrow_batches(reader, reader.schema, output, fmt)
+        finally:
+            if source is not path:
+                source.close()
 
-def write_data(rows, path, fmt=None, delimiter=None):
-    """Write list of dicts to CSV/JSON/JSONL/TSV."""
-    if not rows:
-        print("No rows to write.", file=sys.stderr)
-        return
+    try:
+        return write(None)
+    except pa.ArrowInvalid:
+        header = csv_header(path, delimiter)
+        return write(pa.csv.ConvertOptions(column_types={c: pa.string() for c in header}))
 
-    if fmt is None:
-        ext = path.rsplit('.', 1)[-1].lower() if '.' in path else 'csv'
-        fmt = ext
 
-    if fmt == 'json':
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(rows, f, indent=2, ensure_ascii=False)
-    elif fmt in ('jsonl', 'ndjson'):
-        with open(path, 'w', encoding='utf-8') as f:
-            for row in rows:
-                f.write(json.dumps(row, ensure_ascii=False) + '\n')
-    else:
-        if delimiter is None:
-            delimiter = '\t' if fmt == 'tsv' else ','
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=rows[0].keys(), delimiter=delimiter)
-            writer.writeheader()
-            writer.writerows(rows)
+def batch_tuples(batches):
+    """Row tuples of record batches, converted a column at a time."""
+    for batch in batches:
+        yield from zip(*(c.to_pylist() for c in batch.columns))
 
-    print(f"Wrote {len(rows)} rows to {path}", file=sys.stderr)
 
+def emit_batches(batches, schema, output=None, pretty=False):
+    """``emit_rows`` for record batches, which are written without row dicts."""
+    if output and is_arrow(output):
+        count = write_arrow_batches(batches, schema, output)
+        print(f"Wrote {count} rows to {output}", file=sys.stderr)
+        return count
+    return emit_tuples(schema.names, batch_tuples(batches), output, pretty)
 
-def to_float(val, default=0.0):
-    """Safely convert a value to float."""
-    if val is None:
-        return default
+
+class _NoPushdown(Exception):
+    """The expression or column types cannot be evaluated by pyarrow exactly."""
+
+
+class _ArrowWhere:
+    """Translates a --where AST (or the --column/--op/--value form) into a dataset filter.
+
+    Null cells behave like the empty cells of the text formats: they compare
+    as '' in text predicates and never match numeric ones.
+    """
+
+    def __init__(self, pa, schema):
+        self.pa = pa
+        self.pc = pa.compute
+        self.kinds = {f.name: _arrow_kind(pa, f.type) for f in schema}
+
+    def field(self, name, kinds):
+        if self.kinds.get(name) not in kinds:
+            raise _NoPushdown(name)
+        return self.pa.dataset.field(name)
+
+    def text(self, tok):
+        if tok[0] != 'col':
+            return str(tok[1])
+        f = self.field(tok[1], ('text', 'int'))
+        if self.kinds[tok[1]] == 'int':
+            f = f.cast(self.pa.string())
+        return self.pc.utf8_trim_whitespace(self.pc.coalesce(f, self.pa.scalar('')))
+
+    def number(self, tok):
+        if tok[0] != 'col':
+            return _num(tok[1])
+        return self.field(tok[1], ('int', 'float')).cast(self.pa.float64())
+
+    def known(self, expr, default=False):
+        """Replace a null result (null input cell) with ``default``."""
+        return self.pc.coalesce(expr, self.pa.scalar(default))
+
+    def emit(self, node):
+        pc = self.pc
+        kind = node[0]
+        if kind in ('and', 'or'):
+            parts = [self.emit(n) for n in node[1]]
+            return functools.reduce(operator.and_ if kind == 'and' else operator.or_, parts)
+        if kind == 'not':
+            return ~self.emit(node[1])
+        if kind == 'cmp':
+            _, op, left, right = node
+            numeric = 'num' in (left[0], right[0])
+            if op not in ('==', '!=') and not numeric:
+                numeric = all(t[0] == 'col' or _num(t[1]) == _num(t[1]) for t in (left, right))
+            fn = _CMP_FUNCS[op]
+            if numeric:
+                return self.known(fn(self.number(left), self.number(right)), op == '!=')
+            return fn(self.text(left), self.text(right))
+        if kind == 'in':
+            _, operand, items, negate = node
+            if all(t[0] == 'num' for t in items):
+                expr = self.known(pc.is_in(self.number(operand),
+                                           value_set=self.pa.array([_num(t[1]) for t in items])))
+            else:
+                expr = pc.is_in(self.text(operand), value_set=self.pa.array([str(t[1]) for t in items]))
+            return ~expr if negate else expr
+        if kind == 'empty':
+            _, operand, negate = node
+            expr = pc.equal(self.text(operand), '')
+            return ~expr if negate else expr
+        if kind == 'text':
+            _, op, operand, literal = node
+            fn = {'contains': pc.match_substring, 'startswith': pc.starts_with, 'endswith': pc.ends_with}[op]
+            return fn(self.text(operand), literal, ignore_case=True)
+        # Regex dialects differ (re vs RE2): evaluate in Python
+        raise _NoPushdown(kind)
+
+    def simple(self, col, op, val):
+        """The --column/--op/--value form; numeric ops read null cells as 0."""
+        if op in ('gt', 'gte', 'lt', 'lte'):
+            cell = self.known(self.number(('col', col)), 0.0)
+            return _CMP_FUNCS[{'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}[op]](cell, to_float(val))
+        if op in ('eq', 'neq'):
+            return _CMP_FUNCS['==' if op == 'eq' else '!='](self.text(('col', col)), val)
+        return self.emit(('text', op, ('col', col), val))
+
+
+def arrow_filter(path, where=None, column=None, op=None, value=None):
+    """Filter a Parquet/Arrow file inside pyarrow with row-group pruning.
+
+    Returns ``(total_rows, schema, record_batches)``, or None when pyarrow is
+    missing, the input is a text format or the predicate needs Python.
+    """
+    pa = _arrow()
+    if pa is None or not is_arrow(path):
+        return None
+    dataset = arrow_dataset(path)
+    translator = _ArrowWhere(pa, dataset.schema)
     try:
-        return float(str(val).strip())
-    except (ValueError, TypeError):
-        return default
+        if where:
+            expr = translator.emit(_WhereParser(where).parse())
+        else:
+            expr = translator.simple(column, op, value)
+    except _NoPushdown:
+        return None
+    return dataset.count_rows(), dataset.schema, dataset.to_batches(filter=expr, batch_size=_BATCH_ROWS)
+
+
+def arrow_sort(path, columns, orders, numeric, memory_limit):
+    """Stable in-memory sort of a Parquet/Arrow file with ``sort_indices``.
+
+    Keys follow ``make_sort_key`` (trimmed, lower-cased text; floats for
+    ``numeric``). Returns a table, or None to use the external sort.
+    """
+    pa = _arrow()
+    if pa is None or not is_arrow(path) or _arrow_bytes(path) > parse_size(memory_limit):
+        return None
+    pc = pa.compute
+    table = arrow_dataset(path).to_table()
+    orders = [orders[min(i, len(orders) - 1)] for i in range(len(columns))]
+    keys, sort_keys = {}, []
+    for i, (col, order) in enumerate(zip(columns, orders)):
+        if col not in table.column_names:
+            continue  # a missing column sorts every row equal
+        kind = _arrow_kind(pa, table.schema.field(col).type)
+        arr = table[col]
+        if col in numeric:
+            if kind not in ('int', 'float'):
+                return None
+            key = pc.fill_null(pc.cast(arr, pa.float64()), 0.0)
+        elif kind == 'text':
+            key = pc.utf8_lower(pc.utf8_trim_whitespace(pc.fill_null(arr, '')))
+        elif kind == 'int':
+            key = pc.fill_null(pc.cast(arr, pa.string()), '')
+        else:
+            return None
+        keys[f'k{i}'] = key
+        sort_keys.append((f'k{i}', 'descending' if order == 'desc' else 'ascending'))
+    if not sort_keys:
+        return table
+    return table.take(pc.sort_indices(pa.table(keys), sort_keys=sort_keys))
+
+
+def arrow_aggregate(path, plan):
+    """Hash group-by inside pyarrow, reading only the plan's columns.
+
+    Returns ``(total_rows, {key: (rows, values)})`` like ``compute_aggregates``,
+    or None unless group keys are text/integer and value columns numeric.
+    """
+    pa = _arrow()
+    if pa is None or not is_arrow(path):
+        return None
+    pc = pa.compute
+    dataset = arrow_dataset(path)
+    kinds = {f.name: _arrow_kind(pa, f.type) for f in dataset.schema}
+    if any(kinds.get(c) not in ('text', 'int') for c in plan.group_cols):
+        return None
+    if any(kinds.get(c) not in ('int', 'float') for c in plan.value_columns):
+        return None
+    if any(kinds.get(c) is None for c, func in plan.specs if func == 'count_distinct'):
+        return None
+
+    table = dataset.to_table(columns=list(dict.fromkeys(plan.group_cols + [c for c, _ in plan.specs])))
+    cols = {f'g{i}': pc.fill_null(pc.cast(table[c], pa.string()), '') for i, c in enumerate(plan.group_cols)}
+    aggs = [('g0', 'count', pc.CountOptions(mode='all'))]
+    names = []
+    for j, (col, func) in enumerate(plan.specs):
+        fn, opt = _ARROW_AGGS.get(func) or ('tdigest', agg_quantile(func))
+        arr = table[col]
+        if func == 'count_distinct':
+            text = pc.cast(arr, pa.string())
+            arr = pc.if_else(pc.equal(pc.utf8_trim_whitespace(text), ''), pa.scalar(None, pa.string()), text)
+        else:
+            arr = pc.cast(arr, pa.float64())
+        cols[f'v{j}'] = arr
+        if fn == 'tdigest':
+            aggs.append((f'v{j}', fn, pc.TDigestOptions(q=opt)))
+        elif fn == 'stddev':
+            aggs.append((f'v{j}', fn, pc.VarianceOptions(ddof=opt)))
+        else:
+            aggs.append((f'v{j}', fn))
+        names.append(f'v{j}_{fn}')
+
+    grouped = pa.table(cols).group_by(list(cols)[:len(plan.group_cols)]).aggregate(aggs).to_pydict()
+    keys = zip(*(grouped[f'g{i}'] for i in range(len(plan.group_cols))))
+    results = {}
+    for n, key in enumerate(keys):
+        values = []
+        for name in names:
+            v = grouped[name][n]
+            if isinstance(v, list):
+                v = v[0] if v else None
+            values.append(0 if v is None else v)
+        results[key] = (grouped['g0_count'][n], values)
+    return table.num_rows, results
+
+
+def arrow_join(left_path, right_path, on, how, memory_limit):
+    """Join two Parquet/Arrow files with pyarrow's hash join.
+
+    Output columns match ``HashJoin`` (left fields, then right non-key fields,
+    right values winning on name clashes). Returns a table or None.
+    """
+    pa = _arrow()
+    if pa is None or not (is_arrow(left_path) and is_arrow(right_path)):
+        return None
+    if _arrow_bytes(left_path) + _arrow_bytes(right_path) > parse_size(memory_limit):
+        return None
+    pc = pa.compute
+    tables = []
+    for path in (left_path, right_path):
+        table = arrow_dataset(path).to_table()
+        for c in on:
+            if c not in table.column_names or _arrow_kind(pa, table.schema.field(c).type) not in ('text', 'int'):
+                return None
+            # Keys compare as strings, as in HashJoin
+            table = table.set_column(table.column_names.index(c), c, pc.fill_null(pc.cast(table[c], pa.string()), ''))
+        tables.append(table)
+    left, right = tables
+
+    fields = list(left.column_names)
+    if how not in ('semi', 'anti'):
+        extra = [c for c in right.column_names if c not in on]
+        left = left.drop_columns([c for c in extra if c in fields])
+        fields += [c for c in extra if c not in fields]
+    joined = left.join(right, keys=on, join_type=_ARROW_JOIN_TYPES[how], coalesce_keys=True)
+    return joined.select(fields)
+
+
+# ---------------------------------------------------------------------------
+# Composable operators
+# ---------------------------------------------------------------------------
+
+# A row-stream operator built from a command's parsed ``args``. ``run(rows)``
+# transforms an iterator of dicts; ``reads`` lists the input columns it touches (None: every column) and
+# ``resets`` marks operators whose output rows are built only from ``reads``,
+# so nothing downstream needs other input columns. ``stats`` is filled while
+# the operator runs.
+Stage = namedtuple('Stage', 'name args run reads resets stats')
+PIPE_STAGES = ('filter', 'select', 'clean', 'dedup', 'sort', 'top', 'window', 'aggregate', 'join')
+
+
+def _cells(row, columns):
+    """The projected tuple a predicate or digest sees for a row dict."""
+    return tuple('' if row.get(c) is None else str(row.get(c)) for c in columns)
+
+
+def filter_stage(args):
+    """``filter --where``/``--column --op --value`` as an operator."""
+    columns, predicate = make_predicate(args.where, args.column, args.op, args.value)
+    batch_predicate = make_batch_predicate(args.where, args.column, args.op, args.value) if columns else None
+    stats = {'rows': 0}
+
+    def run(rows):
+        if batch_predicate is not None:
+            yield from filter_batches(rows, columns, batch_predicate, stats)
+            return
+        for r in rows:
+            stats['rows'] += 1
+            if predicate(_cells(r, columns)):
+                yield r
+
+    return Stage('filter', args, run, columns, False, stats)
+
+
+def select_stage(args):
+    """Keep only ``--columns``, in that order."""
+    columns = split_list(args.columns)
+    if not columns:
+        print("Error: select needs --columns a,b,...", file=sys.stderr)
+        sys.exit(1)
+
+    def run(rows):
+        return ({c: r.get(c, '') for c in columns} for r in rows)
+
+    return Stage('select', args, run, columns, True, {})
+
+
+def clean_stage(args):
+    """``clean`` as an operator."""
+    # Cleaning renames keys (strips them), so it needs every input column
+    return Stage('clean', args, clean_rows, None, False, {})
+
+
+def sort_spec(args):
+    """``(columns, orders, numeric_columns)`` from the sort options."""
+    columns = split_list(args.column)
+    orders = split_list(args.order) or ['asc']
+    bad = [o for o in orders if o not in ('asc', 'desc')]
+    if not columns or bad:
+        print(f"Error: --column needs at least one column and --order only asc/desc (got {args.order})",
+              file=sys.stderr)
+        sys.exit(1)
+    numeric = set(split_list(args.numeric_columns))
+    unknown = sorted(numeric - set(columns))
+    if unknown:
+        print(f"Error: --numeric-columns {', '.join(unknown)} not among the sort columns ({args.column})",
+              file=sys.stderr)
+        sys.exit(1)
+    if args.numeric:
+        numeric = set(columns)
+    return columns, orders, numeric
+
+
+def sort_stage(args):
+    """``sort`` as an operator (external merge sort beyond --memory-limit)."""
+    columns, orders, numeric = sort_spec(args)
+    key_fn, reverse = make_sort_key(columns, orders, numeric)
+    sorter = numpy_sorter(columns, orders, numeric)
+    stats = {}
+
+    def run(rows):
+        return external_sort(rows, key_fn, reverse, args.memory_limit, stats, sorter)
+
+    return Stage('sort', args, run, columns, False, stats)
+
+
+def top_rows(rows, value_of, key_of, n, smallest=False, stats=None):
+    """The ``n`` rows with the largest (or smallest) numeric ``value_of(row)`` per ``key_of(row)``.
+
+    Streams once with a bounded min-heap per group, so memory is
+    ``n * groups`` rows and each row costs at most ``O(log n)``; rows that
+    cannot enter a full heap are rejected with one comparison. Empty and
+    non-numeric values are skipped. Returns ``{group key: rows}`` with rows
+    best first; ties keep input order.
+    """
+    sign = -1.0 if smallest else 1.0
+    heaps = {}
+    seq = skipped = 0
+    for r in rows:
+        seq += 1
+        v = _num(value_of(r))
+        if v != v:
+            skipped += 1
+            continue
+        v *= sign
+        key = key_of(r)
+        heap = heaps.get(key)
+        if heap is None:
+            heap = heaps[key] = []
+        # The sequence number breaks ties (earlier wins) and keeps rows out of comparisons
+        if len(heap) < n:
+            heapq.heappush(heap, (v, -seq, r))
+        elif v > heap[0][0]:
+            heapq.heapreplace(heap, (v, -seq, r))
+    if stats is not None:
+        stats['rows'], stats['skipped'], stats['groups'] = seq, skipped, len(heaps)
+    return {key: [r for _, _, r in sorted(heap, reverse=True)] for key, heap in heaps.items()}
+
+
+def top_stage(args):
+    """``top`` as an operator: groups in key order, rows best first within each."""
+    group_cols = split_list(args.by_group)
+    if args.n < 1:
+        print("Error: --n must be at least 1", file=sys.stderr)
+        sys.exit(1)
+    stats = {}
+
+    def run(rows):
+        groups = top_rows(rows, lambda r: r.get(args.column), lambda r: _cells(r, group_cols),
+                          args.n, args.order == 'asc', stats)
+        return itertools.chain.from_iterable(groups[k] for k in sorted(groups))
+
+    return Stage('top', args, run, [args.column] + group_cols, False, stats)
+
+
+WindowSpec = namedtuple('WindowSpec', 'name func column n')
+WINDOW_FUNCS = ('row_number', 'rank', 'lag', 'lead', 'cumsum', 'rolling_mean')
+_WINDOW_SPEC = re.compile(r'^(?:(?P<column>.+):)?(?P<func>[a-z_]+)(?::(?P<n>\d+)|\((?P<k>\d+)\))?$')
+
+
+def parse_window_specs(specs):
+    """Parse repeatable ``[column:]func[:n]`` values (``rolling_mean(3)`` also works) into ``WindowSpec``s."""
+    parsed = []
+    for spec in specs or []:
+        m = _WINDOW_SPEC.match(spec.strip())
+        func, col, n = (m['func'], m['column'], m['n'] or m['k']) if m else (None, None, None)
+        n = int(n) if n else None
+        if (func not in WINDOW_FUNCS or (func == 'row_number') == bool(col) or n == 0
+                or (n is not None and func not in ('lag', 'lead', 'rolling_mean'))
+                or (n is None and func == 'rolling_mean')):
+            print(f"Error: invalid --func '{spec}' (expected row_number, column:rank, column:lag[:n], "
+                  f"column:lead[:n], column:cumsum or column:rolling_mean:k)", file=sys.stderr)
+            sys.exit(1)
+        if func == 'row_number':
+            name = func
+        elif func in ('lag', 'lead') and n in (None, 1):
+            name = f'{func}_{col}'
+        else:
+            name = f'{func}{n or ""}_{col}'
+        parsed.append(WindowSpec(name, func, col, n or 1))
+    return parsed
+
+
+# Text of a running sum or mean; summation noise below 12 significant digits is dropped
+_fmt_float = '%.12g'.__mod__
+
+
+def window_values(spec, cells):
+    """Output cells of one ``WindowSpec`` over a partition's ``cells`` (its column, in input order)."""
+    size = len(cells)
+    func, n = spec.func, spec.n
+    if func == 'row_number':
+        return list(map(str, range(1, size + 1)))
+    if func == 'rank':
+        # SQL RANK(): equal values share the rank of their first row, then there is a gap.
+        # Values compare as sort orders them: numerically, else ignoring case and padding.
+        out, prev, rank = [], None, 0
+        for i, v in enumerate(cells, 1):
+            x = _num(v)
+            v = v.strip().lower() if x != x else x
+            if v != prev:
+                rank, prev = i, v
+            out.append(str(rank))
+        return out
+    if func == 'lag':
+        return [''] * min(n, size) + cells[:max(size - n, 0)]
+    if func == 'lead':
+        return cells[n:] + [''] * min(n, size)
+    if func == 'cumsum':
+        # Non-numeric cells add nothing; rows before the first number stay empty
+        values = list(map(_num, cells))
+        first = next((i for i, v in enumerate(values) if v == v), size)
+        totals = itertools.accumulate(v if v == v else 0.0 for v in values[first:])
+        return [''] * first + list(map(_fmt_float, totals))
+    # rolling_mean: mean of the numeric cells among this row and the n-1 before it
+    out, total, count = [], 0.0, 0
+    values = list(map(_num, cells))
+    for i, v in enumerate(values):
+        if v == v:
+            total += v
+            count += 1
+        if i >= n:
+            old = values[i - n]
+            if old == old:
+                total -= old
+                count -= 1
+            if i % n == 0:
+                # Re-sum the frame now and then so add/subtract rounding cannot build up
+                total = math.fsum(x for x in values[i - n + 1:i + 1] if x == x)
+        out.append(_fmt_float(total / count) if count else '')
+    return out
+
+
+def window_rows(rows, key_of, specs, getters, stats=None):
+    """Yield ``(row, window cells)`` over ``rows`` already sorted by partition key.
+
+    Rows are grouped into runs of equal ``key_of(row)`` cells, compared as
+    ``sort`` orders strings (ignoring case and surrounding whitespace).
+    Each run is held in memory only while its columns are computed, so
+    memory is one partition. ``getters[i](row)`` is the cell ``specs[i]``
+    reads. A key that comes back after its run ended means the input was
+    not sorted and stops with an error.
+    """
+    seen = set()
+    total = partitions = 0
+    partition_of = lambda r: tuple(str(c).strip().lower() for c in key_of(r))
+    for key, part in itertools.groupby(rows, partition_of):
+        if key in seen:
+            print(f"Error: input is not sorted by the partition columns ({', '.join(map(str, key))} "
+                  f"appears again after row {total}); sort it first", file=sys.stderr)
+            sys.exit(1)
+        seen.add(key)
+        part = list(part)
+        columns = [window_values(spec, [get(r) for r in part] if get else part)
+                   for spec, get in zip(specs, getters)]
+        yield from zip(part, zip(*columns))
+        total += len(part)
+        partitions += 1
+    if stats is not None:
+        stats['rows'], stats['partitions'] = total, partitions
+
+
+def window_stage(args):
+    """``window`` as an operator over dict rows sorted by ``--partition-by``."""
+    partition_cols = split_list(args.partition_by)
+    specs = parse_window_specs(args.func)
+    if not specs:
+        print("Error: window needs at least one --func", file=sys.stderr)
+        sys.exit(1)
+    stats = {}
+
+    def run(rows):
+        getters = [(lambda r, c=s.column: '' if r.get(c) is None else str(r.get(c))) if s.column else None
+                   for s in specs]
+        pairs = window_rows(rows, lambda r: _cells(r, partition_cols), specs, getters, stats)
+        for r, cells in pairs:
+            r = dict(r)
+            r.update(zip((s.name for s in specs), cells))
+            yield r
+
+    reads = partition_cols + [s.column for s in specs if s.column]
+    return Stage('window', args, run, list(dict.fromkeys(reads)), False, stats)
+
+
+def dedup_stage(args):
+    """``dedup`` as an operator over a stream of unknown length."""
+    key_cols = split_list(args.columns) or None
+    if args.approximate and args.keep == 'last':
+        print("Error: --approximate only supports --keep first", file=sys.stderr)
+        sys.exit(1)
+    budget = parse_size(args.memory_limit)
+    stats = {'rows': 0}
+
+    def run(rows):
+        digest = make_digest(key_cols)
+
+        def pairs():
+            for r in rows:
+                stats['rows'] += 1
+                yield digest(r), r
+
+        # The stream length is unknown here; size the filter for a million keys
+        bloom = BloomFilter(1 << 20, args.fp_rate) if args.approximate else None
+        deduper = Deduper(keep=args.keep, max_keys=budget // _DIGEST_ENTRY_BYTES, bloom=bloom)
+        stats['deduper'] = deduper
+        if args.keep == 'last':
+            # keep='last' reads its input twice; replay it from a spilled run
+            spool = _spill_run(pairs())
+
+            def source():
+                spool.seek(0)
+                return _read_run(spool, close=False)
+        else:
+            source = pairs
+        return deduper.run(source)
+
+    return Stage('dedup', args, run, key_cols, False, stats)
+
+
+def agg_plan(args):
+    """``AggPlan`` from --group-by and the --agg / --agg-column options."""
+    group_cols = split_list(args.group_by)
+    specs = parse_agg_specs(args.agg)
+    if args.agg_column:
+        specs.insert(0, (args.agg_column, args.func))
+    if not group_cols or not specs:
+        print("Error: need --group-by and at least one --agg col:func (or --agg-column)", file=sys.stderr)
+        sys.exit(1)
+    return AggPlan(group_cols, specs)
+
+
+def aggregate_stage(args):
+    """``aggregate`` as an operator: one row per group, sorted by key."""
+    plan = agg_plan(args)
+    columns = plan.key_columns + plan.value_columns
+    stats = {}
+
+    def run(rows):
+        tuples = (_cells(r, columns) for r in rows)
+        batches = tuple_batches(tuples, plan.key_columns, plan.value_columns)
+        total, groups = aggregate_groups(batches, plan)
+        stats['rows'], stats['groups'] = total, len(groups)
+        return iter(aggregate_rows(plan, finish_groups(plan, groups)))
+
+    return Stage('aggregate', args, run, list(dict.fromkeys(columns)), True, stats)
+
+
+def join_stage(args):
+    """``join`` of the stream (left) with ``args.right_file``."""
+    on = split_list(args.on)
+    if not on:
+        print("Error: --on needs at least one column", file=sys.stderr)
+        sys.exit(1)
+    budget = parse_size(args.memory_limit)
+    stats = {}
+
+    def run(rows):
+        # The file is the natural build side; the upstream stream is probed
+        build_left = args.build == 'left'
+        left_first, left = _peek(rows)
+        right_first, right = _peek(iter_data(args.right_file))
+        partitions = 4 * os.path.getsize(args.right_file) // budget + 1
+        joiner = HashJoin(on, args.how, list(left_first or ()), list(right_first or ()),
+                          build_left=build_left, budget=budget, partitions=partitions)
+        stats['joiner'] = joiner
+        return joiner.run(left, right)
+
+    return Stage('join', args, run, on, False, stats)
+
+
+STAGE_BUILDERS = {
+    'filter': filter_stage,
+    'select': select_stage,
+    'clean': clean_stage,
+    'dedup': dedup_stage,
+    'sort': sort_stage,
+    'top': top_stage,
+    'window': window_stage,
+    'aggregate': aggregate_stage,
+    'join': join_stage,
+}
+
+
+def pushdown_columns(stages):
+    """Columns the source must supply for ``stages`` (None: all of them).
+
+    Walks the graph from the sink: each operator adds the columns it reads
+    to those needed downstream, and select/aggregate start afresh.
+    """
+    needed = None
+    for stage in reversed(stages):
+        if stage.resets:
+            needed = list(stage.reads)
+        elif stage.reads is None or needed is None:
+            needed = None
+        else:
+            needed = needed + [c for c in stage.reads if c not in needed]
+    return needed
+
+
+def run_pipeline(path, stages, stats=None):
+    """Fuse ``stages`` over one read of ``path``; returns the output row iterator.
+
+    Only the columns found by ``pushdown_columns`` are parsed. A leading
+    filter on a CSV/TSV source tests raw cells before any row dict is built.
+    ``stats['rows']`` receives the number of source rows read.
+    """
+    if stats is None:
+        stats = {}
+    needed = pushdown_columns(stages)
+    fields = None
+    if needed is not None:
+        first = next(iter_data(path), None)
+        # Keep the source column order so output matches the unfused commands
+        fields = [c for c in (first or {}) if c in set(needed)]
+    stats['columns'] = fields
+
+    def counted(rows):
+        stats['rows'] = 0
+        for r in rows:
+            stats['rows'] += 1
+            yield r
+
+    if stages and stages[0].name == 'filter' and _is_delimited(path):
+        a = stages[0].args
+        columns, predicate = make_predicate(a.where, a.column, a.op, a.value)
+        rows = iter_matching(path, columns, predicate, stats=stats,
+                             batch_predicate=make_batch_predicate(a.where, a.column, a.op, a.value))
+        if fields is not None:
+            rows = ({c: r.get(c, '') for c in fields} for r in rows)
+        stages = stages[1:]
+    elif fields is not None:
+        rows = counted(dict(zip(fields, t)) for t in _iter_projected(path, fields))
+    else:
+        rows = counted(iter_data(path))
+    for stage in stages:
+        rows = stage.run(rows)
+    return rows
 
 
 # ---------------------------------------------------------------------------
 # Commands
 # ---------------------------------------------------------------------------
 
+def _inspect_counts(path, workers=1):
+    """``(rows, columns, non_empty_per_column)`` from the cache, worker pool or a scan."""
+    cache = ColumnCache.open(path)
+    if cache is not None:
+        with cache:
+            return cache.rows, list(cache.header['fields']), {c['name']: c['non_empty'] for c in cache.header['columns']}
+
+    cols = []
+    non_empty = {}
+    total = 0
+    results = run_parallel(path, _inspect_task, workers) if workers > 1 else None
+    if results is not None:
+        for part_total, part_counts in results:
+            if not cols:
+                cols = list(part_counts)
+                non_empty = dict.fromkeys(cols, 0)
+            total += part_total
+            for col, n in part_counts.items():
+                non_empty[col] += n
+        return total, cols, non_empty
+
+    for r in iter_data(path):
+        if not total:
+            cols = list(r.keys())
+            non_empty = dict.fromkeys(cols, 0)
+        total += 1
+        for col in cols:
+            v = r.get(col)
+            if v is not None and str(v).strip():
+                non_empty[col] += 1
+    return total, cols, non_empty
+
+
 def cmd_inspect(args):
-    """Inspect a data file: row count, columns, non-empty counts."""
-    data = read_data(args.file)
-    if not data:
+    """Inspect a data file: row count, columns, non-empty counts.
+
+    With --json (or --sample) every column is profiled in one pass and the
+    result printed as JSON.
+    """
+    if args.json or args.sample:
+        fields, total, profiled, profiles = profile_file(args.file, args.sample, args.workers)
+        print(json.dumps({
+            'file': args.file,
+            'rows': total,
+            'profiled_rows': profiled,
+            'sampled': profiled < total,
+            'columns': [p.summary(name, args.top) for name, p in zip(fields, profiles)],
+        }, **json_style(args.pretty)))
+        return
+
+    total, cols, non_empty = _inspect_counts(args.file, args.workers)
+
+    if not total:
         print("Empty file.")
         return
 
-    print(f"Rows: {len(data)}")
-    cols = list(data[0].keys())
+    print(f"Rows: {total}")
     print(f"Columns ({len(cols)}): {', '.join(cols)}")
     print()
     for col in cols:
-        non_empty = sum(1 for r in data if str(r.get(col, '')).strip())
-        print(f"  {col}: {non_empty}/{len(data)} non-empty")
+        print(f"  {col}: {non_empty[col]}/{total} non-empty")
 
 
 def cmd_filter(args):
-    """Filter rows by a column condition."""
-    data = read_data(args.file)
-    col = args.column
-    op = args.op
-    val = args.value
-
-    def match(row):
-        cell = str(row.get(col, '')).strip()
-        if op in ('gt', 'gte', 'lt', 'lte'):
-            cell_f = to_float(cell)
-            val_f = to_float(val)
-            if op == 'gt': return cell_f > val_f
-            if op == 'gte': return cell_f >= val_f
-            if op == 'lt': return cell_f < val_f
-            if op == 'lte': return cell_f <= val_f
-        if op == 'eq': return cell == val
-        if op == 'neq': return cell != val
-        if op == 'contains': return val.lower() in cell.lower()
-        if op == 'startswith': return cell.lower().startswith(val.lower())
-        if op == 'endswith': return cell.lower().endswith(val.lower())
-        return False
+    """Filter rows by a --where expression or a single column condition."""
+    columns, predicate = make_predicate(args.where, args.column, args.op, args.value)
+    stats = {'rows': 0}
 
-    filtered = [r for r in data if match(r)]
-    print(f"Filtered: {len(filtered)}/{len(data)} rows match")
+    def gathered(results):
+        for part_total, rows in results:
+            stats['rows'] += part_total
+            yield from rows
 
-    if args.output:
-        write_data(filtered, args.output)
+    pushed = arrow_filter(args.file, args.where, args.column, args.op, args.value)
+    if pushed is not None:
+        stats['rows'], schema, batches = pushed
+        matched = emit_batches(batches, schema, args.output, args.pretty)
+        print(f"Filtered: {matched}/{stats['rows']} rows match", file=sys.stderr)
+        return
+
+    results = None
+    if args.workers > 1:
+        results = run_parallel(args.file, _filter_task, args.workers, args.where, args.column, args.op, args.value)
+    if results is not None:
+        matched = emit_rows(gathered(results), args.output, pretty=args.pretty)
     else:
-        writer = csv.DictWriter(sys.stdout, fieldnames=data[0].keys() if data else [])
-        writer.writeheader()
-        writer.writerows(filtered)
+        batch_predicate = make_batch_predicate(args.where, args.column, args.op, args.value)
+        if _is_delimited(args.file):
+            # CSV matches go to the writer as cell lists, never as dicts
+            matches = iter_matching(args.file, columns, predicate, stats=stats, batch_predicate=batch_predicate,
+                                    raw=True)
+            matched = emit_tuples(csv_header(args.file), matches, args.output, args.pretty)
+        else:
+            matches = iter_matching(args.file, columns, predicate, stats=stats, batch_predicate=batch_predicate)
+            matched = emit_rows(matches, args.output, pretty=args.pretty)
+
+    print(f"Filtered: {matched}/{stats['rows']} rows match", file=sys.stderr)
 
 
 def cmd_sort(args):
-    """Sort rows by a column."""
-    data = read_data(args.file)
-    col = args.column
-    reverse = args.order == 'desc'
+    """Sort rows by one or more columns, spilling to disk beyond --memory-limit."""
+    columns, orders, numeric = sort_spec(args)
+    table = arrow_sort(args.file, columns, orders, numeric, args.memory_limit)
+    if table is not None:
+        emit_batches(table.to_batches(), table.schema, args.output, args.pretty)
+        print(f"Sorted {table.num_rows} rows by '{args.column}' ({args.order}, pyarrow)", file=sys.stderr)
+        return
 
-    if args.numeric:
-        key_fn = lambda r: to_float(r.get(col, ''))
+    stage = sort_stage(args)
+    emit_rows(stage.run(iter_data(args.file)), args.output, pretty=args.pretty)
+
+    stats = stage.stats
+    runs = f", {stats['runs']} runs merged" if stats['runs'] > 1 else ''
+    print(f"Sorted {stats['rows']} rows by '{args.column}' ({args.order}{runs})", file=sys.stderr)
+
+
+def cmd_top(args):
+    """The --n rows with the largest --column values (per --by-group group), without a full sort."""
+    group_cols = split_list(args.by_group)
+    if args.n < 1:
+        print("Error: --n must be at least 1", file=sys.stderr)
+        sys.exit(1)
+    first = next(iter_data(args.file), None) or {}
+    fields = list(first)
+    for c in [args.column] + group_cols:
+        if c not in first:
+            print(f"Error: column '{c}' not found (columns: {', '.join(fields)})", file=sys.stderr)
+            sys.exit(1)
+
+    stats = {}
+    if _is_delimited(args.file):
+        # Rank projected tuples; only the winners become dicts
+        value_of = operator.itemgetter(fields.index(args.column))
+        key_of = operator.itemgetter(*[fields.index(c) for c in group_cols]) if group_cols else (lambda t: ())
+        if len(group_cols) == 1:
+            key_of = lambda t, get=key_of: (get(t),)
+        groups = top_rows(_iter_projected(args.file, fields), value_of, key_of, args.n, args.order == 'asc', stats)
+        winners = (dict(zip(fields, t)) for k in sorted(groups) for t in groups[k])
     else:
-        key_fn = lambda r: str(r.get(col, '')).strip().lower()
+        # JSON and Arrow records are kept as read, so the winners keep their value types
+        groups = top_rows(iter_data(args.file), lambda r: r.get(args.column), lambda r: _cells(r, group_cols),
+                          args.n, args.order == 'asc', stats)
+        winners = (r for k in sorted(groups) for r in groups[k])
+    count = emit_rows(winners, args.output, pretty=args.pretty)
 
-    sorted_data = sorted(data, key=key_fn, reverse=reverse)
-    print(f"Sorted {len(sorted_data)} rows by '{col}' ({args.order})")
+    groups = f" in {stats['groups']} groups" if args.by_group else ''
+    skipped = f", {stats['skipped']} non-numeric skipped" if stats['skipped'] else ''
+    print(f"Top {args.n} by '{args.column}' ({args.order}): {count} of {stats['rows']} rows{groups}{skipped}",
+          file=sys.stderr)
 
-    if args.output:
-        write_data(sorted_data, args.output)
+
+def cmd_window(args):
+    """Window functions per --partition-by run of an input already sorted by it."""
+    partition_cols = split_list(args.partition_by)
+    specs = parse_window_specs(args.func)
+    if not specs:
+        print("Error: window needs at least one --func", file=sys.stderr)
+        sys.exit(1)
+    # From the header, so a header-only input still keeps its columns
+    if _is_delimited(args.file):
+        fields = csv_header(args.file)
+    elif is_arrow(args.file):
+        fields = list(arrow_dataset(args.file).schema.names)
     else:
-        writer = csv.DictWriter(sys.stdout, fieldnames=data[0].keys() if data else [])
-        writer.writeheader()
-        writer.writerows(sorted_data)
+        fields = list(next(iter_data(args.file), None) or {})
+    for c in partition_cols + [s.column for s in specs if s.column]:
+        if c not in fields:
+            print(f"Error: column '{c}' not found (columns: {', '.join(fields)})", file=sys.stderr)
+            sys.exit(1)
+    clash = [s.name for s in specs if s.name in fields]
+    if clash or len({s.name for s in specs}) < len(specs):
+        print(f"Error: duplicate output column(s) {', '.join(clash or [s.name for s in specs])}", file=sys.stderr)
+        sys.exit(1)
+
+    # Rows stay tuples; the window cells are appended to each
+    key_of = operator.itemgetter(*[fields.index(c) for c in partition_cols]) if partition_cols else (lambda t: ())
+    if len(partition_cols) == 1:
+        key_of = lambda t, get=key_of: (get(t),)
+    getters = [operator.itemgetter(fields.index(s.column)) if s.column else None for s in specs]
+    stats = {}
+    pairs = window_rows(_iter_projected(args.file, fields), key_of, specs, getters, stats)
+    # Unsorted input is only detected midway, so the output is swapped in at the end
+    emit_tuples(fields + [s.name for s in specs], (t + cells for t, cells in pairs), args.output, args.pretty,
+                atomic=True)
+
+    names = ', '.join(s.name for s in specs)
+    print(f"Windowed {stats['rows']} rows in {stats['partitions']} partitions ({names})", file=sys.stderr)
 
 
 def cmd_dedup(args):
-    """Remove duplicate rows."""
-    data = read_data(args.file)
-    key_cols = [c.strip() for c in args.columns.split(',')] if args.columns else None
+    """Remove duplicate rows, keeping the first or last occurrence."""
+    key_cols = split_list(args.columns) or None
+    if args.approximate and args.keep == 'last':
+        print("Error: --approximate only supports --keep first", file=sys.stderr)
+        sys.exit(1)
+    total = 0
 
-    seen = set()
-    unique = []
-    for r in data:
-        if key_cols:
-            key = tuple(str(r.get(c, '')) for c in key_cols)
-        else:
-            key = tuple(sorted((k, str(v)) for k, v in r.items()))
-        if key not in seen:
-            seen.add(key)
-            unique.append(r)
+    def serial():
+        nonlocal total
+        total = 0
+        digest = make_digest(key_cols)
+        for r in iter_data(args.file):
+            total += 1
+            yield digest(r), r
 
-    removed = len(data) - len(unique)
-    print(f"Deduplicated: {len(unique)} unique rows ({removed} duplicates removed)")
+    def parallel():
+        nonlocal total
+        total = 0
+        for part_total, kept in run_parallel(args.file, _dedup_task, args.workers, key_cols, args.keep):
+            total += part_total
+            yield from kept
 
-    if args.output:
-        write_data(unique, args.output)
-    else:
-        writer = csv.DictWriter(sys.stdout, fieldnames=data[0].keys() if data else [])
-        writer.writeheader()
-        writer.writerows(unique)
+    use_parallel = args.workers > 1 and split_chunks(args.file, args.workers) is not None
+    budget = parse_size(args.memory_limit)
+    bloom = BloomFilter(_estimate_rows(args.file), args.fp_rate) if args.approximate else None
+    deduper = Deduper(keep=args.keep, max_keys=budget // _DIGEST_ENTRY_BYTES, bloom=bloom,
+                      partitions=2 * os.path.getsize(args.file) // budget + 1)
 
+    count = emit_rows(deduper.run(parallel if use_parallel else serial), args.output, pretty=args.pretty)
+    mode = ', approximate' if bloom else (', spilled to disk' if deduper.spilled else '')
+    print(f"Deduplicated: {count} unique rows ({total - count} duplicates removed, keep {args.keep}{mode})",
+          file=sys.stderr)
+    if bloom and bloom.added > bloom.capacity:
+        print(f"Warning: {bloom.added} distinct rows exceeded the Bloom filter sizing ({bloom.capacity}); "
+              f"the false-positive rate is higher than {args.fp_rate}", file=sys.stderr)
 
-def cmd_aggregate(args):
-    """Group by a column and aggregate another."""
-    data = read_data(args.file)
-    group_col = args.group_by
-    agg_col = args.agg_column
-    func = args.func
 
-    groups = defaultdict(list)
-    for r in data:
-        groups[r.get(group_col, '')].append(r)
+def _run_aggregate(path, plan, workers=1):
+    """Aggregate ``path`` with ``plan``, merging per-chunk states when parallel."""
+    results = None
+    if workers > 1 and not ColumnCache.serves(path, plan.key_columns + plan.value_columns):
+        results = run_parallel(path, _aggregate_task, workers, plan)
+    if results is None:
+        return aggregate_groups(iter_column_batches(path, plan.key_columns, plan.value_columns), plan)
+    total, groups = 0, {}
+    for part_total, part_groups in results:
+        total += part_total
+        merge_states(groups, part_groups)
+    return total, groups
 
-    results = []
-    for name in sorted(groups):
-        group = groups[name]
-        values = [to_float(r.get(agg_col, '')) for r in group if str(r.get(agg_col, '')).strip()]
-        if func == 'sum':
-            agg = sum(values)
-        elif func == 'avg':
-            agg = sum(values) / len(values) if values else 0
-        elif func == 'count':
-            agg = len(values)
-        elif func == 'min':
-            agg = min(values) if values else 0
-        elif func == 'max':
-            agg = max(values) if values else 0
-        else:
-            agg = sum(values)
 
-        results.append({
-            group_col: name,
-            f'{func}_{agg_col}': f'{agg:.2f}',
-            'count': str(len(group))
-        })
+def compute_aggregates(path, plan, workers=1):
+    """``(total_rows, {key: (rows, values)})`` with one value per ``plan.outputs``.
 
-    print(f"Aggregated {len(data)} rows into {len(results)} groups")
+    Parquet/Arrow inputs are grouped inside pyarrow when possible.
+    """
+    pushed = arrow_aggregate(path, plan)
+    if pushed is not None:
+        return pushed
+    total, groups = _run_aggregate(path, plan, workers)
+    return total, finish_groups(plan, groups)
 
-    if args.output:
-        write_data(results, args.output)
+
+_STATE_VERSION = 1
+_STATE_HEAD_BYTES = 4096
+
+
+def _head_digest(path, length):
+    """blake2b digest of the first ``length`` bytes of ``path``."""
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(length), digest_size=16).digest()
+
+
+def load_agg_state(state_path):
+    """The saved ``aggregate --state`` dict, or None when missing or unreadable."""
+    try:
+        with open(state_path, 'rb') as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError) as e:
+        print(f"Warning: ignoring unreadable state file {state_path} ({e})", file=sys.stderr)
+        return None
+    if not isinstance(state, dict) or state.get('version') != _STATE_VERSION:
+        return None
+    return state
+
+
+def incremental_aggregate(path, plan, state_path, workers=1):
+    """Aggregate an append-only CSV/TSV/JSONL file, resuming from ``state_path``.
+
+    The state holds the group accumulators, the byte offset processed and
+    the file's identity (device/inode, a digest of its first bytes). When
+    these still match and the file has not shrunk, only the bytes appended
+    since are parsed and merged; otherwise everything is recomputed. A
+    trailing record without its newline yet is left for the next run.
+    Returns ``(total_rows, groups, note)``.
+    """
+    ext = _ext(path)
+    if ext == 'json' or ext in ARROW_FORMATS or compression_of(path):
+        print("Error: --state needs an uncompressed CSV, TSV or JSON Lines file "
+              "(rows are resumed by byte offset)", file=sys.stderr)
+        sys.exit(1)
+    st = os.stat(path)
+    identity = (st.st_dev, st.st_ino)
+    signature = (plan.group_cols, plan.specs)
+
+    state = load_agg_state(state_path)
+    if state is None:
+        reason = 'no saved state'
+    elif state['source'] != os.path.abspath(path) or state['plan'] != signature:
+        reason = 'state was saved for another file or --group-by/--agg'
+    elif state['identity'] != identity:
+        reason = 'file was rotated'
+    elif st.st_size < state['offset']:
+        reason = 'file was truncated'
+    elif _head_digest(path, state['head_bytes']) != state['head']:
+        reason = 'file was rewritten'
+    else:
+        reason = None
+
+    quoted = ext not in ('jsonl', 'ndjson')
+    delimiter = '\t' if ext == 'tsv' else ','
+    with open(path, 'rb') as f:
+        data_start, _ = _data_start(f, quoted, delimiter)
+        start = data_start if reason else state['offset']
+        end = _complete_end(f, start, st.st_size, quoted)
+
+    chunks = split_chunks(path, workers, delimiter, start, end)
+    task = functools.partial(_aggregate_task, plan)
+    results = _pool_imap(task, chunks, workers)
+    total, groups = (0, {}) if reason else (state['total'], state['groups'])
+    added = 0
+    for part_total, part_groups in results:
+        added += part_total
+        merge_states(groups, part_groups)
+    total += added
+
+    head_bytes = min(end, _STATE_HEAD_BYTES)
+    new_state = {
+        'version': _STATE_VERSION, 'source': os.path.abspath(path), 'plan': signature,
+        'identity': identity, 'offset': end, 'head_bytes': head_bytes, 'head': _head_digest(path, head_bytes),
+        'total': total, 'groups': groups,
+    }
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(new_state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, state_path)
+
+    if reason:
+        note = f"full scan: {reason}"
+    else:
+        note = f"resumed at byte {start}: {added} new rows"
+    return total, groups, note
+
+
+def cmd_aggregate(args):
+    """Group by one or more columns and compute any number of aggregates in one scan."""
+    plan = agg_plan(args)
+    note = ''
+    if args.state:
+        total, groups, note = incremental_aggregate(args.file, plan, args.state, args.workers)
+        groups = finish_groups(plan, groups)
+        note = f" ({note})"
     else:
-        writer = csv.DictWriter(sys.stdout, fieldnames=results[0].keys() if results else [])
-        writer.writeheader()
-        writer.writerows(results)
+        total, groups = compute_aggregates(args.file, plan, args.workers)
+    results = aggregate_rows(plan, groups)
+
+    emit_rows(results, args.output, pretty=args.pretty)
+    print(f"Aggregated {total} rows into {len(results)} groups{note}", file=sys.stderr)
 
 
 def cmd_join(args):
-    """Join two datasets on a key column."""
-    left = read_data(args.left_file)
-    right = read_data(args.right_file)
-    on = args.on
+    """Join two datasets on one or more key columns."""
+    on = split_list(args.on)
     how = args.how
+    if not on:
+        print("Error: --on needs at least one column", file=sys.stderr)
+        sys.exit(1)
 
-    right_index = defaultdict(list)
-    right_cols = set()
-    for r in right:
-        right_index[str(r.get(on, ''))].append(r)
-        right_cols.update(r.keys())
-    right_cols.discard(on)
-
-    results = []
-    for lr in left:
-        key = str(lr.get(on, ''))
-        if key in right_index:
-            for rr in right_index[key]:
-                merged = dict(lr)
-                for k, v in rr.items():
-                    if k != on:
-                        merged[k] = v
-                results.append(merged)
-        elif how == 'left':
-            merged = dict(lr)
-            for col in right_cols:
-                merged[col] = ''
-            results.append(merged)
-
-    print(f"Joined: {len(results)} rows ({how} join on '{on}')")
+    table = arrow_join(args.left_file, args.right_file, on, how, args.memory_limit)
+    if table is not None:
+        count = emit_batches(table.to_batches(), table.schema, args.output, args.pretty)
+        print(f"Joined: {count} rows ({how} join on '{args.on}', pyarrow)", file=sys.stderr)
+        return
 
-    if args.output:
-        write_data(results, args.output)
+    left_size = os.path.getsize(args.left_file)
+    right_size = os.path.getsize(args.right_file)
+    if args.build == 'auto':
+        build_left = left_size < right_size
     else:
-        if results:
-            writer = csv.DictWriter(sys.stdout, fieldnames=results[0].keys())
-            writer.writeheader()
-            writer.writerows(results)
+        build_left = args.build == 'left'
+
+    left_first, left = _peek(iter_data(args.left_file))
+    right_first, right = _peek(iter_data(args.right_file))
+    budget = parse_size(args.memory_limit)
+    # Python rows take several times their on-disk size
+    build_size = left_size if build_left else right_size
+    partitions = 4 * build_size // budget + 1
+
+    joiner = HashJoin(on, how, list(left_first or ()), list(right_first or ()),
+                      build_left=build_left, budget=budget, partitions=partitions)
+    count = emit_rows(joiner.run(left, right), args.output, pretty=args.pretty)
+
+    side = 'left' if build_left else 'right'
+    spill = ', spilled to disk' if joiner.spilled else ''
+    print(f"Joined: {count} rows ({how} join on '{args.on}', built on {side}{spill})", file=sys.stderr)
 
 
 def cmd_convert(args):
-    """Convert between CSV, JSON, JSONL, TSV formats."""
-    data = read_data(args.file)
+    """Convert between CSV, JSON, JSONL, TSV, Parquet and Arrow formats."""
     fmt = args.to
     output = args.output
 
     if not output:
-        base = args.file.rsplit('.', 1)[0] if '.' in args.file else args.file
+        base = strip_compression(args.file)
+        base = base.rsplit('.', 1)[0] if '.' in base else base
         ext_map = {'json': 'json', 'jsonl': 'jsonl', 'csv': 'csv', 'tsv': 'tsv'}
         output = f"{base}.{ext_map.get(fmt, fmt)}"
 
-    write_data(data, output, fmt=fmt)
-    print(f"Converted {len(data)} rows to {fmt} format")
+    if fmt in ARROW_FORMATS and _is_delimited(args.file):
+        count = convert_csv_to_arrow(args.file, output, fmt)
+        print(f"Wrote {count} rows to {output}", file=sys.stderr)
+    elif _is_delimited(args.file):
+        # Cells go from the reader to the writer as tuples
+        fields = csv_header(args.file)
+        count = write_tuples(fields, _iter_projected(args.file, fields), output, fmt, pretty=args.pretty)
+        print(f"Wrote {count} rows to {output}", file=sys.stderr)
+    elif is_arrow(args.file) and fmt not in ARROW_FORMATS:
+        dataset = arrow_dataset(args.file)
+        batches = dataset.to_batches(batch_size=_BATCH_ROWS)
+        count = write_tuples(dataset.schema.names, batch_tuples(batches), output, fmt, pretty=args.pretty)
+        print(f"Wrote {count} rows to {output}", file=sys.stderr)
+    else:
+        count = write_data(iter_data(args.file), output, fmt=fmt, pretty=args.pretty)
+    print(f"Converted {count} rows to {fmt} format", file=sys.stderr if _is_stdout(output) else sys.stdout)
 
 
 def cmd_report(args):
     """Generate a Markdown summary report."""
-    data = read_data(args.file)
     group_col = args.group_by
     value_col = args.value_column
+    percentiles = split_list(args.percentiles)
+    bad = [p for p in percentiles if agg_quantile(f'p{p}') is None]
+    if bad:
+        print(f"Error: --percentiles takes numbers between 0 and 100 (got {', '.join(bad)})", file=sys.stderr)
+        sys.exit(1)
 
-    groups = defaultdict(list)
-    for r in data:
-        groups[r.get(group_col, '')].append(r)
+    # All four share one Moments accumulator per group; percentiles share one t-digest
+    plan = AggPlan([group_col], [(value_col, f) for f in ('count', 'sum', 'min', 'max')] +
+                   [(value_col, f'p{p}') for p in percentiles])
+    total, groups = compute_aggregates(args.file, plan, args.workers)
 
     lines = [
         f"# Data Summary Report",
         f"",
-        f"**Total rows**: {len(data)}",
+        f"**Total rows**: {total}",
         f"**Grouped by**: {group_col}",
         f"**Value column**: {value_col}",
         "",
-        f"| {group_col} | Count | Sum | Avg | Min | Max |",
-        "|---|---|---|---|---|---|"
+        f"| {group_col} | Count | Sum | Avg | Min | Max |" + ''.join(f" P{p} |" for p in percentiles),
+        "|---|---|---|---|---|---|" + "---|" * len(percentiles)
     ]
 
-    for name in sorted(groups):
-        vals = [to_float(r.get(value_col, '')) for r in groups[name] if str(r.get(value_col, '')).strip()]
-        if vals:
+    for (name,) in sorted(groups):
+        count, total_sum, low, high, *quantiles = groups[(name,)][1]
+        if count:
             lines.append(
-                f"| {name} | {len(vals)} | {sum(vals):.2f} | {sum(vals)/len(vals):.2f} | {min(vals):.2f} | {max(vals):.2f} |"
+                f"| {name} | {count} | {total_sum:.2f} | {total_sum/count:.2f} | {low:.2f} | {high:.2f} |"
+                + ''.join(f" {q:.2f} |" for q in quantiles)
             )
         else:
-            lines.append(f"| {name} | 0 | - | - | - | - |")
+            lines.append(f"| {name} | 0 | - | - | - | - |" + " - |" * len(quantiles))
 
-    lines.extend(["", f"*Generated from {len(data)} rows*"])
+    lines.extend(["", f"*Generated from {total} rows*"])
     report = '\n'.join(lines)
 
     if args.output:
-        with open(args.output, 'w', encoding='utf-8') as f:
+        with open_data(args.output, 'w') as f:
             f.write(report)
         print(f"Report written to {args.output}", file=sys.stderr)
     else:
         print(report)
 
 
-def cmd_clean(args):
-    """Clean common data quality issues."""
-    data = read_data(args.file)
-    cleaned = []
+_EMPTY_VALUES = frozenset(('', 'n/a', 'na', 'null', 'none', '-', '#n/a', '#ref!'))
+_TRUE_VALUES = frozenset(('true', 'yes', '1', 'y'))
+_FALSE_VALUES = frozenset(('false', 'no', '0', 'n'))
 
-    for r in data:
+
+def clean_rows(rows):
+    """Lazily strip keys/values and normalise empty and boolean-like values."""
+    for r in rows:
         clean_row = {}
         for k, v in r.items():
             k = k.strip()
             v = str(v).strip() if v is not None else ''
+            low = v.lower()
             # Normalize empty values
-            if v.lower() in ('', 'n/a', 'na', 'null', 'none', '-', '#n/a', '#ref!'):
+            if low in _EMPTY_VALUES:
                 v = ''
             # Normalize booleans
-            elif v.lower() in ('true', 'yes', '1', 'y'):
+            elif low in _TRUE_VALUES:
                 v = 'true'
-            elif v.lower() in ('false', 'no', '0', 'n'):
+            elif low in _FALSE_VALUES:
                 v = 'false'
             clean_row[k] = v
-        cleaned.append(clean_row)
+        yield clean_row
 
-    print(f"Cleaned {len(cleaned)} rows")
 
-    if args.output:
-        write_data(cleaned, args.output)
+def cmd_clean(args):
+    """Clean common data quality issues."""
+    count = emit_rows(clean_stage(args).run(iter_data(args.file)), args.output, pretty=args.pretty)
+    print(f"Cleaned {count} rows", file=sys.stderr)
+
+
+def cmd_select(args):
+    """Keep only some columns, parsing just those from the input."""
+    stage = select_stage(args)
+    if _is_delimited(args.file):
+        count = emit_tuples(stage.reads, _iter_projected(args.file, stage.reads), args.output, args.pretty)
+    else:
+        count = emit_rows(run_pipeline(args.file, [stage]), args.output, pretty=args.pretty)
+    print(f"Selected {len(split_list(args.columns))} columns from {count} rows", file=sys.stderr)
+
+
+def parse_stage(parser, spec):
+    """Build a ``Stage`` from "cmd --opt val" text or a {"cmd": {"opt": val}} mapping.
+
+    Options are those of the matching subcommand, minus the input file;
+    a join stage takes the right-hand file as its positional argument
+    (``file`` in a mapping).
+    """
+    if isinstance(spec, str):
+        tokens = shlex.split(spec)
+    elif isinstance(spec, dict) and len(spec) == 1:
+        (name, opts), = spec.items()
+        tokens = [name]
+        for key, val in (opts or {}).items():
+            if key == 'file':
+                tokens.append(str(val))
+                continue
+            flag = '--' + key.replace('_', '-')
+            if val is True:
+                tokens.append(flag)
+            elif isinstance(val, list):
+                for v in val:
+                    tokens += [flag, str(v)]
+            elif val is not None and val is not False:
+                tokens += [flag, str(val)]
+    else:
+        tokens = []
+    if not tokens or tokens[0] not in STAGE_BUILDERS:
+        print(f"Error: invalid stage {spec!r} (stages: {', '.join(PIPE_STAGES)})", file=sys.stderr)
+        sys.exit(1)
+    args = parser.parse_args([tokens[0], '-'] + tokens[1:])
+    if getattr(args, 'output', None):
+        print(f"Error: stage '{tokens[0]}' cannot set --output; pass it to pipe", file=sys.stderr)
+        sys.exit(1)
+    return STAGE_BUILDERS[tokens[0]](args)
+
+
+def load_pipe_spec(path):
+    """Read a JSON or YAML pipeline spec: {"input", "output", "stages": [...]} or a bare stage list."""
+    with open(path, encoding='utf-8') as f:
+        if _ext(path) in ('yaml', 'yml'):
+            try:
+                import yaml
+            except ImportError:
+                print("Error: PyYAML not installed.", file=sys.stderr)
+                print("Install with: pip install pyyaml (or use a JSON spec)", file=sys.stderr)
+                sys.exit(1)
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    return {'stages': spec} if isinstance(spec, list) else spec or {}
+
+
+def cmd_pipe(args):
+    """Run a chain of stages as one streaming pass: one read, one write."""
+    spec = load_pipe_spec(args.spec) if args.spec else {}
+    path = args.file or spec.get('input')
+    output = args.output or spec.get('output')
+    raw = list(spec.get('stages') or []) + list(args.stage or [])
+    if not path or not raw:
+        print("Error: pipe needs an input file and at least one --stage (or a --spec)", file=sys.stderr)
+        sys.exit(1)
+
+    parser = build_parser()
+    stages = [parse_stage(parser, s) for s in raw]
+    stats = {}
+    count = emit_rows(run_pipeline(path, stages, stats), output, pretty=args.pretty or bool(spec.get('pretty')))
+
+    columns = 'all columns' if stats['columns'] is None else f"columns: {', '.join(stats['columns'])}"
+    print(f"Pipeline {' -> '.join(s.name for s in stages)}: read {stats.get('rows', 0)} rows ({columns}), "
+          f"wrote {count}", file=sys.stderr)
+
+
+def cmd_cache(args):
+    """Build, drop or describe the sidecar columnar cache of a data file."""
+    cache_path = ColumnCache.path_for(args.file)
+
+    if args.action == 'build':
+        header = ColumnCache.build(args.file)
+        skipped = [c['name'] for c in header['columns'] if not c['cached']]
+        note = f"; left out high-cardinality {', '.join(skipped)}" if skipped else ''
+        print(f"Cached {header['rows']} rows x {len(header['columns']) - len(skipped)} columns to {cache_path} "
+              f"({os.path.getsize(cache_path)} bytes{note})")
+        return
+
+    if args.action == 'drop':
+        try:
+            os.remove(cache_path)
+            print(f"Removed {cache_path}")
+        except FileNotFoundError:
+            print(f"No cache at {cache_path}")
+        return
+
+    cache = ColumnCache.open(args.file, check=False)
+    if cache is None:
+        print(json.dumps({'cache': cache_path, 'exists': os.path.exists(cache_path), 'valid': False},
+                         **json_style(args.pretty)))
+        return
+    with cache:
+        header = cache.header
+        valid = ColumnCache.open(args.file) is not None
+        print(json.dumps({
+            'cache': cache_path,
+            'exists': True,
+            'valid': valid,
+            'bytes': os.path.getsize(cache_path),
+            'source_bytes': header['size'],
+            'rows': header['rows'],
+            'columns': [
+                {'name': c['name'], 'cached': c.get('cached', True), 'numeric': c['numeric'], 'unique': c['unique'],
+                 'non_empty': c['non_empty']}
+                for c in header['columns']
+            ],
+        }, **json_style(args.pretty)))
+
+
+def cmd_index(args):
+    """Build, drop or describe the key index of one column of a data file."""
+    index_path = KeyIndex.path_for(args.file, args.column)
+
+    if args.action == 'build':
+        header = KeyIndex.build(args.file, args.column)
+        print(f"Indexed {header['rows']} rows by '{args.column}' to {index_path} "
+              f"({os.path.getsize(index_path)} bytes)")
+        return
+
+    if args.action == 'drop':
+        try:
+            os.remove(index_path)
+            print(f"Removed {index_path}")
+        except FileNotFoundError:
+            print(f"No index at {index_path}")
+        return
+
+    index = KeyIndex.open(args.file, args.column, check=False)
+    if index is None:
+        print(json.dumps({'index': index_path, 'exists': os.path.exists(index_path), 'valid': False},
+                         **json_style(args.pretty)))
+        return
+    with index:
+        print(json.dumps({
+            'index': index_path,
+            'exists': True,
+            'valid': KeyIndex.open(args.file, args.column) is not None,
+            'bytes': os.path.getsize(index_path),
+            'column': args.column,
+            'rows': index.header['rows'],
+        }, **json_style(args.pretty)))
+
+
+def cmd_lookup(args):
+    """Rows whose --column equals one of the --value keys, read through the column's index."""
+    keys = args.value
+    index = KeyIndex.open(args.file, args.column)
+    if index is not None:
+        with index:
+            records = lookup_records(args.file, index, keys)
+            if index.header['format'] == 'csv':
+                count = emit_tuples(index.header['fields'], records, args.output, args.pretty)
+            else:
+                count = emit_rows(records, args.output, pretty=args.pretty)
+        print(f"Lookup: {count} rows for {len(set(keys))} keys (index)", file=sys.stderr)
+        return
+
+    print(f"Note: no up-to-date index on '{args.column}', scanning the whole file "
+          f"(build one with: index build {args.file} --column {args.column})", file=sys.stderr)
+    wanted = set(keys)
+    predicate = lambda r: r[0].strip() in wanted
+    if _is_delimited(args.file):
+        matches = iter_matching(args.file, [args.column], predicate, raw=True)
+        count = emit_tuples(csv_header(args.file), matches, args.output, args.pretty)
     else:
-        writer = csv.DictWriter(sys.stdout, fieldnames=data[0].keys() if data else [])
-        writer.writeheader()
-        writer.writerows(cleaned)
+        count = emit_rows(iter_matching(args.file, [args.column], predicate), args.output, pretty=args.pretty)
+    print(f"Lookup: {count} rows for {len(wanted)} keys (full scan)", file=sys.stderr)
 
 
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
-def main():
+def _add_output_args(p):
+    p.add_argument('--output', help="Output file path, format from its extension ('-': stdout)")
+    p.add_argument('--pretty', action='store_true', help='Indent JSON output (default: compact)')
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description='CSV/JSON Data Processing Tool')
     sub = parser.add_subparsers(dest='command', required=True)
 
     # inspect
     p = sub.add_parser('inspect', help='Inspect a data file')
     p.add_argument('file', help='Input file path')
+    p.add_argument('--json', action='store_true',
+                   help='Profile every column (type, nulls, min/max, distinct, top values) as JSON')
+    p.add_argument('--sample', type=int, metavar='N',
+                   help='Profile a uniform sample of N rows (implies --json); every row is still read once '
+                        'to draw it and count rows, only the profiling is cut')
+    p.add_argument('--top', type=int, default=5, metavar='K', help='Top values per column in the profile')
+    p.add_argument('--pretty', action='store_true', help='Indent the JSON profile (default: compact)')
+    p.add_argument('--workers', type=int, default=1, help='Parse CSV/JSONL chunks in N processes')
 
     # filter
     p = sub.add_parser('filter', help='Filter rows by condition')
     p.add_argument('file', help='Input file path')
-    p.add_argument('--column', required=True, help='Column to filter on')
-    p.add_argument('--op', required=True, choices=['eq','neq','gt','gte','lt','lte','contains','startswith','endswith'])
-    p.add_argument('--value', required=True, help='Value to compare against')
-    p.add_argument('--output', help='Output file path')
+    p.add_argument('--where', help="Expression, e.g. \"price > 10 and region in ('EU','US') and name ~ 'foo'\"")
+    p.add_argument('--column', help='Column to filter on')
+    p.add_argument('--op', choices=['eq','neq','gt','gte','lt','lte','contains','startswith','endswith'])
+    p.add_argument('--value', help='Value to compare against')
+    _add_output_args(p)
+    p.add_argument('--workers', type=int, default=1, help='Parse CSV/JSONL chunks in N processes')
+
+    # select
+    p = sub.add_parser('select', help='Keep only some columns')
+    p.add_argument('file', help='Input file path')
+    p.add_argument('--columns', required=True, help='Comma-separated columns to keep, in output order')
+    _add_output_args(p)
 
     # sort
     p = sub.add_parser('sort', help='Sort rows')
     p.add_argument('file', help='Input file path')
-    p.add_argument('--column', required=True, help='Column to sort by')
-    p.add_argument('--order', default='asc', choices=['asc','desc'])
-    p.add_argument('--numeric', action='store_true', help='Numeric sort')
-    p.add_argument('--output', help='Output file path')
+    p.add_argument('--column', required=True, help='Column(s) to sort by, comma-separated')
+    p.add_argument('--order', default='asc', help='asc/desc, comma-separated per column')
+    p.add_argument('--numeric', action='store_true', help='Numeric sort on every sort column')
+    p.add_argument('--numeric-columns', help='Numeric sort on only these sort columns, comma-separated')
+    p.add_argument('--memory-limit', default=_DEFAULT_MEMORY_LIMIT,
+                   help='Memory budget before spilling sorted runs to disk (e.g. 512M, 2G)')
+    _add_output_args(p)
+
+    # top
+    p = sub.add_parser('top', help='Top N rows by a numeric column, without a full sort')
+    p.add_argument('file', help='Input file path')
+    p.add_argument('--column', required=True, help='Numeric column to rank by')
+    p.add_argument('--n', type=int, default=10, help='Rows to keep (per group with --by-group)')
+    p.add_argument('--by-group', help='Column(s) to rank within, comma-separated')
+    p.add_argument('--order', default='desc', choices=['desc', 'asc'], help='desc: largest values, asc: smallest')
+    _add_output_args(p)
+
+    # window
+    p = sub.add_parser('window', help='Row numbers, ranks, lag/lead and running aggregates per partition')
+    p.add_argument('file', help='Input file path (sorted by --partition-by)')
+    p.add_argument('--partition-by', help='Column(s) the input is sorted by, comma-separated (default: one partition)')
+    p.add_argument('--func', action='append', metavar='[COL:]FUNC[:N]',
+                   help="Window function (repeatable): row_number, col:rank, col:lag[:n], col:lead[:n], "
+                        "col:cumsum, col:rolling_mean:k")
+    _add_output_args(p)
 
     # dedup
     p = sub.add_parser('dedup', help='Remove duplicates')
     p.add_argument('file', help='Input file path')
     p.add_argument('--columns', help='Comma-separated columns to deduplicate by (default: all)')
-    p.add_argument('--output', help='Output file path')
+    p.add_argument('--keep', default='first', choices=['first', 'last'], help='Occurrence to keep')
+    p.add_argument('--memory-limit', default=_DEFAULT_MEMORY_LIMIT,
+                   help='Budget for distinct keys before partitioning to disk (e.g. 512M)')
+    p.add_argument('--approximate', action='store_true',
+                   help='One-pass Bloom-filter dedup (may drop a few unique rows)')
+    p.add_argument('--fp-rate', type=float, default=0.001, help='Bloom filter false-positive rate')
+    _add_output_args(p)
+    p.add_argument('--workers', type=int, default=1, help='Parse CSV/JSONL chunks in N processes')
 
     # aggregate
     p = sub.add_parser('aggregate', help='Group and aggregate')
     p.add_argument('file', help='Input file path')
-    p.add_argument('--group-by', required=True, help='Column to group by')
-    p.add_argument('--agg-column', required=True, help='Column to aggregate')
-    p.add_argument('--func', default='sum', choices=['sum','avg','count','min','max'])
-    p.add_argument('--output', help='Output file path')
+    p.add_argument('--group-by', required=True, help='Column(s) to group by, comma-separated')
+    p.add_argument('--agg', action='append', metavar='COL:FUNC',
+                   help=f"Aggregate to compute (repeatable); funcs: {', '.join(AGG_FUNCS)}, pNN")
+    p.add_argument('--agg-column', help='Column to aggregate (single-aggregate shorthand)')
+    p.add_argument('--func', default='sum', choices=AGG_FUNCS)
+    p.add_argument('--state', metavar='FILE',
+                   help='Keep group state in FILE and on later runs only read rows appended since')
+    _add_output_args(p)
+    p.add_argument('--workers', type=int, default=1, help='Parse CSV/JSONL chunks in N processes')
 
     # join
     p = sub.add_parser('join', help='Join two datasets')
     p.add_argument('left_file', help='Left file path')
     p.add_argument('right_file', help='Right file path')
-    p.add_argument('--on', required=True, help='Key column for join')
-    p.add_argument('--how', default='inner', choices=['inner','left'])
-    p.add_argument('--output', help='Output file path')
+    p.add_argument('--on', required=True, help='Key column(s) for join, comma-separated')
+    p.add_argument('--how', default='inner', choices=JOIN_TYPES)
+    p.add_argument('--build', default='auto', choices=['auto', 'left', 'right'],
+                   help='Side to hash in memory (default: the smaller file)')
+    p.add_argument('--memory-limit', default=_DEFAULT_MEMORY_LIMIT,
+                   help='Build-side budget before falling back to a partitioned join (e.g. 512M)')
+    _add_output_args(p)
 
     # convert
     p = sub.add_parser('convert', help='Convert between formats')
     p.add_argument('file', help='Input file path')
-    p.add_argument('--to', required=True, choices=['csv','json','jsonl','tsv'])
-    p.add_argument('--output', help='Output file path')
+    p.add_argument('--to', required=True, choices=['csv','json','jsonl','tsv','parquet','arrow','feather'],
+                   help='Target format (parquet/arrow/feather need pyarrow)')
+    _add_output_args(p)
 
     # report
     p = sub.add_parser('report', help='Generate summary report')
     p.add_argument('file', help='Input file path')
     p.add_argument('--group-by', required=True, help='Column to group by')
     p.add_argument('--value-column', required=True, help='Numeric column to summarize')
+    p.add_argument('--percentiles', metavar='P,P,...',
+                   help='Also report these percentiles per group, e.g. 50,90,99 (streaming t-digest)')
     p.add_argument('--output', help='Output file path (Markdown)')
+    p.add_argument('--workers', type=int, default=1, help='Parse CSV/JSONL chunks in N processes')
 
     # clean
     p = sub.add_parser('clean', help='Clean data quality issues')
     p.add_argument('file', help='Input file path')
-    p.add_argument('--output', help='Output file path')
+    _add_output_args(p)
+
+    # cache
+    p = sub.add_parser('cache', help='Manage the sidecar columnar cache')
+    p.add_argument('action', choices=['build', 'drop', 'stats'])
+    p.add_argument('file', help='Input file path')
+    p.add_argument('--pretty', action='store_true', help='Indent the stats JSON (default: compact)')
+
+    # index
+    p = sub.add_parser('index', help='Manage the key index used by lookup')
+    p.add_argument('action', choices=['build', 'drop', 'stats'])
+    p.add_argument('file', help='Input file path (CSV, TSV or JSON Lines)')
+    p.add_argument('--column', required=True, help='Key column to index')
+    p.add_argument('--pretty', action='store_true', help='Indent the stats JSON (default: compact)')
+
+    # lookup
+    p = sub.add_parser('lookup', help='Fetch the rows with given keys through an index')
+    p.add_argument('file', help='Input file path')
+    p.add_argument('--column', required=True, help='Key column (indexed with "index build")')
+    p.add_argument('--value', required=True, action='append', help='Key to look up (repeatable)')
+    _add_output_args(p)
 
-    args = parser.parse_args()
+    # pipe
+    p = sub.add_parser('pipe', help='Chain stages in one streaming pass')
+    p.add_argument('file', nargs='?', help='Input file path (or "input" in --spec)')
+    p.add_argument('--stage', action='append', metavar='"CMD [OPTIONS]"',
+                   help=f"Stage to run, in order (repeatable): {', '.join(PIPE_STAGES)}")
+    p.add_argument('--spec', help='JSON/YAML file with input, output and stages')
+    _add_output_args(p)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
 
     commands = {
         'inspect': cmd_inspect,
         'filter': cmd_filter,
+        'select': cmd_select,
         'sort': cmd_sort,
+        'top': cmd_top,
+        'window': cmd_window,
         'dedup': cmd_dedup,
         'aggregate': cmd_aggregate,
         'join': cmd_join,
         'convert': cmd_convert,
         'report': cmd_report,
         'clean': cmd_clean,
+        'cache': cmd_cache,
+        'index': cmd_index,
+        'lookup': cmd_lookup,
+        'pipe': cmd_pipe,
     }
 
     commands[args.command](args)
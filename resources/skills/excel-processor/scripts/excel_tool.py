@@ -1,24 +1,51 @@
 #!/usr/bin/env python3
 """
 Read, write, format, and analyze Excel files (.xlsx).
-Dependencies: openpyxl
+Dependencies: openpyxl (lxml, when installed, speeds up streaming reads)
 """
 
 import argparse
+import collections
 import csv
+import datetime
+import functools
+import hashlib
+import itertools
 import json
+import math
+import multiprocessing
 import os
+import posixpath
+import re
+import shutil
 import sys
+import tempfile
+import zipfile
+from xml.etree import ElementTree
 
 try:
     import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
     from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_datetime, is_timedelta_format
+    from openpyxl.utils import get_column_letter, column_index_from_string
+    from openpyxl.utils.datetime import (CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900,
+                                         from_excel, from_ISO8601, to_excel)
+    from openpyxl.worksheet.cell_range import CellRange
+    from openpyxl.xml.functions import tostring as xml_tostring
 except ImportError:
     print("Missing dependency: openpyxl", file=sys.stderr)
     print("Install with: pip install openpyxl", file=sys.stderr)
     sys.exit(1)
 
+try:
+    from lxml.etree import iterparse
+    _LXML = True
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+    _LXML = False
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -53,135 +80,1322 @@ def apply_header_style(ws):
         cell.border = thin_border
 
 
-def load_csv_data(path):
-    """Load CSV file into list of lists (header + rows)."""
+def iter_csv_data(path):
+    """Yield CSV rows (header first) without loading the file."""
     with open(path, newline='', encoding='utf-8-sig') as f:
-        return list(csv.reader(f))
+        yield from csv.reader(f)
 
 
-def load_json_data(path):
-    """Load JSON file into header + rows."""
+def iter_json_records(path):
+    """Yield the objects of a JSON array, or of JSON Lines (.jsonl/.ndjson) streamed."""
     with open(path, encoding='utf-8') as f:
-        data = json.load(f)
-    if not isinstance(data, list) or not data:
-        return []
-    headers = list(data[0].keys())
-    rows = [headers]
-    for item in data:
-        rows.append([str(item.get(h, '')) for h in headers])
-    return rows
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        items = json.load(f)
+        if isinstance(items, list):
+            yield from items
+
+
+def iter_json_data(path, convert=str):
+    """Yield header + rows (values passed through ``convert``) from JSON records.
+
+    The header is the keys of the first record.
+    """
+    items = iter_json_records(path)
+    first = next(items, None)
+    if first is None:
+        return
+    headers = list(first.keys())
+    yield headers
+    for item in itertools.chain((first,), items):
+        yield [convert(item.get(h, '')) for h in headers]
+
+
+def iter_input_data(args):
+    """Rows from --from-csv / --from-json, or nothing."""
+    if args.from_csv:
+        return iter_csv_data(args.from_csv)
+    if args.from_json:
+        return iter_json_data(args.from_json)
+    return iter(())
+
+
+def measure_widths(rows, widths):
+    """Pass rows through, growing ``widths`` to the longest value seen per column."""
+    for row in rows:
+        lens = [len(v) if isinstance(v, str) else len(str(v)) if v is not None else 0 for v in row]
+        if len(lens) > len(widths):
+            widths.extend([0] * (len(lens) - len(widths)))
+        widths[:len(lens)] = map(max, widths, lens)
+        yield row
+
+
+def set_widths(ws, widths):
+    """Apply measured widths with the same padding and cap as auto_width."""
+    for i, w in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = min(w + 3, 50)
+
+
+def _xml_text(value):
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\r', '&#13;')
+
+
+def _inline_string(value):
+    if value != value.strip():
+        return f' t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+    return f' t="inlineStr"><is><t>{_xml_text(value)}</t></is></c>'
+
+
+def _checked_string(value):
+    value = value[:32767]
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise ValueError("contains control characters that cannot be stored in Excel")
+    return value
+
+
+@functools.lru_cache(maxsize=1 << 12)
+def text_cell_xml(value):
+    """A string cell stored the way openpyxl stores it, as the XML after ``<c r="A1"``.
+
+    Inline string, "=..." as a formula, error codes as errors.
+    """
+    value = _checked_string(value)
+    if not value:
+        return ' t="inlineStr"/>'
+    if value[0] == '=' and len(value) > 1:
+        return f'><f>{_xml_text(value[1:])}</f><v/></c>'
+    if value in ERROR_CODES:
+        return f' t="e"><v>{value}</v></c>'
+    return _inline_string(value)
+
+
+def text_cell_value(value):
+    """What ``text_cell_xml`` stores, as a value for ``ws.append``."""
+    return _checked_string(value) if isinstance(value, str) else value
+
+
+_NUMBER_TEXT = re.compile(r'-?(?:0|[1-9][0-9]{0,14})(?:\.[0-9]+)?(?:[eE][-+]?[0-9]{1,3})?')
+_DATE_TEXT = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}(?:[T ][0-9]{2}:[0-9]{2}(?::[0-9]{2}(?:\.[0-9]{1,6})?)?)?')
+_BOOL_TEXT = {'true': 1, 'false': 0}
+
+
+def typed_cell_xml(ws, numbers_from_text=True):
+    """Cell encoder for ``import``: numbers, booleans and ISO dates become typed cells.
+
+    Text that looks like a number is converted only when Excel keeps it
+    exactly (no leading zeros or '+', at most 15 integer digits), so codes
+    such as zip or account numbers stay text. Text starting with '=' is
+    kept as text, never turned into a formula.
+    """
+    styles = {}
+
+    def date_style(number_format):
+        if number_format not in styles:
+            cell = WriteOnlyCell(ws)
+            cell.number_format = number_format
+            styles[number_format] = cell.style_id
+        return styles[number_format]
+
+    @functools.lru_cache(maxsize=1 << 12, typed=True)
+    def cell(value):
+        if value is None:
+            return None
+        kind = type(value)
+        if kind is bool:
+            return f' t="b"><v>{int(value)}</v></c>'
+        if kind is int and abs(value) < 10 ** 15 or kind is float and math.isfinite(value):
+            return f'><v>{value!r}</v></c>'
+        if kind is not str:
+            return _inline_string(_checked_string(str(value)))
+        value = _checked_string(value)
+        if not value:
+            return None
+        if numbers_from_text:
+            if _NUMBER_TEXT.fullmatch(value):
+                return f'><v>{value}</v></c>'
+            if value.lower() in _BOOL_TEXT:
+                return f' t="b"><v>{_BOOL_TEXT[value.lower()]}</v></c>'
+        if _DATE_TEXT.fullmatch(value):
+            try:
+                when = datetime.datetime.fromisoformat(value)
+            except ValueError:
+                pass
+            else:
+                fmt = 'yyyy-mm-dd' if len(value) == 10 else 'yyyy-mm-dd h:mm:ss'
+                return f' s="{date_style(fmt)}"><v>{to_excel(when)!r}</v></c>'
+        if value in ERROR_CODES:
+            return f' t="e"><v>{value}</v></c>'
+        return _inline_string(value)
+
+    return cell
+
+
+def typed_cell_value(ws, numbers_from_text=True):
+    """What ``typed_cell_xml`` stores, as values for ``ws.append``."""
+    def cell(value):
+        if value is None:
+            return None
+        kind = type(value)
+        if kind is bool or kind is int and abs(value) < 10 ** 15 or kind is float and math.isfinite(value):
+            return value
+        value = _checked_string(value if kind is str else str(value))
+        if not value:
+            return None
+        if kind is str:
+            if numbers_from_text and _NUMBER_TEXT.fullmatch(value):
+                return _cast_number(value)
+            if numbers_from_text and value.lower() in _BOOL_TEXT:
+                return bool(_BOOL_TEXT[value.lower()])
+            if _DATE_TEXT.fullmatch(value):
+                try:
+                    when = datetime.datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+                else:
+                    date_cell = WriteOnlyCell(ws, when)
+                    date_cell.number_format = 'yyyy-mm-dd' if len(value) == 10 else 'yyyy-mm-dd h:mm:ss'
+                    return date_cell
+            if value in ERROR_CODES:
+                return value
+        # Plain text, even when it starts with '='
+        text_cell = WriteOnlyCell(ws, value)
+        text_cell.data_type = 's'
+        return text_cell
+
+    return cell
+
+
+def write_sheet_rows(out, rows, row_number, widths, cell_xml=text_cell_xml):
+    """Serialize rows to worksheet <row> XML, numbered from ``row_number``.
+
+    ``cell_xml(value)`` gives the cell XML after ``<c r="A1"`` (None to
+    leave the cell out); it is cached, so repeated values cost one lookup.
+    ``widths`` grows to the longest value per column along the way.
+    Returns (last row number, widest row); ValueError on characters Excel
+    cannot store.
+    """
+    letters = []
+    max_col = 0
+    for row in rows:
+        if len(row) > len(letters):
+            letters += [get_column_letter(i) for i in range(len(letters) + 1, len(row) + 1)]
+            max_col = len(row)
+            if max_col > len(widths):
+                widths.extend([0] * (max_col - len(widths)))
+        r = str(row_number)
+        parts = [f'<row r="{r}">']
+        for i, v in enumerate(row):
+            size = len(v) if isinstance(v, str) else len(str(v)) if v is not None else 0
+            if size > widths[i]:
+                widths[i] = size
+            try:
+                xml = cell_xml(v)
+            except ValueError as e:
+                raise ValueError(f"row {row_number}, column {letters[i]} {e}") from None
+            if xml is not None:
+                parts.append(f'<c r="{letters[i]}{r}"{xml}')
+        parts.append('</row>')
+        out.write(''.join(parts).encode('utf-8'))
+        row_number += 1
+    return row_number - 1, max_col
+
+
+def _sheet_layout(sheet):
+    """``(top, body, tail)`` around ``<sheetData`` of a closed write-only sheet file.
+
+    None unless the file is laid out as ``finish_sheet`` expects: one
+    sheetData after the sheetViews, with no <dimension> or <cols> yet.
+    """
+    top, found, rest = sheet.partition(b'<sheetData')
+    body, closed, tail = rest.partition(b'</sheetData>')
+    if (not found or not closed or b'<sheetData' in rest or b'<sheetViews' not in top
+            or b'<dimension' in top or b'<cols' in top):
+        return None
+    return top, body, tail
+
+
+@functools.lru_cache(maxsize=None)
+def splice_supported():
+    """Whether this openpyxl's write-only sheets can take spliced rows.
+
+    ``finish_sheet`` relies on openpyxl internals: the sheet's temp file
+    at ``ws._writer.out`` and its layout. Both are probed once on a
+    throwaway sheet.
+    """
+    try:
+        ws = openpyxl.Workbook(write_only=True).create_sheet()
+        ws.append(['probe'])
+        ws.close()
+        path = ws._writer.out
+        with open(path, 'rb') as f:
+            sheet = f.read()
+        os.remove(path)
+    except (AttributeError, TypeError, OSError):
+        return False
+    return _sheet_layout(sheet) is not None
+
+
+def finish_sheet(ws, data, widths, last_row, max_col):
+    """Close a write-only sheet and splice in the bulk rows from ``data``.
+
+    openpyxl writes <dimension> and <cols> ahead of the rows, before either
+    is known, so the finished sheet file is reassembled around the row data.
+    """
+    ws.close()
+    path = ws._writer.out
+    with open(path, 'rb') as f:
+        sheet = f.read()  # only the rows written through openpyxl
+    layout = _sheet_layout(sheet)
+    if layout is None:
+        print(f"Error: unexpected write-only sheet layout from openpyxl {openpyxl.__version__}", file=sys.stderr)
+        sys.exit(1)
+    top, body, tail = layout
+    if max_col:
+        dimension = f'<dimension ref="A1:{get_column_letter(max_col)}{last_row}"/>'.encode()
+        before, views, after = top.partition(b'<sheetViews')
+        top = before + dimension + views + after
+    if widths:
+        set_widths(ws, widths)
+        top += xml_tostring(ws.column_dimensions.to_tree())
+    with open(path, 'wb') as out:
+        out.write(top)
+        out.write(b'<sheetData')
+        out.write(body)
+        data.seek(0)
+        shutil.copyfileobj(data, out, 1 << 20)
+        out.write(b'</sheetData>')
+        out.write(tail)
+
+
+def write_bulk_rows(ws, rows, first_row, widths, auto_width, min_col, cell_xml=text_cell_xml,
+                    cell_value=text_cell_value):
+    """Stream ``rows`` into write-only ``ws`` from ``first_row`` on and finish the sheet.
+
+    When ``splice_supported`` says no, the rows go through ``ws.append``
+    as ``cell_value`` converts them instead (slower, and without widths).
+    Returns the last row number written.
+    """
+    if not splice_supported():
+        print(f"Warning: openpyxl {openpyxl.__version__} lays out write-only sheets differently; "
+              f"writing rows with ws.append (slower{', --auto-width not applied' if auto_width else ''})",
+              file=sys.stderr)
+        return append_bulk_rows(ws, rows, first_row, cell_value)
+    with tempfile.TemporaryFile() as data:
+        try:
+            last_row, max_col = write_sheet_rows(data, rows, first_row, widths, cell_xml)
+        except ValueError as e:
+            ws.close()
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finish_sheet(ws, data, widths if auto_width else None, last_row, max(max_col, min_col))
+    return last_row
+
+
+def append_bulk_rows(ws, rows, first_row, cell_value=text_cell_value):
+    """``write_bulk_rows`` through the public ``ws.append``; returns the last row number."""
+    row_number = first_row - 1
+    for row_number, row in enumerate(rows, first_row):
+        try:
+            values = [cell_value(v) for v in row]
+        except ValueError as e:
+            print(f"Error: row {row_number}: {e}", file=sys.stderr)
+            sys.exit(1)
+        ws.append(values)
+    return row_number
+
+
+def parse_row_range(text):
+    """``'a:b'`` -> ``(a, b)`` data-row bounds (1 = first row below the header); None for open ends."""
+    if not text:
+        return None, None
+    first, sep, last = text.partition(':')
+    try:
+        first = int(first) if first.strip() else None
+        last = (int(last) if last.strip() else None) if sep else first
+    except ValueError:
+        first = last = 0
+    if (first is not None and first < 1) or (last is not None and last < (first or 1)):
+        print(f"Error: invalid --rows '{text}' (use e.g. 1:100, 500: or :1000)", file=sys.stderr)
+        sys.exit(1)
+    return first, last
+
+
+def select_columns(header, text):
+    """0-based indices for ``--columns``: header names, column letters or letter ranges (B:D)."""
+    names = [str(h) if h is not None else '' for h in header]
+    indices = []
+    for token in (t.strip() for t in text.split(',')):
+        if not token:
+            continue
+        if token in names:
+            indices.append(names.index(token))
+            continue
+        lo, _, hi = token.partition(':')
+        try:
+            lo = column_index_from_string(lo.upper())
+            hi = column_index_from_string(hi.upper()) if hi else lo
+        except ValueError:
+            print(f"Error: Column '{token}' not found. Available: {names}", file=sys.stderr)
+            sys.exit(1)
+        indices.extend(range(lo - 1, hi))
+    return indices
 
 
 # ---------------------------------------------------------------------------
-# Commands
+# Streaming reader
 # ---------------------------------------------------------------------------
 
-def cmd_read(args):
-    """Read and display an Excel file."""
-    if not os.path.isfile(args.file):
-        print(f"Error: File not found: {args.file}", file=sys.stderr)
-        sys.exit(1)
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_DOC_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_ROW, _C, _V, _IS, _T, _R, _RPH, _SI, _DIMENSION, _SHEET_DATA = (
+    f'{{{NS_MAIN}}}{tag}' for tag in ('row', 'c', 'v', 'is', 't', 'r', 'rPh', 'si', 'dimension', 'sheetData'))
 
-    wb = openpyxl.load_workbook(args.file, data_only=True)
-    sheet_name = args.sheet or wb.active.title
-    if sheet_name not in wb.sheetnames:
-        print(f"Error: Sheet '{sheet_name}' not found. Available: {wb.sheetnames}", file=sys.stderr)
-        sys.exit(1)
 
-    ws = wb[sheet_name]
-    rows = []
-    for row in ws.iter_rows(values_only=True):
-        rows.append([str(c) if c is not None else '' for c in row])
+def _iter_sheet_xml(f):
+    """Yield the ``<dimension>`` and each finished ``<row>`` element of a sheet part.
 
-    if not rows:
-        print("(Empty sheet)")
+    Rows are freed once the caller moves on, so memory stays at one row.
+    """
+    if _LXML:
+        for _, el in iterparse(f, events=('end',), tag=(_DIMENSION, _ROW)):
+            yield el
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
         return
+    sheet_data = None
+    for event, el in iterparse(f, events=('start', 'end')):
+        if event == 'start':
+            if el.tag == _SHEET_DATA:
+                sheet_data = el
+        elif el.tag == _ROW or el.tag == _DIMENSION:
+            yield el
+            if el.tag == _ROW and sheet_data is not None:
+                sheet_data.remove(el)
+
+
+def _string_content(node):
+    """Text of an ``<si>``/``<is>`` node: its ``<t>``, or its rich-text runs joined."""
+    parts = []
+    for child in node:
+        if child.tag == _T:
+            parts.append(child.text or '')
+        elif child.tag == _R:
+            parts.extend(t.text or '' for t in child.iter(_T))
+    return ''.join(parts)
+
+
+def _cast_number(text):
+    """'12' -> 12, '1.5'/'1E3' -> float, as openpyxl reads numeric cells."""
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+class XlsxReader:
+    """Row-by-row reader over the worksheet XML of an .xlsx package.
+
+    Unlike ``openpyxl.load_workbook`` no cell objects are built: each
+    ``<row>`` is parsed with iterparse (lxml when installed), converted
+    and dropped. Values match ``iter_rows(values_only=True)`` of a workbook
+    loaded with ``data_only=True``: strings, ints, floats, bools and
+    datetimes for cells with a date number format. With ``day_dates`` a
+    cell whose format has a date but no time part comes out as a ``date``.
+    """
+
+    def __init__(self, path, day_dates=False):
+        try:
+            self.zip = zipfile.ZipFile(path)
+            workbook = ElementTree.fromstring(self.zip.read('xl/workbook.xml'))
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            print(f"Error: {path} is not a valid .xlsx file ({e})", file=sys.stderr)
+            sys.exit(1)
+        rels = self._rels('xl/_rels/workbook.xml.rels')
+        self.sheets = {}
+        for sheet in workbook.iter(f'{{{NS_MAIN}}}sheet'):
+            target = rels.get(sheet.get(f'{{{NS_DOC_REL}}}id'), (None, None))[1]
+            self.sheets[sheet.get('name')] = target
+        self.sheetnames = list(self.sheets)
+        view = workbook.find(f'{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView')
+        index = int(view.get('activeTab', 0)) if view is not None else 0
+        self.active = self.sheetnames[index] if 0 <= index < len(self.sheetnames) else None
+        props = workbook.find(f'{{{NS_MAIN}}}workbookPr')
+        date1904 = props is not None and props.get('date1904') in ('1', 'true')
+        self.epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+        self._parts = {kind: target for kind, target in rels.values()}
+        self._strings = None
+        self._date_styles = None
+        self._day_dates = day_dates
+        self._columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.zip.close()
+
+    def _rels(self, path):
+        """``{Id: (type suffix, part path)}`` of a relationships part."""
+        try:
+            root = ElementTree.fromstring(self.zip.read(path))
+        except KeyError:
+            return {}
+        base = path.split('_rels/')[0]
+        rels = {}
+        for rel in root.iter(f'{{{NS_PKG_REL}}}Relationship'):
+            target = rel.get('Target', '')
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(base + target)
+            rels[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+        return rels
+
+    @property
+    def shared_strings(self):
+        if self._strings is None:
+            self._strings = []
+            path = self._parts.get('sharedStrings', 'xl/sharedStrings.xml')
+            if path in self.zip.NameToInfo:
+                with self.zip.open(path) as f:
+                    for _, node in iterparse(f):
+                        if node.tag == _SI:
+                            self._strings.append(_string_content(node).replace('x005F_', ''))
+                            node.clear()
+        return self._strings
+
+    @property
+    def date_styles(self):
+        """``(date, timedelta, date-only style ids)`` from the cell formats in styles.xml.
+
+        Date-only ids are only collected for a reader opened with ``day_dates``.
+        """
+        if self._date_styles is None:
+            dates, deltas, days = set(), set(), set()
+            path = self._parts.get('styles', 'xl/styles.xml')
+            if path in self.zip.NameToInfo:
+                root = ElementTree.fromstring(self.zip.read(path))
+                custom = {int(fmt.get('numFmtId')): fmt.get('formatCode')
+                          for fmt in root.iter(f'{{{NS_MAIN}}}numFmt')}
+                xfs = root.find(f'{{{NS_MAIN}}}cellXfs')
+                for idx, xf in enumerate(xfs if xfs is not None else []):
+                    fmt_id = int(xf.get('numFmtId', 0))
+                    fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+                    if is_date_format(fmt):
+                        dates.add(idx)
+                    if is_timedelta_format(fmt):
+                        deltas.add(idx)
+                    elif self._day_dates and is_datetime(fmt) == 'date':
+                        days.add(idx)
+            self._date_styles = (dates, deltas, days)
+        return self._date_styles
+
+    def _column(self, ref):
+        """1-based column index of a cell reference such as 'AB12'."""
+        letters = ref.rstrip('0123456789')
+        col = self._columns.get(letters)
+        if col is None:
+            col = self._columns[letters] = column_index_from_string(letters)
+        return col
+
+    def _row_values(self, row, width, max_col):
+        """Values of a ``<row>`` element padded to ``width``; None when it has no cells.
+
+        The row's descendants are walked once in document order (cheaper
+        than looking up each cell's children): a ``<c>`` opens a cell, its
+        ``<v>`` or inline ``<t>`` pieces follow before the next one.
+        """
+        values = [None] * width
+        columns = self._columns
+        col = 0
+        kind = style = text = parts = None
+        phonetic = found = False
+        for el in row.iter():
+            tag = el.tag
+            if tag == _C:
+                if kind is not None:
+                    if col > len(values):
+                        values.extend([None] * (col - len(values)))
+                    values[col - 1] = self._cell_value(kind, style, text, parts)
+                ref = el.get('r')
+                if ref:
+                    col = columns.get(ref.rstrip('0123456789')) or self._column(ref)
+                else:
+                    col += 1
+                if max_col and col > max_col:
+                    kind = None
+                    break
+                kind = el.get('t', 'n')
+                style = el.get('s')
+                text = parts = None
+                phonetic = False
+                found = True
+            elif tag == _V:
+                text = el.text
+            elif tag == _IS:
+                parts = []
+            elif tag == _T:
+                if parts is not None and not phonetic:
+                    parts.append(el.text or '')
+            elif tag == _RPH:
+                phonetic = True
+        if kind is not None:
+            if col > len(values):
+                values.extend([None] * (col - len(values)))
+            values[col - 1] = self._cell_value(kind, style, text, parts)
+        return values if found else None
+
+    def _cell_value(self, kind, style, text, parts):
+        """Python value of a cell from its type, style id and ``<v>`` text (or inline string pieces)."""
+        if kind == 'inlineStr':
+            return ''.join(parts) if parts is not None else None
+        if not text:
+            return None
+        if kind == 'n':
+            value = _cast_number(text)
+            if style:
+                dates, deltas, days = self.date_styles
+                style = int(style)
+                if style in dates:
+                    try:
+                        value = from_excel(value, self.epoch, timedelta=style in deltas)
+                    except (OverflowError, ValueError):
+                        value = '#VALUE!'
+                    else:
+                        if style in days and type(value) is datetime.datetime:
+                            value = value.date()
+            return value
+        if kind == 's':
+            return self.shared_strings[int(text)]
+        if kind == 'b':
+            return bool(int(text))
+        if kind == 'd':
+            return from_ISO8601(text)
+        return text
+
+    def iter_rows(self, sheet, min_row=1, max_row=None, max_col=None):
+        """Yield value lists of worksheet rows ``min_row..max_row`` (1-based), lazily.
+
+        Rows are padded to the sheet's ``<dimension>`` width (cut at
+        ``max_col``); missing rows in between come out as all-None.
+        Parsing stops at ``max_row``, and cells right of ``max_col`` are
+        skipped without being converted.
+        """
+        path = self.sheets.get(sheet)
+        if not path or path not in self.zip.NameToInfo:
+            return
+        width = number = 0
+        expected = min_row
+        with self.zip.open(path) as f:
+            for el in _iter_sheet_xml(f):
+                if el.tag == _DIMENSION:
+                    last = el.get('ref', '').split(':')[-1].rstrip('0123456789')
+                    width = self._column(last) if last.isalpha() else 0
+                    if max_col:
+                        width = min(width, max_col)
+                    continue
+                r = el.get('r')
+                number = int(r) if r else number + 1
+                if max_row and number > max_row:
+                    return
+                if number < min_row:
+                    continue
+                values = self._row_values(el, width, max_col)
+                if values is None:
+                    continue
+                while expected < number:
+                    yield [None] * width
+                    expected += 1
+                yield values
+                expected = number + 1
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
 
-    fmt = args.format or 'table'
+_PROFILE_BATCH_ROWS = 4096
+
+# Cell kinds in report order; 'numeric text' is a number stored as text
+_CELL_KINDS = ('int', 'float', 'numeric text', 'bool', 'date', 'time', 'duration', 'text')
+_KIND_OF_TYPE = {int: 'int', float: 'float', bool: 'bool', datetime.datetime: 'date',
+                 datetime.date: 'date', datetime.time: 'time', datetime.timedelta: 'duration'}
+_NUMBER_START = frozenset('0123456789+-.')
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter; exact while the cardinality is small."""
+    __slots__ = ('p', 'exact', 'registers')
+
+    def __init__(self, p=12):
+        self.p = p
+        self.exact = set()
+        self.registers = None
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def update(self, values):
+        """Add an iterable of strings."""
+        hashes = map(self._hash, values)
+        if self.registers is None:
+            self.exact.update(hashes)
+            if len(self.exact) > (1 << self.p) // 4:
+                self.registers = bytearray(1 << self.p)
+                self._add_hashes(self.exact)
+                self.exact = set()
+            return
+        self._add_hashes(hashes)
+
+    def _add_hashes(self, hashes):
+        p, regs = self.p, self.registers
+        bits = 64 - p
+        mask = (1 << bits) - 1
+        for h in hashes:
+            rank = bits - (h & mask).bit_length() + 1
+            i = h >> bits
+            if rank > regs[i]:
+                regs[i] = rank
+
+    def count(self):
+        """Estimated number of distinct values."""
+        if self.registers is None:
+            return len(self.exact)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnStats:
+    """One-pass summary of a sheet column: kinds, nulls, numeric moments, date range, distinct."""
+    __slots__ = ('rows', 'nulls', 'kinds', 'count', 'mean', 'm2', 'low', 'high',
+                 'date_low', 'date_high', 'distinct')
+
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.kinds = dict.fromkeys(_CELL_KINDS, 0)
+        self.count = 0
+        self.mean = self.m2 = 0.0
+        self.low = self.high = None
+        self.date_low = self.date_high = None
+        self.distinct = HyperLogLog()
+
+    def update(self, cells):
+        """Fold a sequence of cell values into the summary.
+
+        Cells are counted first, so the per-value work below runs once per
+        distinct (type, value) of the batch.
+        """
+        self.rows += len(cells)
+        kinds = self.kinds
+        numbers, dates, keys = [], [], []
+        for (t, v), n in collections.Counter(zip(map(type, cells), cells)).items():
+            if v is None or (t is str and not v.strip()):
+                self.nulls += n
+                continue
+            keys.append(v if t is str else str(v))
+            kind = _KIND_OF_TYPE.get(t, 'text')
+            if t is str and v[0] in _NUMBER_START and '_' not in v:
+                try:
+                    number = float(v)
+                except ValueError:
+                    pass
+                else:
+                    if math.isfinite(number):
+                        v, kind = number, 'numeric text'
+            kinds[kind] += n
+            if kind == 'int' or kind == 'float' or kind == 'numeric text':
+                numbers.append((v, n))
+            elif kind == 'date':
+                dates.append(v if t is datetime.datetime else datetime.datetime.combine(v, datetime.time()))
+        if numbers:
+            self._add_numbers(numbers)
+        if dates:
+            lo, hi = min(dates), max(dates)
+            self.date_low = lo if self.date_low is None else min(self.date_low, lo)
+            self.date_high = hi if self.date_high is None else max(self.date_high, hi)
+        self.distinct.update(keys)
+
+    def _add_numbers(self, numbers):
+        # Batch mean/M2 combined into the running ones (Chan et al.)
+        n = sum(k for _, k in numbers)
+        mean = math.fsum(v * k for v, k in numbers) / n
+        m2 = math.fsum(k * (v - mean) ** 2 for v, k in numbers)
+        lo = min(v for v, _ in numbers)
+        hi = max(v for v, _ in numbers)
+        self.low = lo if self.low is None else min(self.low, lo)
+        self.high = hi if self.high is None else max(self.high, hi)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def summary(self, name):
+        numeric = dates = None
+        if self.count:
+            numeric = {
+                'count': self.count,
+                'min': self.low,
+                'max': self.high,
+                'mean': self.mean,
+                'stddev': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            }
+        if self.date_low is not None:
+            dates = {'min': self.date_low.isoformat(sep=' '), 'max': self.date_high.isoformat(sep=' ')}
+        return {
+            'name': name,
+            'non_null': self.rows - self.nulls,
+            'nulls': self.nulls,
+            'types': {kind: n for kind, n in self.kinds.items() if n},
+            'distinct': self.distinct.count(),
+            'distinct_exact': self.distinct.registers is None,
+            'numeric': numeric,
+            'dates': dates,
+        }
+
+
+def profile_sheet(path, sheet_name):
+    """Profile one sheet in a single streaming pass; returns a JSON-ready dict."""
+    with XlsxReader(path) as book:
+        rows = book.iter_rows(sheet_name)
+        first = next(rows, None)
+        if first is None:
+            return {'name': sheet_name, 'rows': 0, 'columns': []}
+        headers = [str(h) if h else f'Col{i+1}' for i, h in enumerate(first)]
+        stats = [ColumnStats() for _ in headers]
+        total = 0
+        while True:
+            part = list(itertools.islice(rows, _PROFILE_BATCH_ROWS))
+            if not part:
+                break
+            total += len(part)
+            width = max(map(len, part))
+            if width > len(headers):
+                # Only sheets without a <dimension> have rows wider than the header;
+                # the new columns were blank in every earlier row
+                headers += [f'Col{i+1}' for i in range(len(headers), width)]
+                for _ in range(width - len(stats)):
+                    st = ColumnStats()
+                    st.rows = st.nulls = total - len(part)
+                    stats.append(st)
+            width = len(headers)
+            if min(map(len, part)) < width:
+                part = [r + [None] * (width - len(r)) for r in part]
+            for st, cells in zip(stats, zip(*part)):
+                st.update(cells)
+    return {'name': sheet_name, 'rows': total,
+            'columns': [st.summary(h) for st, h in zip(stats, headers)]}
 
-    if fmt == 'json':
-        if len(rows) < 2:
-            output = json.dumps(rows, indent=2, ensure_ascii=False)
+
+# ---------------------------------------------------------------------------
+# Formula writer
+# ---------------------------------------------------------------------------
+
+# A1 references outside string literals and quoted sheet names; function
+# names (LOG10(), sheet names (Q1!) and table names (T1[) are not references
+_FORMULA_TOKEN = re.compile(
+    r'''("(?:[^"]|"")*"|'(?:[^']|'')*')'''
+    r'|(?<![A-Za-z0-9_.$])(\$?[A-Za-z]{1,3})(\$?)([0-9]+)(?![0-9A-Za-z_(!\[])')
+_ABSOLUTE_PLACEHOLDER = re.compile(r'(?<![A-Za-z])\{row\}|\$\{row\}')
+
+
+class FormulaTemplate:
+    """A formula compiled once for filling a column down from ``first_row``.
+
+    ``{row}`` placeholders take each row number. Without them the formula
+    reads as written for ``first_row`` and its relative row references move
+    with each row, as when Excel fills a formula down; ``$`` rows stay put.
+    """
+
+    def __init__(self, text, first_row):
+        self.first_row = first_row
+        text = text[1:] if text.startswith('=') else text
+        if '{row}' in text:
+            self._parts = text.split('{row}')
+            self._format = None
+            # Shared formulas shift relative references only
+            self.shareable = not _ABSOLUTE_PLACEHOLDER.search(text)
+            return
+        pieces, bases = [], []
+        last = 0
+        for m in _FORMULA_TOKEN.finditer(text):
+            if m.group(1) or m.group(3):
+                continue
+            pieces.append(text[last:m.start()].replace('{', '{{').replace('}', '}}'))
+            pieces.append(m.group(2).upper() + '{}')
+            bases.append(int(m.group(4)) - first_row)
+            last = m.end()
+        pieces.append(text[last:].replace('{', '{{').replace('}', '}}'))
+        self._format = ''.join(pieces).format
+        self._bases = bases
+        self.shareable = True
+
+    def render(self, row):
+        """Formula text (without '=') for ``row``."""
+        if self._format is None:
+            return str(row).join(self._parts)
+        return self._format(*[row + b for b in self._bases])
+
+
+FillTarget = collections.namedtuple('FillTarget', 'letters col template start end shared si')
+
+
+def _sheet_pieces(f, p):
+    """Split a sheet part into ('head', bytes), one ('row', bytes) per <row>, then ('tail', bytes)...
+
+    Works on the raw bytes so everything outside the rows is copied as is.
+    ``p`` is the namespace prefix of the main namespace (b'' when default).
+    An empty ``<sheetData/>`` is expanded so rows can be added.
+    """
+    sheet_data, row_open = b'<' + p + b'sheetData', b'<' + p + b'row'
+    row_close, data_close = b'</' + p + b'row>', b'</' + p + b'sheetData>'
+    buf = b''
+    while True:
+        i = buf.find(sheet_data)
+        j = buf.find(b'>', i) if i >= 0 else -1
+        if j >= 0:
+            break
+        chunk = f.read(1 << 20)
+        if not chunk:
+            raise ValueError('no <sheetData> element')
+        buf += chunk
+    if buf[j - 1:j] == b'/':
+        yield 'head', buf[:j - 1] + b'>'
+        buf = data_close + buf[j + 1:]
+    else:
+        yield 'head', buf[:j + 1]
+        buf = buf[j + 1:]
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in b' \t\r\n':
+            pos += 1
+        end = -1
+        if buf.startswith(row_open, pos):
+            k = buf.find(b'>', pos)
+            if k >= 0 and buf[k - 1:k] == b'/':
+                end = k + 1
+            elif k >= 0:
+                end = buf.find(row_close, k)
+                if end >= 0:
+                    end += len(row_close)
+            if end >= 0:
+                yield 'row', buf[pos:end]
+                pos = end
+                continue
+        elif len(buf) - pos >= len(data_close):
+            if not buf.startswith(data_close, pos):
+                raise ValueError('unexpected content in <sheetData>')
+            yield 'tail', buf[pos:]
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    return
+                yield 'tail', chunk
+        chunk = f.read(1 << 20)
+        if not chunk:
+            raise ValueError('truncated <sheetData>')
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+_ROW_NUMBER = re.compile(rb'\sr="([0-9]+)"')
+_CELL_REF = re.compile(rb'\sr="([A-Z]+)[0-9]+"')
+_CELL_STYLE = re.compile(rb'\ss="[0-9]+"')
+_SHARED_MASTER = re.compile(rb'<(?:\w+:)?f\b(?=[^>]*\st="shared")(?=[^>]*\sref="([^"]+)")[^>]*\ssi="([0-9]+)"')
+_SHARED_SI = re.compile(rb'<(?:\w+:)?f\b[^>]*\ssi="([0-9]+)"')
+_ROOT_PREFIX = re.compile(rb'<(?:(\w+):)?(?:worksheet|workbook)\b')
+
+
+def _root_prefix(xml):
+    """Namespace prefix of the root element as b'x:' (b'' for the default namespace)."""
+    m = _ROOT_PREFIX.search(xml)
+    return m.group(1) + b':' if m and m.group(1) else b''
+
+
+def _split_range(ref):
+    """'E2:E90' -> ('E', 2, 'E', 90); single cells give the same corner twice."""
+    first, _, last = ref.partition(':')
+    last = last or first
+    a, b = first.rstrip('0123456789'), last.rstrip('0123456789')
+    return a, int(first[len(a):]), b, int(last[len(b):])
+
+
+def _scan_sheet(f, p):
+    """(last row with cells, next free shared-formula index, {si: range} of shared formulas)."""
+    last_row = number = 0
+    next_si = 0
+    masters = {}
+    for kind, data in _sheet_pieces(f, p):
+        if kind != 'row':
+            continue
+        m = _ROW_NUMBER.search(data, 0, data.find(b'>'))
+        number = int(m.group(1)) if m else number + 1
+        if not data.endswith(b'/>') and b'<' + p + b'c' in data:
+            last_row = number
+        if b'si="' in data:
+            for si in _SHARED_SI.findall(data):
+                next_si = max(next_si, int(si) + 1)
+            for ref, si in _SHARED_MASTER.findall(data):
+                masters[int(si)] = ref.decode()
+    return last_row, next_si, masters
+
+
+def _formula_cell(p, target, row, style):
+    p = p.decode()
+    f = p + 'f'
+    head = f'<{p}c r="{target.letters}{row}"{style}>'
+    tail = f'</{p}c>'
+    if target.shared and target.start < target.end:
+        if row > target.start:
+            return f'{head}<{f} t="shared" si="{target.si}"/>{tail}'
+        span = f'{target.letters}{target.start}:{target.letters}{target.end}'
+        return (f'{head}<{f} t="shared" ref="{span}" si="{target.si}">'
+                f'{_xml_text(target.template.render(row))}</{f}>{tail}')
+    return f'{head}<{f}>{_xml_text(target.template.render(row))}</{f}>{tail}'
+
+
+def _fill_row(p, data, number, targets):
+    """``<row>`` bytes with formula cells for ``targets`` put in column order (styles kept)."""
+    tag_end = data.find(b'>') + 1
+    start_tag = re.sub(rb'\sspans="[^"]*"', b'', data[:tag_end])
+    if start_tag.endswith(b'/>'):
+        start_tag, body = start_tag[:-2].rstrip() + b'>', b''
+    else:
+        body = data[tag_end:-len(b'</' + p + b'row>')]
+    cells = []
+    col = 0
+    c_open, c_close = b'<' + p + b'c', b'</' + p + b'c>'
+    pos = 0
+    while True:
+        i = body.find(c_open, pos)
+        if i < 0:
+            break
+        k = body.find(b'>', i)
+        end = k + 1 if body[k - 1:k] == b'/' else body.find(c_close, k) + len(c_close)
+        m = _CELL_REF.search(body, i, k)
+        col = column_index_from_string(m.group(1).decode()) if m else col + 1
+        cells.append([col, body[i:end]])
+        pos = end
+    extra = body[pos:]  # e.g. <extLst> after the cells
+    by_col = {c[0]: c for c in cells}
+    for t in targets:
+        old = by_col.get(t.col)
+        style = ''
+        if old is not None:
+            m = _CELL_STYLE.search(old[1], 0, old[1].find(b'>'))
+            style = m.group(0).decode() if m else ''
+        xml = _formula_cell(p, t, number, style).encode('utf-8')
+        if old is not None:
+            old[1] = xml
+        else:
+            cells.append([t.col, xml])
+    cells.sort(key=lambda c: c[0])
+    return start_tag + b''.join(c[1] for c in cells) + extra + b'</' + p + b'row>'
+
+
+def _new_row(p, number, targets):
+    cells = ''.join(_formula_cell(p, t, number, '') for t in sorted(targets, key=lambda t: t.col))
+    return f'<{p.decode()}row r="{number}">{cells}</{p.decode()}row>'.encode('utf-8')
+
+
+def _rewrite_sheet(src, out, p, targets):
+    """Stream a sheet part from ``src`` to ``out`` with the ``targets`` filled in."""
+    first = min(t.start for t in targets)
+    last = max(t.end for t in targets)
+
+    def active(row):
+        return [t for t in targets if t.start <= row <= t.end]
+
+    def fill_gap(lo, hi):
+        # Rows lo..hi-1 have no <row> element yet
+        for n in range(max(lo, first), min(hi, last + 1)):
+            ts = active(n)
+            if ts:
+                out.write(_new_row(p, n, ts))
+
+    number = 0
+    for kind, data in _sheet_pieces(src, p):
+        if kind == 'head':
+            out.write(_grow_dimension(data, targets))
+        elif kind == 'row':
+            m = _ROW_NUMBER.search(data, 0, data.find(b'>'))
+            row = int(m.group(1)) if m else number + 1
+            fill_gap(number + 1, row)
+            number = row
+            ts = active(row)
+            if ts:
+                data = _fill_row(p, data, row, ts)
+            out.write(data)
+        else:
+            if number < last:
+                fill_gap(number + 1, last + 1)
+                number = last
+            out.write(data)
+
+
+def _grow_dimension(head, targets):
+    m = re.search(rb'(<(?:\w+:)?dimension\b[^>]*\sref=")([^"]*)(")', head)
+    if not m:
+        return head
+    ref = m.group(2).decode()
+    try:
+        a, r1, b, r2 = _split_range(ref)
+        c1, c2 = column_index_from_string(a), column_index_from_string(b)
+    except ValueError:
+        return head
+    for t in targets:
+        c1, c2 = min(c1, t.col), max(c2, t.col)
+        r1, r2 = min(r1, t.start), max(r2, t.end)
+    ref = f'{get_column_letter(c1)}{r1}:{get_column_letter(c2)}{r2}'
+    return head[:m.start(2)] + ref.encode() + head[m.end(2):]
+
+
+_AFTER_CALC_PR = rb'<(?:\w+:)?(?:oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|' \
+                 rb'webPublishing|fileRecoveryPr|webPublishObjects|extLst)\b|</(?:\w+:)?workbook>'
+
+
+def _full_calc_on_load(xml):
+    """workbook.xml with calcPr fullCalcOnLoad="1", so Excel computes the new formulas on open."""
+    m = re.search(rb'<(\w+:)?calcPr\b[^>]*?(/?>)', xml)
+    if m:
+        tag = m.group(0)
+        if b'fullCalcOnLoad=' in tag:
+            tag = re.sub(rb'fullCalcOnLoad="[^"]*"', b'fullCalcOnLoad="1"', tag)
         else:
-            headers = rows[0]
-            data = []
-            for r in rows[1:]:
-                data.append(dict(zip(headers, r)))
-            output = json.dumps(data, indent=2, ensure_ascii=False)
-    elif fmt == 'csv':
-        import io
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerows(rows)
-        output = buf.getvalue()
-    else:  # table
-        lines = []
-        if rows:
-            col_widths = [0] * len(rows[0])
+            tag = tag[:-len(m.group(2))].rstrip() + b' fullCalcOnLoad="1"' + m.group(2)
+        return xml[:m.start()] + tag + xml[m.end():]
+    m = re.search(_AFTER_CALC_PR, xml)
+    if not m:
+        return xml
+    return xml[:m.start()] + b'<' + _root_prefix(xml) + b'calcPr fullCalcOnLoad="1"/>' + xml[m.start():]
+
+
+def _plan_fills(name, p, f, specs, shared):
+    """FillTargets of one sheet, checked against the shared formulas already in it."""
+    last_row, next_si, masters = _scan_sheet(f, p)
+    targets = []
+    for letters, template, start, end in specs:
+        end = end or max(last_row, start)
+        if end < start:
+            raise ValueError(f"{name}!{letters}: end row {end} is before start row {start}")
+        share = shared and template.shareable and end > start
+        if shared and not template.shareable:
+            print(f"Warning: {name}!{letters}: {{row}} is used outside relative references; "
+                  f"writing one formula per cell", file=sys.stderr)
+        targets.append(FillTarget(letters, column_index_from_string(letters), template,
+                                  start, end, share, next_si if share else None))
+        if share:
+            next_si += 1
+    if len({t.col for t in targets}) < len(targets):
+        raise ValueError(f"a column of '{name}' is given more than one formula")
+    # Replacing the anchor of an existing shared formula but not all of it
+    # would leave the rest of its cells pointing at nothing
+    for ref in masters.values():
+        a, r1, b, r2 = _split_range(ref)
+        for t in targets:
+            if t.letters == a and t.start <= r1 <= t.end and (a != b or r2 > t.end):
+                raise ValueError(f"{name}!{a}{r1} anchors the shared formula {ref}, which rows "
+                                 f"{t.start}-{t.end} would only partly replace")
+    return targets
+
+
+def apply_formulas(path, fills, shared=False):
+    """Write formulas into an .xlsx without loading it as a workbook.
+
+    ``fills`` maps sheet name -> [(column letters, FormulaTemplate, start,
+    end)], end None meaning the last row with cells. The affected sheet
+    parts are rewritten as a byte stream and the other parts copied.
+    Returns {sheet: [FillTarget]}.
+    """
+    plans = {}
+    with XlsxReader(path) as book:
+        for name in fills:
+            if name not in book.sheetnames:
+                print(f"Error: Sheet '{name}' not found. Available: {book.sheetnames}", file=sys.stderr)
+                sys.exit(1)
+        tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), suffix='.xlsx',
+                                          delete=False)
+        try:
+            parts = {}
+            for name, specs in fills.items():
+                part = book.sheets[name]
+                with book.zip.open(part) as f:
+                    p = _root_prefix(f.read(4096))
+                with book.zip.open(part) as f:
+                    plans[name] = _plan_fills(name, p, f, specs, shared)
+                parts[part] = (p, plans[name])
+            with tmp, zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as out:
+                for info in book.zip.infolist():
+                    entry = zipfile.ZipInfo(info.filename, info.date_time)
+                    entry.compress_type = zipfile.ZIP_DEFLATED
+                    entry.external_attr = info.external_attr
+                    if info.filename == 'xl/workbook.xml':
+                        out.writestr(entry, _full_calc_on_load(book.zip.read(info)))
+                        continue
+                    with book.zip.open(info) as src, out.open(entry, 'w', force_zip64=True) as dst:
+                        if info.filename in parts:
+                            _rewrite_sheet(src, dst, *parts[info.filename])
+                        else:
+                            shutil.copyfileobj(src, dst, 1 << 20)
+        except ValueError as e:
+            tmp.close()
+            os.unlink(tmp.name)
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    shutil.copymode(path, tmp.name)
+    os.replace(tmp.name, path)
+    return plans
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+
+def cmd_read(args):
+    """Read and display an Excel file."""
+    if not os.path.isfile(args.file):
+        print(f"Error: File not found: {args.file}", file=sys.stderr)
+        sys.exit(1)
+
+    with XlsxReader(args.file) as book:
+        sheet_name = args.sheet or book.active
+        if sheet_name not in book.sheetnames:
+            print(f"Error: Sheet '{sheet_name}' not found. Available: {book.sheetnames}", file=sys.stderr)
+            sys.exit(1)
+
+        rows = iter_selected_rows(book, sheet_name, args.rows, args.columns)
+        if rows is None:
+            print("(Empty sheet)")
+            return
+        rows = ([str(c) if c is not None else '' for c in r] for r in rows)
+        write_rows(rows, args.format or 'table', args.save)
+
+
+def iter_selected_rows(book, sheet_name, rows_text=None, columns_text=None):
+    """Header + data rows of a sheet limited by --rows/--columns; None for an empty sheet."""
+    header = next(book.iter_rows(sheet_name, max_row=1), None)
+    if header is None:
+        return None
+    columns = select_columns(header, columns_text) if columns_text else None
+    first, last = parse_row_range(rows_text)
+    # Parsing stops after the last requested row and right of the last requested column
+    data = book.iter_rows(sheet_name, min_row=(first or 1) + 1,
+                          max_row=last + 1 if last else None,
+                          max_col=max(columns) + 1 if columns else None)
+    rows = itertools.chain([header], data)
+    if columns:
+        return ([r[i] if i < len(r) else None for i in columns] for r in rows)
+    # Sheets without a <dimension> give rows only as wide as their last cell
+    width = len(header)
+    return (r + [None] * (width - len(r)) if len(r) < width else r for r in rows)
+
+
+def write_rows(rows, fmt, save=None):
+    """Write string rows (header first) as a table, JSON or CSV to ``save`` or stdout.
+
+    JSON and CSV are written as the rows arrive; a table needs every row
+    for its column widths.
+    """
+    out = open(save, 'w', encoding='utf-8', newline='') if save else sys.stdout
+    try:
+        if fmt == 'json':
+            header = next(rows)
+            first = next(rows, None)
+            if first is None:
+                out.write(json.dumps([header], indent=2, ensure_ascii=False))
+            else:
+                # Same layout as json.dumps(list, indent=2), one record at a time
+                sep = '[\n  '
+                for r in itertools.chain([first], rows):
+                    out.write(sep + json.dumps(dict(zip(header, r)), indent=2, ensure_ascii=False)
+                              .replace('\n', '\n  '))
+                    sep = ',\n  '
+                out.write('\n]')
+        elif fmt == 'csv':
+            csv.writer(out).writerows(rows)
+        else:  # table
+            rows = list(rows)
+            width = max(map(len, rows))
+            rows = [r + [''] * (width - len(r)) if len(r) < width else r for r in rows]
+            col_widths = [0] * width
             for r in rows:
                 for i, c in enumerate(r):
                     if i < len(col_widths):
                         col_widths[i] = max(col_widths[i], len(c))
+            lines = []
             for ri, r in enumerate(rows):
                 line = ' | '.join(c.ljust(col_widths[i]) for i, c in enumerate(r) if i < len(col_widths))
                 lines.append(line)
                 if ri == 0:
                     lines.append('-+-'.join('-' * w for w in col_widths))
-        output = '\n'.join(lines)
-
-    if args.save:
-        with open(args.save, 'w', encoding='utf-8') as f:
-            f.write(output)
-        print(f"Saved to: {args.save}", file=sys.stderr)
-    else:
-        print(output)
+            out.write('\n'.join(lines))
+        if not save:
+            out.write('\n')
+    finally:
+        if save:
+            out.close()
+    if save:
+        print(f"Saved to: {save}", file=sys.stderr)
 
 
 def cmd_create(args):
     """Create a new Excel file."""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = args.sheet or 'Sheet1'
+    # Write-only workbook: openpyxl writes the styled top rows, the data rows
+    # are serialized in one pass by write_bulk_rows
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(args.sheet or 'Sheet1')
 
-    # Load data
-    rows = []
-    if args.from_csv:
-        rows = load_csv_data(args.from_csv)
-    elif args.from_json:
-        rows = load_json_data(args.from_json)
+    rows = iter_input_data(args)
+    header = next(rows, None)
 
-    # Add title row
+    # Title row
     start_row = 1
-    if args.title and rows:
-        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(rows[0]))
-        title_cell = ws.cell(row=1, column=1, value=args.title)
+    if args.title and header is not None:
+        title_cell = WriteOnlyCell(ws, value=args.title)
         title_cell.font = Font(bold=True, size=14)
         title_cell.alignment = Alignment(horizontal="center")
+        ws.merged_cells.add(CellRange(min_col=1, min_row=1, max_col=len(header), max_row=1))
         start_row = 2
 
-    # Write data
-    for ri, row in enumerate(rows):
-        for ci, val in enumerate(row):
-            ws.cell(row=start_row + ri, column=ci + 1, value=val)
-
-    # Apply formatting
-    if args.header_style and rows:
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        for ci in range(len(rows[0])):
-            cell = ws.cell(row=start_row, column=ci + 1)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-
-    if args.auto_width:
-        auto_width(ws)
-
+    # Views are written with the first row, so freeze before appending
     if args.freeze_header:
-        ws.freeze_panes = ws.cell(row=start_row + 1, column=1)
+        ws.freeze_panes = f'A{start_row + 1}'
+
+    count = 0
+    if header is not None:
+        widths = [len(val) for val in header]
+        if start_row == 2:
+            ws.append([title_cell])
+            if widths:
+                widths[0] = max(widths[0], len(args.title))
+        if args.header_style:
+            header_font = Font(bold=True, color="FFFFFF", size=11)
+            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+            header_align = Alignment(horizontal="center")
+            cells = []
+            for val in header:
+                cell = WriteOnlyCell(ws, value=val)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_align
+                cells.append(cell)
+            ws.append(cells)
+        else:
+            ws.append(header)
+
+        last_row = write_bulk_rows(ws, rows, start_row + 1, widths, args.auto_width, len(header))
+        count = last_row - start_row + 1
 
     wb.save(args.output)
-    print(f"Created: {args.output} ({len(rows)} rows)")
+    print(f"Created: {args.output} ({count} rows)")
 
 
 def cmd_add_sheet(args):
@@ -194,22 +1408,20 @@ def cmd_add_sheet(args):
     sheet_name = args.sheet or 'NewSheet'
     ws = wb.create_sheet(title=sheet_name)
 
-    rows = []
-    if args.from_csv:
-        rows = load_csv_data(args.from_csv)
-    elif args.from_json:
-        rows = load_json_data(args.from_json)
-
-    for ri, row in enumerate(rows):
-        for ci, val in enumerate(row):
-            ws.cell(row=ri + 1, column=ci + 1, value=val)
+    # The existing workbook has to be loaded, but the new rows are appended
+    # and measured in a single pass instead of revisited by auto_width
+    widths = []
+    count = 0
+    for row in measure_widths(iter_input_data(args), widths):
+        ws.append(row)
+        count += 1
 
-    if rows:
+    if count:
         apply_header_style(ws)
-        auto_width(ws)
+        set_widths(ws, widths)
 
     wb.save(args.file)
-    print(f"Added sheet '{sheet_name}' to {args.file} ({len(rows)} rows)")
+    print(f"Added sheet '{sheet_name}' to {args.file} ({count} rows)")
 
 
 def cmd_format(args):
@@ -243,69 +1455,196 @@ def cmd_analyze(args):
         print(f"Error: File not found: {args.file}", file=sys.stderr)
         sys.exit(1)
 
-    wb = openpyxl.load_workbook(args.file, data_only=True)
+    with XlsxReader(args.file) as book:
+        sheet_names = book.sheetnames
+
+    # Sheets are independent XML parts, so each worker profiles whole sheets
+    task = functools.partial(profile_sheet, args.file)
+    if args.workers > 1 and len(sheet_names) > 1:
+        with multiprocessing.Pool(min(args.workers, len(sheet_names))) as pool:
+            sheets = pool.map(task, sheet_names)
+    else:
+        sheets = map(task, sheet_names)
+
+    if args.format == 'json':
+        report = {'file': args.file, 'sheets': list(sheets)}
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
 
     print(f"File: {args.file}")
-    print(f"Sheets: {wb.sheetnames}")
+    print(f"Sheets: {sheet_names}")
     print()
-
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        rows = list(ws.iter_rows(values_only=True))
-        if not rows:
-            print(f"  [{sheet_name}] (empty)")
+    for sheet in sheets:
+        if not sheet['columns']:
+            print(f"  [{sheet['name']}] (empty)")
             continue
-
-        print(f"  [{sheet_name}]")
-        print(f"    Rows: {len(rows) - 1} (excluding header)")
-        print(f"    Columns: {len(rows[0])}")
-
-        # Header names
-        headers = [str(h) if h else f'Col{i+1}' for i, h in enumerate(rows[0])]
-        print(f"    Headers: {', '.join(headers)}")
-
-        # Basic stats for numeric columns
-        if len(rows) > 1:
-            for ci, header in enumerate(headers):
-                values = []
-                for r in rows[1:]:
-                    if ci < len(r) and r[ci] is not None:
-                        try:
-                            values.append(float(r[ci]))
-                        except (ValueError, TypeError):
-                            pass
-                if values:
-                    avg = sum(values) / len(values)
-                    print(f"    {header}: min={min(values):.2f}, max={max(values):.2f}, "
-                          f"avg={avg:.2f}, count={len(values)}")
+        print(f"  [{sheet['name']}]")
+        print(f"    Rows: {sheet['rows']} (excluding header)")
+        print(f"    Columns: {len(sheet['columns'])}")
+        print(f"    Headers: {', '.join(col['name'] for col in sheet['columns'])}")
+        for col in sheet['columns']:
+            kinds = ', '.join(f'{kind}={n}' for kind, n in col['types'].items()) or 'empty'
+            approx = '' if col['distinct_exact'] else '~'
+            print(f"    {col['name']}: {kinds}, nulls={col['nulls']}, distinct={approx}{col['distinct']}")
+            num = col['numeric']
+            if num:
+                print(f"      min={num['min']:.2f}, max={num['max']:.2f}, avg={num['mean']:.2f}, "
+                      f"std={num['stddev']:.2f}, count={num['count']}")
+            if col['dates']:
+                print(f"      dates {col['dates']['min']} .. {col['dates']['max']}")
         print()
 
 
+def _json_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()
+    return str(value)
+
+
+def _general_float(value):
+    """A float as Excel's General format shows it: 1000, not 1000.0."""
+    return int(value) if value.is_integer() and abs(value) < 1e15 else value
+
+
+# CSV text of the cell types whose str() differs from how Excel shows them
+_CSV_TEXT = {
+    bool: lambda v: 'TRUE' if v else 'FALSE',
+    float: lambda v: str(_general_float(v)),
+    datetime.datetime: lambda v: v.isoformat(sep=' '),
+}
+
+
+def cmd_export(args):
+    """Export a sheet to CSV or JSON Lines, streamed from the sheet XML."""
+    if not os.path.isfile(args.file):
+        print(f"Error: File not found: {args.file}", file=sys.stderr)
+        sys.exit(1)
+    fmt = args.format
+    if fmt is None:
+        fmt = 'jsonl' if args.output and args.output.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+    with XlsxReader(args.file, day_dates=True) as book:
+        sheet_name = args.sheet or book.active
+        if sheet_name not in book.sheetnames:
+            print(f"Error: Sheet '{sheet_name}' not found. Available: {book.sheetnames}", file=sys.stderr)
+            sys.exit(1)
+        rows = iter_selected_rows(book, sheet_name, args.rows, args.columns) or iter(())
+        out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+        count = -1
+        try:
+            if fmt == 'csv':
+                writer = csv.writer(out)
+                text = _CSV_TEXT.get
+                for count, row in enumerate(rows):
+                    writer.writerow([v if text(type(v)) is None else text(type(v))(v) for v in row])
+            else:
+                header = next(rows, None)
+                if header is not None:
+                    keys = [str(h) if h not in (None, '') else f'Col{i+1}' for i, h in enumerate(header)]
+                    dumps = json.JSONEncoder(ensure_ascii=False, default=_json_value).encode
+                    for count, row in enumerate(rows, 1):
+                        if len(row) > len(keys):
+                            keys += [f'Col{i+1}' for i in range(len(keys), len(row))]
+                        row = [_general_float(v) if type(v) is float else v for v in row]
+                        out.write(dumps(dict(zip(keys, row))))
+                        out.write('\n')
+        finally:
+            if args.output:
+                out.close()
+    if args.output:
+        print(f"Exported {max(count, 0)} rows from '{sheet_name}' to {args.output}", file=sys.stderr)
+
+
+def _json_scalar(value):
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+
+
+def cmd_import(args):
+    """Convert CSV or JSON records into an .xlsx sheet with typed cells."""
+    if not os.path.isfile(args.input):
+        print(f"Error: File not found: {args.input}", file=sys.stderr)
+        sys.exit(1)
+    # JSON values are typed already; only CSV text is checked for numbers/booleans
+    from_json = args.input.lower().endswith(('.json', '.jsonl', '.ndjson'))
+    rows = iter_json_data(args.input, _json_scalar) if from_json else iter_csv_data(args.input)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(args.sheet or 'Sheet1')
+    if args.freeze_header:
+        ws.freeze_panes = 'A2'
+    header = next(rows, None)
+    count = 0
+    if header is not None:
+        header = [str(h) for h in header]
+        ws.append(header)
+        widths = [len(h) for h in header]
+        cell_xml = typed_cell_xml(ws, numbers_from_text=not from_json)
+        cell_value = typed_cell_value(ws, numbers_from_text=not from_json)
+        count = write_bulk_rows(ws, rows, 2, widths, args.auto_width, len(header), cell_xml, cell_value) - 1
+
+    wb.save(args.output)
+    print(f"Imported {count} rows into {args.output} (sheet '{ws.title}')")
+
+
+def _parse_fill(text):
+    """'[Sheet!]COL=FORMULA' -> (sheet or None, 'COL', 'FORMULA')."""
+    target, sep, formula = text.partition('=')
+    sheet, _, col = target.rpartition('!')
+    col = col.strip().upper()
+    if not sep or not formula or not col.isalpha() or len(col) > 3:
+        print(f"Error: invalid --set '{text}' (use e.g. E=SUM(B2:D2) or Sheet2!E=B2*2)", file=sys.stderr)
+        sys.exit(1)
+    sheet = sheet.strip()
+    if len(sheet) > 1 and sheet[0] == sheet[-1] == "'":
+        sheet = sheet[1:-1].replace("''", "'")
+    return sheet or None, col, formula
+
+
 def cmd_formula(args):
     """Add formulas to an Excel file."""
     if not os.path.isfile(args.file):
         print(f"Error: File not found: {args.file}", file=sys.stderr)
         sys.exit(1)
 
-    wb = openpyxl.load_workbook(args.file)
-    ws = wb.active
-
+    sheet = args.sheet
+    if sheet is None:
+        with XlsxReader(args.file) as book:
+            sheet = book.active
+    start = args.start_row or 2
+    fills = {}
     if args.cell:
-        ws[args.cell] = args.formula
-        print(f"Set {args.cell} = {args.formula}")
-    elif args.column:
-        start = args.start_row or 2
-        end = args.end_row or ws.max_row
-        col = args.column
-        count = 0
-        for row_num in range(start, end + 1):
-            formula = args.formula.replace('{row}', str(row_num))
-            cell_ref = f"{col}{row_num}"
-            ws[cell_ref] = formula
-            count += 1
-        print(f"Applied formula to {count} cells in column {col}")
+        if not args.formula:
+            print("Error: --cell needs --formula", file=sys.stderr)
+            sys.exit(1)
+        letters = args.cell.upper().rstrip('0123456789')
+        digits = args.cell[len(letters):]
+        if not letters.isalpha() or not digits.isdigit():
+            print(f"Error: invalid cell reference '{args.cell}'", file=sys.stderr)
+            sys.exit(1)
+        row = int(digits)
+        fills.setdefault(sheet, []).append((letters, FormulaTemplate(args.formula, row), row, row))
+    elif args.column or args.set:
+        specs = [(None, args.column.upper(), args.formula)] if args.column else []
+        if args.column and not args.formula:
+            print("Error: --column needs --formula", file=sys.stderr)
+            sys.exit(1)
+        specs += [_parse_fill(text) for text in args.set or []]
+        for target_sheet, col, formula in specs:
+            fills.setdefault(target_sheet or sheet, []).append(
+                (col, FormulaTemplate(formula, start), start, args.end_row))
+    else:
+        print("Error: give --cell, --column or --set", file=sys.stderr)
+        sys.exit(1)
 
-    wb.save(args.file)
+    plans = apply_formulas(args.file, fills, args.shared)
+    for name, targets in plans.items():
+        where = f"{name}!" if len(plans) > 1 else ''
+        for t in targets:
+            if t.start == t.end and args.cell:
+                print(f"Set {where}{t.letters}{t.start} = ={t.template.render(t.start)}")
+                continue
+            kind = ' as one shared formula' if t.shared else ''
+            print(f"Applied formula to {t.end - t.start + 1} cells in column {where}{t.letters}{kind}")
     print(f"Saved: {args.file}")
 
 
@@ -323,6 +1662,8 @@ def main():
     p.add_argument('--sheet', help='Sheet name')
     p.add_argument('--format', choices=['table', 'json', 'csv'])
     p.add_argument('--save', help='Save output to file')
+    p.add_argument('--rows', help='Data rows to read, a:b (1 = first row below the header; open ends allowed)')
+    p.add_argument('--columns', help='Columns to read: header names, letters or ranges (e.g. "name,D:F")')
 
     # create
     p = sub.add_parser('create', help='Create a new Excel file')
@@ -352,15 +1693,39 @@ def main():
     # analyze
     p = sub.add_parser('analyze', help='Analyze Excel file')
     p.add_argument('file', help='Input .xlsx file')
+    p.add_argument('--format', choices=['text', 'json'], default='text')
+    p.add_argument('--workers', type=int, default=1, help='Profile sheets in N processes')
+
+    # export
+    p = sub.add_parser('export', help='Export a sheet to CSV or JSON Lines')
+    p.add_argument('file', help='Input .xlsx file')
+    p.add_argument('--sheet', help='Sheet name (default: active sheet)')
+    p.add_argument('--format', choices=['csv', 'jsonl'], help='Output format (default: from --output extension, else csv)')
+    p.add_argument('--output', help='Output file (default: stdout)')
+    p.add_argument('--rows', help='Data rows to export, a:b (1 = first row below the header; open ends allowed)')
+    p.add_argument('--columns', help='Columns to export: header names, letters or ranges (e.g. "name,D:F")')
+
+    # import
+    p = sub.add_parser('import', help='Convert CSV/JSON into .xlsx with typed cells')
+    p.add_argument('input', help='Input .csv, .json, .jsonl or .ndjson file')
+    p.add_argument('output', help='Output .xlsx file')
+    p.add_argument('--sheet', help='Sheet name (default: Sheet1)')
+    p.add_argument('--auto-width', action='store_true')
+    p.add_argument('--freeze-header', action='store_true')
 
     # formula
     p = sub.add_parser('formula', help='Add formulas')
     p.add_argument('file', help='.xlsx file to modify')
+    p.add_argument('--sheet', help='Sheet name (default: active sheet)')
     p.add_argument('--cell', help='Target cell (e.g., E2)')
     p.add_argument('--column', help='Target column for batch formula')
-    p.add_argument('--formula', required=True, help='Formula (use {row} for row number)')
+    p.add_argument('--formula', help='Formula as for the start row, or with {row} for the row number')
+    p.add_argument('--set', action='append', metavar='[SHEET!]COL=FORMULA',
+                   help='Column formula, repeatable for several columns/sheets (e.g. "F=D2*E2")')
     p.add_argument('--start-row', type=int, help='Start row for column formula')
     p.add_argument('--end-row', type=int, help='End row for column formula')
+    p.add_argument('--shared', action='store_true',
+                   help='Store each column as one shared formula instead of one formula per cell')
 
     args = parser.parse_args()
     commands = {
@@ -369,6 +1734,8 @@ def main():
         'add-sheet': cmd_add_sheet,
         'format': cmd_format,
         'analyze': cmd_analyze,
+        'export': cmd_export,
+        'import': cmd_import,
         'formula': cmd_formula,
     }
     commands[args.command](args)